@@ -0,0 +1,63 @@
+"""Time importing the planning modules in fresh interpreters.
+
+Run from the repository root with ``python benchmarks/import_time.py``. Each module
+is imported ``--repeat`` times in a new process and the best wall time is reported,
+along with any heavy optional dependency the import pulled in.
+"""
+
+import argparse
+import os
+import pathlib
+import subprocess
+import sys
+
+modules = [
+    "pydive.gas",
+    "pydive.dive",
+    "pydive.models.decompression.vpm_b",
+    "pydive.dive_series",
+    "pydive.logbook.replay",
+]
+
+heavy = ["pandas", "plotly"]
+
+script = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+print(",".join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+def time_import(module, repeat):
+    env = dict(os.environ)
+    src = pathlib.Path(__file__).parent.parent / "src"
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(src), env.get("PYTHONPATH")]))
+    best = float("inf")
+    loaded = ""
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", script.format(module=module, heavy=heavy)],
+            capture_output=True,
+            check=True,
+            env=env,
+            text=True,
+        )
+        elapsed, loaded = result.stdout.split("\n")[:2]
+        best = min(best, float(elapsed))
+    return best, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for module in modules:
+        best, loaded = time_import(module, args.repeat)
+        print(f"{module:40} {best * 1000:7.1f} ms  {loaded}")
+
+
+if __name__ == "__main__":
+    main()
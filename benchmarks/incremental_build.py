@@ -0,0 +1,61 @@
+"""Time rebuilding a dive after editing its last waypoint, for growing prefixes.
+
+Run from the repository root with ``python benchmarks/incremental_build.py``. For
+each number of waypoints an `IncrementalBuilder` is primed with the plan, then the
+duration of the last waypoint is edited ``--repeat`` times and the best wall time of
+a rebuild is reported, next to a full build without reuse for comparison.
+"""
+
+import argparse
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "src"))
+
+from pydive.gas import air  # noqa: E402
+from pydive.plan import IncrementalBuilder, Waypoint  # noqa: E402
+
+lengths = [5, 20, 50, 100, 200]
+
+
+def plan(length, last_duration=5):
+    waypoints = [Waypoint(20 + index % 5, 2) for index in range(length - 1)]
+    return waypoints + [Waypoint(20, last_duration)]
+
+
+def time_edit(length, repeat):
+    builder = IncrementalBuilder()
+    builder.build(air, plan(length))
+    best = float("inf")
+    for edit in range(repeat):
+        waypoints = plan(length, last_duration=6 + edit)
+        start = time.perf_counter()
+        builder.build(air, waypoints)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_full(length, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        IncrementalBuilder().build(air, plan(length))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for length in lengths:
+        edit = time_edit(length, args.repeat)
+        full = time_full(length, max(1, args.repeat // 5))
+        print(f"{length:4} waypoints  edit {edit * 1000:6.2f} ms", end="  ")
+        print(f"full {full * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import asyncio
+import concurrent.futures
+import copy
+import dataclasses
+import hashlib
+import json
+import logging
+
+from pydive.plan import DivePlan
+
+logger = logging.getLogger(__name__)
+
+
+def _execute(data: dict) -> dict:
+    return DivePlan.from_dict(data).execute()
+
+
+@dataclasses.dataclass
+class _InFlight:
+    future: asyncio.Future
+    waiters: int = 0
+
+
+class AsyncPlanner:
+    """Plan dives from a running event loop without blocking it.
+
+    Plans run on `executor`, the event loop's default thread pool if None. A
+    `concurrent.futures.ProcessPoolExecutor` avoids contention on the GIL when
+    serving many requests. Requests for the same plan, as identified by a hash of
+    its `DivePlan.to_dict` form, that arrive while it is being computed share one
+    computation. Nothing is simulated on the event loop.
+
+    Cancelling a request, or letting it time out, only abandons the computation
+    once no other request is waiting for it. A computation that has not started is
+    then dropped from the executor's queue; one that has started runs to completion
+    in the background.
+    """
+
+    def __init__(self, executor: concurrent.futures.Executor = None, timeout=None):
+        self.executor = executor
+        self.timeout = timeout  # s
+        self.stats = {"requests": 0, "computations": 0, "coalesced": 0}
+        self._in_flight: dict[str, _InFlight] = {}
+
+    async def plan(self, plan: DivePlan | dict, timeout=None) -> dict:
+        """Plan `plan` and return its summary as from `DivePlan.execute`.
+
+        Parameters
+        ----------
+        plan
+            The plan, or its JSON form as accepted by `DivePlan.from_dict`.
+        timeout
+            Seconds to wait for the result, the planner's `timeout` if None.
+
+        Raises
+        ------
+        TimeoutError
+            If the result is not ready within the timeout.
+        ValueError
+            If the plan is invalid.
+        """
+        if isinstance(plan, dict):
+            plan = DivePlan.from_dict(plan)
+        if timeout is None:
+            timeout = self.timeout
+        data = plan.to_dict()
+        data.pop("id", None)
+        key = hashlib.sha256(
+            json.dumps(data, sort_keys=True, separators=(",", ":")).encode()
+        ).hexdigest()
+        self.stats["requests"] += 1
+
+        entry = self._in_flight.get(key)
+        if entry is None:
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor, _execute, data
+            )
+            entry = self._in_flight[key] = _InFlight(future)
+            future.add_done_callback(lambda _: self._forget(key, entry))
+            self.stats["computations"] += 1
+        else:
+            logger.debug(f"joining in-flight plan {key}")
+            self.stats["coalesced"] += 1
+
+        entry.waiters += 1
+        try:
+            result = await asyncio.wait_for(asyncio.shield(entry.future), timeout)
+        finally:
+            entry.waiters -= 1
+            if entry.waiters == 0 and not entry.future.done():
+                logger.info(f"abandoning plan {key}")
+                entry.future.cancel()
+                self._forget(key, entry)
+        result = copy.deepcopy(result)
+        result["id"] = plan.identifier
+        return result
+
+    def _forget(self, key, entry):
+        if self._in_flight.get(key) is entry:
+            del self._in_flight[key]
+
+    async def plan_many(self, plans, timeout=None) -> list:
+        """Plan each of `plans` concurrently, returning results or exceptions."""
+        return await asyncio.gather(
+            *(self.plan(plan, timeout) for plan in plans), return_exceptions=True
+        )
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
@@ -0,0 +1,194 @@
+import enum
+import functools
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import sqlite3
+import time
+from typing import TYPE_CHECKING
+
+import pydive
+
+if TYPE_CHECKING:
+    import pydive.dive
+
+logger = logging.getLogger(__name__)
+
+# Model attributes that change the decompression schedule or gas volumes
+settings = [
+    "first_stop",
+    "last_stop",
+    "first_stop_anchor",
+    "gas_switch_time",
+    "include_ascent_to_stop_in_stop",
+    "ascend_before_ceiling_check",
+    "switch_only_at_required_stop",
+    "low_gf",
+    "high_gf",
+    "conservatism_level",
+    "sac",
+]
+
+# Sources whose changes invalidate cached results
+versioned_sources = ["dive.py", "gas.py", "plan.py", "step_log.py", "models"]
+
+
+@functools.cache
+def model_version() -> str:
+    """Hash of the planning code, so cached results expire when it changes."""
+    root = pathlib.Path(pydive.__file__).parent
+    digest = hashlib.sha256()
+    for name in versioned_sources:
+        path = root / name
+        paths = sorted(path.rglob("*")) if path.is_dir() else [path]
+        for source in paths:
+            if source.suffix in (".py", ".csv"):
+                digest.update(str(source.relative_to(root)).encode())
+                digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+
+def _canonical(value):
+    if isinstance(value, enum.Enum):
+        return value.name
+    if hasattr(value, "fractions"):
+        return list(value.fractions)
+    return value
+
+
+def canonical_plan(dive: "pydive.dive.Dive") -> dict:
+    """Everything that determines the decompression of `dive`, as plain JSON.
+
+    Gases are represented by their fraction vectors and the model by its class and
+    the configuration in `settings` of it and the gas consumption model, so equal
+    plans built independently serialise identically. The state each model started
+    from is included, so a repetitive dive does not share a key with a fresh one.
+    """
+    model = dive.decompression_model
+    return {
+        "model": f"{type(model).__module__}.{type(model).__qualname__}",
+        "settings": {
+            name: _canonical(getattr(configured, name))
+            for configured in (model, dive.models["consumption"])
+            for name in settings
+            if hasattr(configured, name)
+        },
+        "initial_state": {
+            name: dive_model.initial_state()
+            for name, dive_model in dive.models.items()
+            if dive_model.initial_state() is not None
+        },
+        "ascent_rate": dive.default_ascent_rate,
+        "bottom_gas": _canonical(dive.bottom_gas),
+        "deco_gases": sorted(
+            [depth, _canonical(gas)] for depth, gas in dive.deco_gases.items()
+        ),
+        "steps": [
+            [_canonical(step.gas), step.start_depth, step.rate, step.duration]
+            for step in dive.steps
+        ],
+    }
+
+
+def plan_key(dive: "pydive.dive.Dive") -> str:
+    """SHA-256 of the canonical JSON serialisation of `dive`'s plan."""
+    serialised = json.dumps(
+        canonical_plan(dive), sort_keys=True, separators=(",", ":")
+    ).encode()
+    return hashlib.sha256(serialised).hexdigest()
+
+
+def default_path() -> pathlib.Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache"
+    return pathlib.Path(cache_home) / "pydive" / "plans.sqlite"
+
+
+class PlanCache:
+    """SQLite store of planning results shared between processes.
+
+    Entries are JSON documents keyed by `plan_key`. Entries written by a different
+    `model_version` are dropped on opening, and the least recently used entries are
+    evicted once the stored results exceed `max_bytes`.
+    """
+
+    max_bytes = 64 * 1024**2
+
+    def __init__(self, path=None, max_bytes=None):
+        self.path = pathlib.Path(path) if path is not None else default_path()
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        self.version = model_version()
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        with self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, version TEXT, value TEXT, size INTEGER, "
+                "accessed REAL)"
+            )
+            stale = self.connection.execute(
+                "DELETE FROM results WHERE version != ?", (self.version,)
+            ).rowcount
+        if stale:
+            logger.info(f"dropped {stale} results from other model versions")
+
+    def get(self, key: str) -> dict | None:
+        with self.connection:
+            row = self.connection.execute(
+                "SELECT value FROM results WHERE key = ? AND version = ?",
+                (key, self.version),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.connection.execute(
+                "UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: dict):
+        serialised = json.dumps(value)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (key, self.version, serialised, len(serialised), time.time()),
+            )
+            self.connection.execute(
+                "DELETE FROM results WHERE key IN ("
+                "SELECT key FROM (SELECT key, SUM(size) OVER "
+                "(ORDER BY accessed DESC, key) AS total FROM results) "
+                "WHERE total > ?)",
+                (self.max_bytes,),
+            )
+
+    @property
+    def size(self) -> int:
+        """Bytes of stored results."""
+        return self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()[0]
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+@functools.cache
+def open_cache(path=None) -> PlanCache:
+    """The `PlanCache` at `path` for this process, opened once."""
+    return PlanCache(path)
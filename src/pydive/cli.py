@@ -0,0 +1,97 @@
+"""Plan dives read as JSON Lines, writing one JSON result per line."""
+
+import argparse
+import concurrent.futures
+import itertools
+import json
+import logging
+import os
+import sys
+from typing import Iterable, Iterator
+
+from pydive.cache import default_path
+from pydive.plan import execute_json
+
+logger = logging.getLogger(__name__)
+
+
+def plan_lines(
+    lines: Iterable[str], processes: int = None, cache_path=None
+) -> Iterator[dict]:
+    """Plan each non-blank JSON line, yielding results as they finish.
+
+    Plans run across `processes` worker processes (all CPUs by default, or in this
+    process if 1). Input is read lazily and only a small window of plans is in
+    flight, so memory use does not depend on the number of plans. Results may come
+    out of input order; each carries the plan ``id`` or, failing that, its line
+    number. Results are cached in the `PlanCache` at `cache_path` if given.
+    """
+    numbered = ((index, line) for index, line in enumerate(lines) if line.strip())
+    if processes == 1:
+        for index, line in numbered:
+            yield execute_json(line, index, cache_path)
+        return
+
+    window = 2 * (processes or os.cpu_count() or 1)
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        pending = set()
+        while True:
+            for index, line in itertools.islice(numbered, window - len(pending)):
+                pending.add(executor.submit(execute_json, line, index, cache_path))
+            if not pending:
+                return
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                yield future.result()
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(prog="pydive", description=__doc__)
+    parser.add_argument(
+        "input",
+        nargs="?",
+        type=argparse.FileType("r"),
+        default=sys.stdin,
+        help="JSON Lines file of dive plans, stdin by default",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="file to write results to, stdout by default",
+    )
+    parser.add_argument(
+        "-j",
+        "--processes",
+        type=int,
+        default=None,
+        help="number of worker processes, all CPUs by default",
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const=str(default_path()),
+        default=None,
+        metavar="PATH",
+        help=f"reuse results cached in an SQLite file, {default_path()} by default",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    errors = 0
+    with args.input, args.output:
+        for result in plan_lines(args.input, args.processes, args.cache):
+            if "error" in result:
+                errors += 1
+            args.output.write(json.dumps(result) + "\n")
+            args.output.flush()
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
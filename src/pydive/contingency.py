@@ -0,0 +1,160 @@
+"""Contingency variants of a planned dive, planned side by side."""
+
+import concurrent.futures
+import dataclasses
+import logging
+from typing import TYPE_CHECKING
+
+from pydive.dive import Dive, DiveStep
+from pydive.plan import summary
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class Variant:
+    """A change to the planned dive to plan for.
+
+    The deepest part of the dive is made `extra_depth` m deeper and the last
+    stationary step there `extra_time` mins longer, and the deco gases switched to
+    at `lost_gases` are not available.
+    """
+
+    name: str
+    extra_depth: float = 0  # m
+    extra_time: float = 0  # mins
+    lost_gases: tuple[float, ...] = ()  # switch depths
+
+
+def standard_variants(dive: Dive) -> list[Variant]:
+    """The planned dive, +3 m/+3 min, +5 m/+5 min, a 5 min delayed ascent and the
+    loss of each deco gas."""
+    return [
+        Variant("planned"),
+        Variant("+3 m / +3 min", 3, 3),
+        Variant("+5 m / +5 min", 5, 5),
+        Variant("delayed ascent +5 min", 0, 5),
+    ] + [
+        Variant(f"lost {gas.label}", lost_gases=(depth,))
+        for depth, gas in sorted(dive.deco_gases.items(), reverse=True)
+    ]
+
+
+def _at(depth, max_depth):
+    return abs(depth - max_depth) < 1e-6
+
+
+def build_variant(prefix: Dive, steps: list[DiveStep], variant: Variant) -> Dive:
+    """Follow `steps` from a clone of `prefix`, changed as described by `variant`.
+
+    `steps` start with the descent to the maximum depth; `prefix` is the dive up to
+    that descent.
+    """
+    dive = prefix.clone()
+    max_depth = max(step.start_depth + step.depth_change for step in steps)
+    stationary = [
+        index
+        for index, step in enumerate(steps)
+        if step.rate == 0 and step.duration > 0 and _at(step.start_depth, max_depth)
+    ]
+    extended = stationary[-1] if stationary else None
+
+    for index, step in enumerate(steps):
+        start = step.start_depth
+        end = start + step.depth_change
+        start += variant.extra_depth if _at(start, max_depth) else 0
+        end += variant.extra_depth if _at(end, max_depth) else 0
+        if step.rate == 0:
+            duration = step.duration
+            if index == extended:
+                duration += variant.extra_time * 60
+        else:
+            duration = abs(end - start) / abs(step.rate) * 60
+        dive.apply_step(DiveStep(dive, step.gas, step.rate, duration))
+        if extended is None and index == 0 and variant.extra_time:
+            dive.stay(variant.extra_time)
+
+    dive.deco_gases = {
+        depth: gas
+        for depth, gas in dive.deco_gases.items()
+        if depth not in variant.lost_gases
+    }
+    return dive
+
+
+def _execute(name: str, dive: Dive) -> dict:
+    max_depth = max(step.start_depth + step.depth_change for step in dive.steps)
+    bottom_time = dive.duration
+    dive.decompress()
+    result = summary(dive, bottom_time)
+    logger.info(f"planned {name}: {result['runtime']:.0f} mins")
+    return {
+        "variant": name,
+        "max_depth": max_depth,
+        "bottom_time": bottom_time / 60,
+        "runtime": result["runtime"],
+        "tts": result["tts"],
+        "cns": result["cns"],
+        "otus": result["otus"],
+    } | result["gas"]
+
+
+def contingencies(
+    dive: Dive, variants: list[Variant] = None, processes: int = None
+) -> "pd.DataFrame":
+    """Plan contingency variants of `dive` and tabulate them side by side.
+
+    Only the steps before decompression are used, so `dive` may already be
+    decompressed; it is not modified. The dive up to the descent to its maximum
+    depth is simulated once and shared by all variants.
+
+    Parameters
+    ----------
+    dive
+        The planned dive, including its deco gases.
+    variants
+        Variants to plan, `standard_variants` by default.
+    processes
+        Number of worker processes planning variants in parallel, all CPUs by
+        default, or plan in this process if 1.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per variant with its maximum depth in m, bottom time, runtime and
+        TTS in mins, CNS fraction, OTUs and surface volume in l of each gas.
+
+    Raises
+    ------
+    ValueError
+        If the dive has no steps.
+    """
+    import pandas as pd
+
+    if not dive.steps:
+        raise ValueError("cannot plan contingencies for a dive without steps")
+    if variants is None:
+        variants = standard_variants(dive)
+
+    base = dive.clone()
+    base.reset()
+    max_depth = max(step.start_depth + step.depth_change for step in base.steps)
+    first = next(
+        index
+        for index, step in enumerate(base.steps)
+        if _at(step.start_depth + step.depth_change, max_depth)
+    )
+    steps = base.steps[first:]
+    base.undo_steps(len(steps))
+    dives = [build_variant(base, steps, variant) for variant in variants]
+    names = [variant.name for variant in variants]
+
+    if processes == 1:
+        rows = [_execute(name, variant) for name, variant in zip(names, dives)]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            rows = list(executor.map(_execute, names, dives))
+    return pd.DataFrame(rows).set_index("variant")
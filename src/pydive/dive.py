@@ -1,15 +1,16 @@
+import bisect
+import contextlib
 import copy
 import logging
 
-import pandas as pd
-import plotly.express as px
-
 from pydive.gas import GasBlend
 from pydive.models.base import Model
 from pydive.models.decompression.buhlmann import BuhlmannZHL16C
 from pydive.models.decompression.model import DecompressionModel
 from pydive.models.gas_consumption import GasConsumptionModel
 from pydive.models.oxygen_toxicity import CNSOxygenToxicity, PulmonaryOxygenToxicity
+from pydive.step_log import StepLog
+from pydive.utils import freeze, thaw
 
 logger = logging.getLogger(__name__)
 
@@ -61,12 +62,75 @@ class DiveStep:
         return f"{self.gas!r} @ {self.start_depth} m - {self.start_depth + self.depth_change} for {self.duration / 60:.1f} mins at {self.rate} m/min"
 
 
+class DecoGases(dict):
+    """Deco gases by switch depth, with the depths kept sorted for lookups.
+
+    Switch lookups happen at every step of the ascent, so the sorted depths are
+    cached and only rebuilt after the gases change.
+    """
+
+    _depths: list[float] | None = None
+
+    def _changed(self):
+        self._depths = None
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def setdefault(self, key, default=None):
+        self._changed()
+        return super().setdefault(key, default)
+
+    def pop(self, *args):
+        self._changed()
+        return super().pop(*args)
+
+    def popitem(self):
+        self._changed()
+        return super().popitem()
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def __ior__(self, other):
+        self._changed()
+        return super().__ior__(other)
+
+    @property
+    def depths(self) -> list[float]:
+        """Switch depths in increasing order."""
+        if self._depths is None:
+            self._depths = sorted(self)
+        return self._depths
+
+    def deepest_above(self, depth) -> float | None:
+        """The deepest switch depth shallower than `depth`."""
+        depths = self.depths
+        index = bisect.bisect_left(depths, depth)
+        return depths[index - 1] if index else None
+
+    def shallowest_from(self, depth) -> float | None:
+        """The shallowest switch depth at or deeper than `depth`."""
+        depths = self.depths
+        index = bisect.bisect_left(depths, depth)
+        return depths[index] if index < len(depths) else None
+
+
 class Dive:
     default_descent_rate = 10  # m/mins
     default_ascent_rate = 10  # m/mins
     steps: list[DiveStep]
     bottom_gas: GasBlend
-    deco_gases: dict[float, GasBlend]
 
     decompression_model: DecompressionModel
     in_decompression: bool = False
@@ -76,19 +140,31 @@ class Dive:
 
     @property
     def gas(self):
-        if not (self.steps + self.decompression_steps):
-            return self.bottom_gas
-        return (self.steps + self.decompression_steps)[-1].gas
+        if self.decompression_steps:
+            return self.decompression_steps[-1].gas
+        if self.steps:
+            return self.steps[-1].gas
+        return self.bottom_gas
 
     @property
     def depth(self):
-        return sum(
-            [step.depth_change for step in self.steps + self.decompression_steps]
-        )
+        return self._depths[-1]
 
     @property
     def duration(self):
-        return sum([step.duration for step in self.steps + self.decompression_steps])
+        return self._durations[-1]
+
+    @property
+    def deco_gases(self) -> DecoGases:
+        return self._deco_gases
+
+    @deco_gases.setter
+    def deco_gases(self, value: dict[float, GasBlend]):
+        self._deco_gases = DecoGases(value)
+
+    @property
+    def step_log(self):
+        return StepLog.from_steps(self.steps + self.decompression_steps)
 
     def __init__(self, gas, model=None):
         if model is None:
@@ -104,12 +180,18 @@ class Dive:
         self.deco_gases = {}
         self.steps = []
         self.decompression_steps = []
+        self.in_decompression = False
+        # Running totals so depth and duration do not rescan every step
+        self._depths = [0]
+        self._durations = [0]
 
     def apply_step(self, step: DiveStep):
         if not self.in_decompression:
             self.steps.append(step)
         else:
             self.decompression_steps.append(step)
+        self._depths.append(self._depths[-1] + step.depth_change)
+        self._durations.append(self._durations[-1] + step.duration)
 
         for model in self.models.values():
             model.apply_dive_step(step)
@@ -120,6 +202,8 @@ class Dive:
             self.steps.pop(-1)
         else:
             self.decompression_steps.pop(-1)
+        self._depths.pop(-1)
+        self._durations.pop(-1)
         for model in self.models.values():
             model.undo_last_step()
 
@@ -152,6 +236,8 @@ class Dive:
 
     @property
     def df(self):  # pragma: no cover
+        import pandas as pd
+
         depths = [0]
         times = [0]
         current_depth = 0
@@ -171,6 +257,8 @@ class Dive:
 
     @property
     def markdown(self):
+        import pandas as pd
+
         step_types = []
         depths = []
         durations = []
@@ -213,6 +301,8 @@ class Dive:
         return df.to_markdown(index=False)
 
     def plot_profile(self):  # pragma: no cover
+        import plotly.express as px
+
         fig = px.scatter(self.df, x="time", y="depth")
         fig.layout.yaxis.autorange = "reversed"
         fig.layout.xaxis.tickformat = "%M:%S"
@@ -221,6 +311,37 @@ class Dive:
     def clone(self):
         return copy.deepcopy(self)
 
+    def checkpoint(self):
+        """Frozen state of the dive so far, to copy it with `from_checkpoint`.
+
+        Unlike `clone`, the steps taken are shared with the copies rather than copied
+        and model histories are stored as tuples, so restoring a long dive costs
+        little more than a short one. Shared steps keep their original `dive`.
+        """
+        shared = ("decompression_model", "models", "steps", "decompression_steps")
+        attributes = {
+            name: value for name, value in vars(self).items() if name not in shared
+        }
+        return (
+            (tuple(self.steps), tuple(self.decompression_steps)),
+            freeze(attributes),
+            tuple((name, model.checkpoint()) for name, model in self.models.items()),
+        )
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint) -> "Dive":
+        """New dive in the state frozen by `checkpoint`."""
+        steps, attributes, models = checkpoint
+        dive = cls.__new__(cls)
+        dive.__dict__.update(thaw(attributes))
+        dive.steps, dive.decompression_steps = map(list, steps)
+        dive.models = {
+            name: model_cls.from_checkpoint(dive, state)
+            for name, (model_cls, state) in models
+        }
+        dive.decompression_model = dive.models["decompression"]
+        return dive
+
     def reset(self):
         logger.info("resetting")
         while self.decompression_steps:
@@ -248,6 +369,8 @@ class Dive:
         return new_dive
 
     def custom_df(self, column_functions: dict[str, callable]):
+        import pandas as pd
+
         df_dict = {"time": []}
         for column in column_functions:
             df_dict[column] = []
@@ -265,14 +388,84 @@ class Dive:
         df = pd.DataFrame(df_dict)
         return df
 
-    def decompress(self):
+    @contextlib.contextmanager
+    def _decompression_only(self):
+        # Only the decompression model follows the trial steps of the ascent; the
+        # other models are given the final ascent afterwards
         all_models = self.models
         all_models.pop("decompression")
         self.models = {"decompression": self.decompression_model}
-        stops = list(self.decompression_model.calculate_decompression_profile())
-        self.models.update(all_models)
-        for step in self.decompression_steps:
-            for model in all_models.values():
-                model.apply_dive_step(step)
+        try:
+            yield
+        finally:
+            self.models.update(all_models)
+            for step in self.decompression_steps:
+                for model in all_models.values():
+                    model.apply_dive_step(step)
+
+    def iter_decompression(self):
+        """Decompress, yielding each stop as soon as the model has found it.
+
+        Stops marked `provisional` belong to an intermediate schedule, such as a
+        VPM-B critical volume iteration, and are superseded by later stops. The
+        other models are updated with the decompression steps once the generator
+        finishes or is closed.
+        """
+        with self._decompression_only():
+            yield from self.decompression_model.calculate_decompression_profile()
 
-        return stops
+    def decompress(self):
+        return [stop for stop in self.iter_decompression() if not stop.provisional]
+
+    def decompress_continuously(self):
+        """Ascend to the surface without stops, as slowly as the ceiling requires.
+
+        See `BuhlmannBase.calculate_continuous_ascent`.
+        """
+        with self._decompression_only():
+            return self.decompression_model.calculate_continuous_ascent()
+
+    def contingencies(self, variants=None, processes=None):
+        """Plan contingency variants of this dive, see `pydive.contingency`."""
+        from pydive.contingency import contingencies
+
+        return contingencies(self, variants, processes)
+
+    def tts_curve(self, interval=1, extra_time=0):
+        """Time to surface if the ascent started at each `interval` minutes.
+
+        Uses `AscentProjection`, so the dive is not cloned or decompressed; the
+        whole curve costs about as much as a few plans. Only the steps before
+        decompression are considered and the deco gases are those of the dive.
+
+        Parameters
+        ----------
+        interval
+            Minutes between starting points, from the start of the dive. The end of
+            the planned steps is always included.
+        extra_time
+            Minutes to stay at the depth of each starting point before ascending,
+            e.g. 5 for "TTS if I stay 5 more minutes".
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            Times of the starting points and TTS in mins.
+
+        Raises
+        ------
+        ValueError
+            If the decompression model's ascents cannot be projected.
+        """
+        import numpy as np
+
+        from pydive.models.decompression.projection import AscentProjection
+
+        projection = AscentProjection(self.decompression_model)
+        bottom_time = sum(step.duration for step in self.steps) / 60
+        times = np.append(np.arange(0, bottom_time, interval), bottom_time)
+        pressures, depths, gases = projection.states_at(times)
+        if extra_time:
+            pressures = projection.stay(pressures, depths, gases, extra_time)
+        tts = projection.project(pressures, depths, gases, self.deco_gases).tts
+        return times, tts
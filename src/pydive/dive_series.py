@@ -0,0 +1,100 @@
+import logging
+
+from pydive.dive import Dive
+from pydive.gas import GasBlend
+
+logger = logging.getLogger(__name__)
+
+
+class DiveSeries:
+    """Repetitive dives sharing residual tissue and oxygen toxicity state.
+
+    Each new dive starts from the state its models held at the end of the
+    previous dive, advanced analytically over the surface interval by
+    `Model.surface_interval`, so no steps are simulated at the surface.
+    Pulmonary OTUs are not carried into the next dive but summed per day. VPM-B
+    does not support repetitive dives.
+    """
+
+    minutes_per_day = 24 * 60
+
+    dives: list[Dive]
+    start_times: list[float]  # mins since the start of the first dive
+
+    def __init__(self, model=None):
+        self.model = model
+        self.dives = []
+        self.start_times = []
+
+    def new_dive(self, gas: GasBlend, surface_interval=0, model=None) -> Dive:
+        """Start a dive on `gas` `surface_interval` minutes after the last one.
+
+        Parameters
+        ----------
+        gas
+            Bottom gas of the new dive.
+        surface_interval
+            Minutes spent at the surface breathing air since the end of the
+            previous dive. Ignored for the first dive of the series.
+        model
+            Decompression model type, the series default if None.
+
+        Raises
+        ------
+        ValueError
+            If the model cannot carry state over from the previous dive.
+        """
+        if model is None:
+            model = self.model
+        dive = Dive(gas, model=model)
+
+        if self.dives:
+            previous = self.dives[-1]
+            start_time = (
+                self.start_times[-1] + previous.duration / 60 + surface_interval
+            )
+            for key, dive_model in dive.models.items():
+                previous_model = previous.models[key]
+                if type(previous_model) is not type(dive_model):
+                    logger.warning(
+                        f"{key} model changed to {dive_model.name}, not carrying state"
+                    )
+                    continue
+                dive_model.load_state(previous_model.state())
+                dive_model.surface_interval(surface_interval)
+        else:
+            start_time = 0
+
+        logger.info(f"dive {len(self.dives) + 1} starts at {start_time:.0f} mins")
+        self.dives.append(dive)
+        self.start_times.append(start_time)
+        return dive
+
+    def day(self, index) -> int:
+        """Day of the series, counting from 0, on which dive `index` starts."""
+        return int(self.start_times[index] // self.minutes_per_day)
+
+    @property
+    def daily_otus(self) -> dict[int, float]:
+        rtn = {}
+        for index, dive in enumerate(self.dives):
+            day = self.day(index)
+            rtn[day] = rtn.get(day, 0) + dive.models["pulmonary"].otus
+        return rtn
+
+    @property
+    def total_otus(self) -> float:
+        return sum(dive.models["pulmonary"].otus for dive in self.dives)
+
+    @property
+    def cns(self) -> float:
+        """CNS fraction at the end of the last dive."""
+        if not self.dives:
+            return 0
+        return self.dives[-1].models["cns"].fraction
+
+    def __len__(self):
+        return len(self.dives)
+
+    def __iter__(self):
+        return iter(self.dives)
@@ -1,12 +1,16 @@
 import abc
+import functools
 import itertools
+import types
+import weakref
 
 
 class Gas(abc.ABC):
     name: str
     formula: str
+    index: int  # position in GasBlend.fractions
 
-    virial_coefficients: list[float]
+    virial_coefficients: tuple[float, ...]
 
     @staticmethod
     def get_gas_type(gas):
@@ -20,66 +24,151 @@ class Gas(abc.ABC):
 
     @classmethod
     def virial_m1(cls, pressure):
-        return sum(
-            [
-                cls.virial_coefficients[i] * pressure ** (i + 1)
-                for i in range(0, len(cls.virial_coefficients))
-            ]
-        )
+        return horner(cls.virial_coefficients, pressure)
+
+
+def horner(coefficients, pressure):
+    """Evaluate ``sum(c_i * pressure ** (i + 1))`` using Horner's scheme.
+
+    `pressure` may be a scalar or a NumPy array.
+    """
+    rtn = 0
+    for coefficient in reversed(coefficients):
+        rtn = (rtn + coefficient) * pressure
+    return rtn
 
 
 class Oxygen(Gas):
     name = "oxygen"
+    index = 0
     formula = "O2"
 
-    virial_coefficients = [-7.18092073703e-04, +2.81852572808e-06, -1.50290620492e-09]
+    virial_coefficients = (-7.18092073703e-04, +2.81852572808e-06, -1.50290620492e-09)
 
 
 class Nitrogen(Gas):
     name = "nitrogen"
+    index = 1
     formula = "N2"
 
-    virial_coefficients = [-2.19260353292e-04, +2.92844845532e-06, -2.07613482075e-09]
+    virial_coefficients = (-2.19260353292e-04, +2.92844845532e-06, -2.07613482075e-09)
 
 
 class Helium(Gas):
     name = "helium"
+    index = 2
     formula = "He"
 
-    virial_coefficients = [+4.87320026468e-04, -8.83632921053e-08, +5.33304543646e-11]
+    virial_coefficients = (+4.87320026468e-04, -8.83632921053e-08, +5.33304543646e-11)
 
 
-_gas_name_map: dict[str, type(Gas)] = {}
+# Built once every gas is defined and read-only, so it can be shared between threads
+_gas_name_map: types.MappingProxyType[str, type(Gas)] = types.MappingProxyType(
+    {G.name: G for G in Gas.__subclasses__()}
+)
 
 
 def gas_name_map():
-    global _gas_name_map
-    if _gas_name_map == {}:
-        _gas_name_map = {G.name: G for G in Gas.__subclasses__()}
     return _gas_name_map
 
 
 class GasBlend:
+    """An immutable blend of gases.
+
+    Blends are interned, so creating a blend with the same fractions as an existing
+    one returns that blend. Blends that are no longer referenced are dropped from the
+    intern table. The fraction of each gas is stored in `fractions`,
+    indexed by `Gas.index`.
+    """
+
     max_pO2 = 1.6
     min_pO2 = 0.16
 
     max_pNarc = 4.0
 
-    def __init__(self, **kwargs):
-        self.blend: dict[type(Gas), float] = {}
-        self.set_blend(**kwargs)
+    fractions: tuple[float, ...]
+    blend: types.MappingProxyType
+    virial_coefficients: tuple[float, ...]
+    surface_compressibility: float
 
-    def set_blend(self, **kwargs):
+    _interned: weakref.WeakValueDictionary[tuple[float, ...], "GasBlend"] = (
+        weakref.WeakValueDictionary()
+    )
+
+    def __new__(cls, **kwargs):
         total_fraction = sum(kwargs.values())
         if not abs(total_fraction - 1) < 0.01:
             raise ValueError(
                 f"Gas fractions should sum to 1 but instead sum to {total_fraction}"
             )
+        fractions = [0.0] * len(gas_name_map())
         for gas, fraction in kwargs.items():
             if gas not in gas_name_map():
                 raise ValueError(f"unknown gas {gas}")
             if fraction > 0:
-                self.blend[gas_name_map()[gas]] = fraction / total_fraction
+                fractions[gas_name_map()[gas].index] = fraction / total_fraction
+        return cls.from_fractions(tuple(fractions))
+
+    @classmethod
+    def from_fractions(cls, fractions: tuple[float, ...]):
+        """Return the interned blend with `fractions` ordered by `Gas.index`."""
+        fractions = tuple(float(fraction) for fraction in fractions)
+        if len(fractions) != len(gas_name_map()):
+            raise ValueError(f"Expected {len(gas_name_map())} fractions")
+        blend = cls._interned.get(fractions)
+        if blend is None:
+            blend = object.__new__(cls)
+            gases = sorted(gas_name_map().values(), key=lambda gas: gas.index)
+            object.__setattr__(blend, "fractions", fractions)
+            object.__setattr__(
+                blend,
+                "blend",
+                types.MappingProxyType(
+                    {gas: fractions[gas.index] for gas in gases if fractions[gas.index]}
+                ),
+            )
+            # Combine the virial coefficients of each gas once so compressibility is
+            # a single polynomial evaluation
+            coefficients = [
+                [fraction * coefficient for coefficient in gas.virial_coefficients]
+                for gas, fraction in blend.blend.items()
+            ]
+            object.__setattr__(
+                blend,
+                "virial_coefficients",
+                tuple(
+                    sum(gas)
+                    for gas in itertools.zip_longest(*coefficients, fillvalue=0)
+                ),
+            )
+            object.__setattr__(
+                blend, "surface_compressibility", blend.compressibility(1)
+            )
+            blend = cls._interned.setdefault(fractions, blend)
+        return blend
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other):
+        if not isinstance(other, GasBlend):
+            return NotImplemented
+        return self.fractions == other.fractions
+
+    def __hash__(self):
+        return hash(self.fractions)
+
+    def __reduce__(self):
+        return _blend_from_fractions, (self.fractions,)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __str__(self):
         rtn = "Gas blend"
@@ -103,9 +192,13 @@ class GasBlend:
         return True
 
     def __repr__(self):
+        return self.label
+
+    @functools.cached_property
+    def label(self):
         if len(self.blend) == 1:
             return list(self.blend.keys())[0].name.title()
-        if self.blend == air.blend or (
+        if self.fractions == air.fractions or (
             self.fraction(Oxygen) == 0.21 and self.fraction(Nitrogen) == 0.79
         ):
             return "air"
@@ -119,10 +212,9 @@ class GasBlend:
             raise ValueError("Unknown blend type\n" + self.__str__())
 
     def fraction(self, gas):
-        gas_type = Gas.get_gas_type(gas)
-        if gas_type not in self.blend:
-            return 0
-        return self.blend[gas_type]
+        if isinstance(gas, str):
+            gas = Gas.get_gas_type(gas)
+        return self.fractions[gas.index]
 
     @property
     def max_operating_depth(self):
@@ -152,22 +244,19 @@ class GasBlend:
         return (depth / 10 + 1) * self.fraction(gas)
 
     def compressibility(self, pressure):
-        rtn = 1 + sum(
-            [self.fraction(gas) * gas.virial_m1(pressure) for gas in self.blend]
-        )
+        """Compressibility factor Z at `pressure` (bar), a scalar or NumPy array."""
+        return 1 + horner(self.virial_coefficients, pressure)
+
+    def compressibility_gradient(self, pressure):
+        """Derivative of the compressibility factor with respect to pressure."""
+        rtn = 0
+        for i, coefficient in reversed(list(enumerate(self.virial_coefficients))):
+            rtn = rtn * pressure + (i + 1) * coefficient
         return rtn
 
-    @property
-    def virial_coefficients(self):
-        coefficients = [
-            [
-                self.fraction(gas) * coefficient
-                for coefficient in gas.virial_coefficients
-            ]
-            for gas in self.blend
-        ]
 
-        return [sum(gas) for gas in itertools.zip_longest(*coefficients, fillvalue=0)]
+def _blend_from_fractions(fractions):
+    return GasBlend.from_fractions(fractions)
 
 
 air = GasBlend(oxygen=0.2098, nitrogen=0.7902)
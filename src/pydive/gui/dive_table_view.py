@@ -1,10 +1,13 @@
+import dataclasses
 import logging
 
 import gi
 
 from pydive.dive import Dive
+from pydive.gas import GasBlend
 from pydive.gui.dive_point_view import DivePointView
 from pydive.gui.gas_blend_view import GasBlendView
+from pydive.plan import IncrementalBuilder, Waypoint
 
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
@@ -13,6 +16,18 @@ from gi.repository import Gtk, GObject
 logger = logging.getLogger(__name__)
 
 
+@dataclasses.dataclass(frozen=True)
+class DiveSnapshot:
+    """Immutable copy of the dive table, safe to hand to a worker thread."""
+
+    gas: GasBlend
+    waypoints: tuple[Waypoint, ...]
+    deco_gases: tuple[tuple[float, GasBlend], ...]
+
+    def build(self, builder: IncrementalBuilder) -> Dive:
+        return builder.build(self.gas, self.waypoints, dict(self.deco_gases))
+
+
 @Gtk.Template(resource_path="/io/github/slaclau/pydive/gtk/dive_table_view.ui")
 class DiveTableView(Gtk.Box):
     __gtype_name__ = "DiveTableView"
@@ -20,8 +35,6 @@ class DiveTableView(Gtk.Box):
     gas_blend_view: GasBlendView = Gtk.Template.Child()
     dive_point_view: DivePointView = Gtk.Template.Child()
 
-    dive: Dive
-
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.gas_blend_view.add_gas(None)
@@ -36,25 +49,20 @@ class DiveTableView(Gtk.Box):
             "points-changed", lambda _: self.emit("dive-changed")
         )
 
-    def create_dive(self):
+    def snapshot(self) -> DiveSnapshot:
+        """Read the table into a `DiveSnapshot`, without simulating anything."""
         steps = self.dive_point_view.dive_points
-        dive = Dive(steps[0].gas.gas)
-        for step in steps:
-            if step.gas.gas != dive.gas:
-                dive.switch_gas(step.gas.gas)
-            if step.depth > dive.depth:
-                time = dive.descend(step.depth).minutes
-            elif step.depth < dive.depth:
-                time = dive.ascend(step.depth).minutes
-            else:
-                time = 0
-            assert step.duration >= time
-            dive.stay(step.duration - time)
-        for gas in self.gas_blend_view.gases:
-            dive.deco_gases[gas.switch_depth] = gas.gas
-        return dive
+        return DiveSnapshot(
+            gas=steps[0].gas.gas,
+            waypoints=tuple(
+                Waypoint(depth=step.depth, duration=step.duration, gas=step.gas.gas)
+                for step in steps
+            ),
+            deco_gases=tuple(
+                (gas.switch_depth, gas.gas) for gas in self.gas_blend_view.gases
+            ),
+        )
 
     @GObject.Signal
     def dive_changed(self):
-        self.dive = self.create_dive()
-        logger.debug(f"dive created: {self.dive.markdown}")
+        logger.debug("dive changed")
@@ -1,15 +1,49 @@
-from plotly.subplots import make_subplots
-import pandas as pd
+import json
 
 import gi
+import numpy as np
 
 gi.require_version("Adw", "1")
 gi.require_version("Gtk", "4.0")
 gi.require_version("WebKit", "6.0")
 from gi.repository import Adw, Gtk
-from gi.repository.WebKit import WebView
+from gi.repository.WebKit import LoadEvent, WebView
 
 import pydive.dive
+from pydive.utils import largest_triangle_three_buckets
+
+# Loaded into the web view once; each update only sends the new data to update()
+page = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<script>{plotly}</script>
+</head>
+<body style="margin: 0">
+<div id="plot" style="width: 100%; height: 80vh"></div>
+<pre id="summary"></pre>
+<script>
+function update(summary, figure) {{
+    document.getElementById("summary").textContent = summary;
+    Plotly.react("plot", figure.data, figure.layout, {{responsive: true}});
+}}
+</script>
+</body>
+</html>
+"""
+
+layout = {
+    "hovermode": "x unified",
+    "yaxis": {"autorange": "reversed"},
+    "yaxis2": {"autorange": "reversed", "overlaying": "y", "side": "right"},
+    # Keep zoom and hidden traces across updates
+    "uirevision": "dive",
+}
+
+
+def trace(x, y, points, **kwargs) -> dict:
+    indices = largest_triangle_three_buckets(x, y, points)
+    return dict(type="scatter", x=x[indices].tolist(), y=y[indices].tolist(), **kwargs)
 
 
 @Gtk.Template(resource_path="/io/github/slaclau/pydive/gtk/dive_viewer.ui")
@@ -18,9 +52,33 @@ class DiveViewer(Adw.Bin):
 
     web_view: WebView = Gtk.Template.Child()
 
+    default_points = 1000  # per trace, when the view has no width yet
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._page_state = None  # None, "loading" or "loaded"
+        self._pending = None
+        self.web_view.connect("load-changed", self._on_load_changed)
+
     def display_dive(self, dive: pydive.dive.Dive):
-        print(dive.markdown)
-        self.web_view.load_plain_text(dive.markdown)
+        self.show(*self.render(dive, points=self.get_width()))
+
+    @classmethod
+    def render(cls, dive: pydive.dive.Dive, cancelled=lambda: False, points=None):
+        """Build the markdown summary and plot data for a decompressed `dive`.
+
+        No widgets are touched, so this can run on a worker thread. Each trace is
+        decimated to about `points` points, one per pixel of the view's width.
+        Returns None if `cancelled()` becomes true between the expensive phases.
+
+        Returns
+        -------
+        tuple[str, str]
+            The markdown summary and the JSON ``data`` and ``layout`` of the figure.
+        """
+        if not points:
+            points = cls.default_points
+        markdown = dive.markdown
 
         funcs = {
             "depth": lambda dive: dive.depth,
@@ -30,32 +88,61 @@ class DiveViewer(Adw.Bin):
             "ceilings": lambda dive: dive.decompression_model.ceilings(),
         }
         df = dive.reinterpolate_dive().custom_df(funcs)
-        df = pd.concat(
-            [
-                df,
-                pd.DataFrame(
-                    df.ceilings.to_list(),
-                    columns=[f"ceiling_{i}" for i in range(0, 16)],
-                ),
-            ],
-            axis=1,
-        )
-
-        fig = make_subplots(specs=[[{"secondary_y": True}]])
-        fig.update_layout(hovermode="x unified")
-        fig.update_yaxes(autorange="reversed")
-        fig.add_scatter(x=df.time, y=df.depth, name="Depth")
-        fig.add_scatter(x=df.time, y=df.gf, secondary_y=True, name="Gradient Factor")
-        fig.add_scatter(x=df.time, y=df.ceiling, name="Ceiling")
-        fig.add_scatter(x=df.time, y=df.loading, secondary_y=True, name="Loading")
-
-        for i in range(0, 16):
-            fig.add_scatter(
-                x=df.time,
-                y=df[f"ceiling_{i}"],
-                name=f"Ceiling in {i}",
-                fill="tozeroy",
-                line_color="green",
+        if cancelled():
+            return None
+
+        time = df.time.to_numpy(dtype=float)
+        data = [
+            trace(time, df.depth.to_numpy(dtype=float), points, name="Depth"),
+            trace(
+                time,
+                df.gf.to_numpy(dtype=float),
+                points,
+                name="Gradient Factor",
+                yaxis="y2",
+            ),
+            trace(time, df.ceiling.to_numpy(dtype=float), points, name="Ceiling"),
+            trace(
+                time,
+                df.loading.to_numpy(dtype=float),
+                points,
+                name="Loading",
+                yaxis="y2",
+            ),
+        ]
+        ceilings = np.array(df.ceilings.to_list(), dtype=float)
+        for i in range(0, ceilings.shape[1]):
+            data.append(
+                trace(
+                    time,
+                    ceilings[:, i],
+                    points,
+                    name=f"Ceiling in {i}",
+                    fill="tozeroy",
+                    line={"color": "green"},
+                )
             )
+        if cancelled():
+            return None
+
+        return markdown, json.dumps({"data": data, "layout": layout})
+
+    def show(self, markdown: str, figure: str):
+        self._pending = f"update({json.dumps(markdown)}, {figure});"
+        if self._page_state is None:
+            from plotly.offline import get_plotlyjs
+
+            self._page_state = "loading"
+            self.web_view.load_html(page.format(plotly=get_plotlyjs()))
+        elif self._page_state == "loaded":
+            self._flush()
+
+    def _on_load_changed(self, web_view, event):
+        if event == LoadEvent.FINISHED:
+            self._page_state = "loaded"
+            self._flush()
 
-        self.web_view.load_html(fig.to_html())
+    def _flush(self):
+        script, self._pending = self._pending, None
+        if script is not None:
+            self.web_view.evaluate_javascript(script, -1, None, None, None, None)
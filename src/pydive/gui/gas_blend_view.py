@@ -25,7 +25,7 @@ class GasChoice(GObject.Object):
     def oxygen(self, value):
         helium = self.helium
         nitrogen = 100 - value - helium
-        self.gas.set_blend(
+        self.gas = GasBlend(
             oxygen=value / 100, helium=helium / 100, nitrogen=nitrogen / 100
         )
         self.emit_notifies()
@@ -38,7 +38,7 @@ class GasChoice(GObject.Object):
     def helium(self, value):
         oxygen = self.oxygen
         nitrogen = 100 - value - oxygen
-        self.gas.set_blend(
+        self.gas = GasBlend(
             oxygen=oxygen / 100, helium=value / 100, nitrogen=nitrogen / 100
         )
         self.emit_notifies()
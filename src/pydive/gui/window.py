@@ -1,3 +1,4 @@
+import concurrent.futures
 import logging
 
 import gi
@@ -8,10 +9,11 @@ from pydive.gui.dive_table_view import DiveTableView
 from pydive.gui.dive_viewer import DiveViewer
 from pydive.gui.gas_blend_view import GasBlendView, GasChoice
 from pydive.gui.gas_blender import GasBlenderDialog
+from pydive.plan import IncrementalBuilder
 
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
-from gi.repository import Adw, Gio, Gtk
+from gi.repository import Adw, Gio, GLib, Gtk
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +25,8 @@ class PyDiveWindow(Adw.ApplicationWindow):
     dive_table_view: DiveTableView = Gtk.Template.Child()
     dive_viewer: DiveViewer = Gtk.Template.Child()
 
+    recompute_delay = 250  # ms to wait for further edits before replanning
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
@@ -35,18 +39,66 @@ class PyDiveWindow(Adw.ApplicationWindow):
             self.add_action(gaction)
         logger.debug("actions added")
 
-        def get_decompressed_dive(view):
-            dive = view.dive
-            dive.decompress()
-            return dive
-
-        self.dive_table_view.connect(
-            "dive-changed",
-            lambda view: self.dive_viewer.display_dive(get_decompressed_dive(view)),
+        # Building, planning and plotting run on a worker thread, which alone uses
+        # the builder. Each edit starts a new generation; work for older
+        # generations is abandoned as soon as it notices
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="pydive-planner"
         )
+        self._builder = IncrementalBuilder()
+        self._generation = 0
+        self._pending_source = None
+
+        self.dive_table_view.connect("dive-changed", self._on_dive_changed)
+        self.connect("close-request", self._on_close_request)
 
         logger.debug("window created")
 
+    def _on_dive_changed(self, view):
+        self._generation += 1
+        if self._pending_source is not None:
+            GLib.source_remove(self._pending_source)
+        self._pending_source = GLib.timeout_add(
+            self.recompute_delay, self._start_recompute, view, self._generation
+        )
+
+    def _start_recompute(self, view, generation):
+        self._pending_source = None
+        points = self.dive_viewer.get_width()
+        self._executor.submit(self._recompute, view.snapshot(), generation, points)
+        return GLib.SOURCE_REMOVE
+
+    def _is_stale(self, generation):
+        return generation != self._generation
+
+    def _recompute(self, snapshot, generation, points):
+        try:
+            dive = snapshot.build(self._builder)
+            if self._is_stale(generation):
+                return
+            stops = dive.iter_decompression()
+            for _ in stops:
+                if self._is_stale(generation):
+                    stops.close()
+                    logger.debug(f"abandoned planning generation {generation}")
+                    return
+            result = DiveViewer.render(dive, lambda: self._is_stale(generation), points)
+        except Exception:
+            logger.exception(f"failed to plan generation {generation}")
+            return
+        if result is not None:
+            GLib.idle_add(self._show_result, generation, result)
+
+    def _show_result(self, generation, result):
+        if not self._is_stale(generation):
+            self.dive_viewer.show(*result)
+        return GLib.SOURCE_REMOVE
+
+    def _on_close_request(self, window):
+        self._generation += 1
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        return False
+
     def _on_show_gas_blender_activate(self, obj, pspec):
         logger.debug("show_gas_blender activated")
         dialog = GasBlenderDialog()
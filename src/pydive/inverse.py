@@ -0,0 +1,207 @@
+"""Inverse planning: the longest or deepest dive that stays within limits."""
+
+import dataclasses
+import logging
+
+import numpy as np
+
+from pydive.dive import Dive
+from pydive.gas import GasBlend
+from pydive.models.decompression.projection import AscentProjection
+from pydive.models.gas_consumption import step_consumption
+from pydive.models.oxygen_toxicity import oxygen_exposure
+from pydive.step_log import StepLog
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class Limits:
+    """Constraints on a whole dive, ignored where None."""
+
+    tts: float | None = None  # mins
+    cns: float | None = None  # fraction
+    otus: float | None = None
+    gas: dict[GasBlend, float] = dataclasses.field(default_factory=dict)  # l
+
+    @property
+    def needs_profile(self):
+        return self.cns is not None or self.otus is not None or bool(self.gas)
+
+
+class _Probe:
+    # Evaluates batches of candidate bottom phases appended to a dive's current
+    # state, projecting every ascent at once
+
+    def __init__(self, dive: Dive, limits: Limits):
+        self.dive = dive
+        self.limits = limits
+        self.projection = AscentProjection(dive.decompression_model)
+        self.pressures = self.projection.pressures()
+        self.probes = 0
+
+    def feasible(self, pressures, depth, bottoms: list[list[StepLog]]) -> np.ndarray:
+        self.probes += len(bottoms)
+        limits = self.limits
+        result = self.projection.project(
+            pressures,
+            depth,
+            self.dive.gas,
+            self.dive.deco_gases,
+            steps=limits.needs_profile,
+        )
+        rtn = np.ones(len(bottoms), dtype=bool)
+        if limits.tts is not None:
+            rtn &= result.tts <= limits.tts
+        if limits.needs_profile:
+            for index, (bottom, ascent) in enumerate(zip(bottoms, result.step_logs)):
+                rtn[index] &= self._within([*bottom, ascent])
+        return rtn
+
+    def _within(self, logs):
+        limits = self.limits
+        models = self.dive.models
+        otus = models["pulmonary"].otus
+        cns = models["cns"].fraction
+        volumes = dict(models["consumption"].consumption)
+        for log in logs:
+            if not len(log):
+                continue
+            log_otus, log_cns = oxygen_exposure(log)
+            otus += log_otus[-1]
+            cns += log_cns[-1]
+            consumption = step_consumption(log, models["consumption"].sac)
+            for index, gas in enumerate(log.gases):
+                volume = consumption[log.gas_index == index].sum()
+                volumes[gas] = volumes.get(gas, 0) + volume
+        return (
+            (limits.otus is None or otus <= limits.otus)
+            and (limits.cns is None or cns <= limits.cns)
+            and all(volumes.get(gas, 0) <= limit for gas, limit in limits.gas.items())
+        )
+
+
+def _bottom_log(depth, to, minutes, gas) -> StepLog:
+    minutes = float(minutes)
+    return StepLog(
+        start_depth=np.array([depth], dtype=float),
+        rate=np.array([(to - depth) / minutes if minutes else 0.0]),
+        duration=np.array([minutes * 60]),
+        gas_index=np.zeros(1, dtype=int),
+        gases=(gas,),
+    )
+
+
+def _search(feasible, low, high, resolution, batch=16):
+    # Largest value between low and high, a multiple of resolution above low,
+    # that is feasible, assuming feasibility only changes once. Each round
+    # evaluates a batch of candidates so that few rounds are needed.
+    if not feasible(np.array([low]))[0]:
+        raise ValueError("limits are exceeded at the start of the search")
+    steps = int(np.floor((high - low) / resolution + 1e-9))
+    # Gallop over doubling steps to bracket the limit, then refine between
+    doubling = 2 ** np.arange(int(np.log2(max(steps, 1))) + 1)
+    candidates = np.unique(np.append(np.minimum(doubling, steps), steps))
+    lower, upper = 0, None
+    while candidates.size:
+        ok = feasible(low + candidates * resolution)
+        failed = np.flatnonzero(~ok)
+        if failed.size:
+            upper = candidates[failed[0]]
+            passed = candidates[: failed[0]]
+        else:
+            passed = candidates
+        if passed.size:
+            lower = max(lower, passed[-1])
+        if upper is None or upper - lower <= 1:
+            break
+        candidates = np.unique(
+            np.linspace(lower, upper, min(batch, upper - lower - 1) + 2)[1:-1].astype(
+                int
+            )
+        )
+    return low + lower * resolution
+
+
+def max_bottom_time(
+    dive: Dive, limits: Limits, resolution=1, max_time=24 * 60
+) -> float:
+    """Longest further stay at the dive's current depth that stays within `limits`.
+
+    Each candidate is evaluated from the dive's current tissue state with
+    `AscentProjection`, many at a time, so the answer costs a few plans.
+
+    Parameters
+    ----------
+    dive
+        The dive so far, with its deco gases. It is not modified.
+    limits
+        Constraints on TTS, oxygen toxicity and gas use of the whole dive.
+    resolution
+        Minutes to round the answer down to.
+    max_time
+        Longest stay considered, in mins.
+
+    Raises
+    ------
+    ValueError
+        If the limits are exceeded without staying, or the dive's ascents cannot be
+        projected.
+    """
+    probe = _Probe(dive, limits)
+    depth, gas = dive.depth, dive.gas
+
+    def feasible(minutes):
+        pressures = probe.projection.stay(
+            np.broadcast_to(probe.pressures, (len(minutes),) + probe.pressures.shape),
+            depth,
+            gas,
+            minutes,
+        )
+        bottoms = [[_bottom_log(depth, depth, t, gas)] for t in minutes]
+        return probe.feasible(pressures, depth, bottoms)
+
+    rtn = _search(feasible, 0, max_time, resolution)
+    logger.info(f"max bottom time {rtn} mins after {probe.probes} probes")
+    return rtn
+
+
+def max_depth(dive: Dive, bottom_time: float, limits: Limits, resolution=1) -> float:
+    """Deepest depth that can be reached and held for `bottom_time` within `limits`.
+
+    The descent from the dive's current depth at its default descent rate counts
+    towards `bottom_time`, as for a `pydive.plan.Waypoint`. Depths up to the
+    maximum operating depth of the dive's gas are considered.
+
+    Raises
+    ------
+    ValueError
+        If even the current depth exceeds the limits, or the dive's ascents cannot
+        be projected.
+    """
+    probe = _Probe(dive, limits)
+    start, gas = dive.depth, dive.gas
+    rate = dive.default_descent_rate
+
+    def feasible(depths):
+        descent = (depths - start) / rate
+        if (descent > bottom_time).any():
+            raise ValueError(f"cannot reach {depths.max()} m within {bottom_time} mins")
+        pressures = np.broadcast_to(
+            probe.pressures, (len(depths),) + probe.pressures.shape
+        )
+        pressures = probe.projection.travel(pressures, start, depths, gas, descent)
+        pressures = probe.projection.stay(pressures, depths, gas, bottom_time - descent)
+        bottoms = [
+            [
+                _bottom_log(start, depth, minutes, gas),
+                _bottom_log(depth, depth, bottom_time - minutes, gas),
+            ]
+            for depth, minutes in zip(depths, descent)
+        ]
+        return probe.feasible(pressures, depths, bottoms)
+
+    high = min(gas.max_operating_depth, start + bottom_time * rate)
+    rtn = _search(feasible, start, high, resolution)
+    logger.info(f"max depth {rtn} m after {probe.probes} probes")
+    return rtn
@@ -0,0 +1,141 @@
+import collections
+import concurrent.futures
+import dataclasses
+import functools
+import logging
+import os
+from typing import Iterator
+from xml.etree import ElementTree
+
+from pydive.dive import Dive, DiveStep
+from pydive.logbook.samples import LoggedDive, local_name
+from pydive.logbook.subsurface import iter_subsurface
+from pydive.logbook.uddf import iter_uddf
+from pydive.models.decompression.buhlmann import BuhlmannBase, BuhlmannZHL16C
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class DiveSummary:
+    identifier: str | None
+    duration: float  # s
+    max_depth: float  # m
+    max_gf: float
+    cns: float
+    otus: float
+    ceiling_violations: int
+
+
+def _root_tag(source) -> str:
+    if hasattr(source, "read"):
+        position = source.tell()
+        _, root = next(ElementTree.iterparse(source, events=("start",)))
+        source.seek(position)
+    else:
+        with open(source, "rb") as file:
+            _, root = next(ElementTree.iterparse(file, events=("start",)))
+    return local_name(root.tag)
+
+
+def iter_logbook(source) -> Iterator[LoggedDive]:
+    """Yield the dives of a UDDF or Subsurface XML logbook at `source`."""
+    match _root_tag(source):
+        case "uddf":
+            return iter_uddf(source)
+        case "divelog" | "dives":
+            return iter_subsurface(source)
+        case tag:
+            raise ValueError(f"unknown logbook format with root element {tag}")
+
+
+def replay(logged_dive: LoggedDive, model=None, settings: dict = None):
+    """Replay a logged dive through the dive models and summarise it.
+
+    The deco model must be a Bühlmann model. Its gradient factor is anchored at the
+    deepest GF low ceiling reached so far, as when planning with
+    `FirstStopAnchor.CEILING_AT_START_OF_DECO`, and each step that ends shallower
+    than the resulting ceiling counts as a ceiling violation.
+
+    Parameters
+    ----------
+    logged_dive
+        The dive to replay.
+    model
+        The decompression model class, `BuhlmannZHL16C` by default.
+    settings
+        Attributes to set on the decompression model, e.g. ``low_gf``.
+
+    Returns
+    -------
+    tuple[Dive, DiveSummary]
+        The replayed dive and its summary.
+    """
+    if model is None:
+        model = BuhlmannZHL16C
+    if not issubclass(model, BuhlmannBase):
+        raise ValueError(f"Replay requires a Buhlmann model, not {model.name}")
+
+    step_log = logged_dive.step_log
+    gas = step_log.gases[step_log.gas_index[0]] if len(step_log) else step_log.gases[0]
+    dive = Dive(gas, model=model)
+    deco = dive.decompression_model
+    for name, value in (settings or {}).items():
+        setattr(deco, name, value)
+
+    max_gf = 0
+    violations = 0
+    for rate, duration, index in zip(
+        step_log.rate.tolist(), step_log.duration.tolist(), step_log.gas_index.tolist()
+    ):
+        dive.apply_step(DiveStep(dive, step_log.gases[index], rate, duration))
+        depth = dive.depth
+        low_ceiling = (
+            max(c.pressure_limit(deco.low_gf) for c in deco.compartments) * 10 - 10
+        )
+        if low_ceiling > (deco.first_stop or 0):
+            deco.first_stop = low_ceiling
+        if depth < deco.ceiling(depth):
+            violations += 1
+        max_gf = max(max_gf, deco.loading(depth))
+
+    summary = DiveSummary(
+        identifier=logged_dive.identifier,
+        duration=dive.duration,
+        max_depth=step_log.max_depth,
+        max_gf=max_gf,
+        cns=dive.models["cns"].fraction,
+        otus=dive.models["pulmonary"].otus,
+        ceiling_violations=violations,
+    )
+    return dive, summary
+
+
+def summarise(logged_dive: LoggedDive, model=None, settings: dict = None):
+    return replay(logged_dive, model, settings)[1]
+
+
+def analyse_logbook(
+    source, model=None, processes: int = None, **settings
+) -> Iterator[DiveSummary]:
+    """Summarise every dive in a logbook, in logbook order.
+
+    Dives are parsed incrementally and replayed across a pool of `processes` worker
+    processes (all CPUs by default, or in this process if 1). Only a small window of
+    dives is in flight at once, so memory use does not grow with the logbook size.
+    """
+    work = functools.partial(summarise, model=model, settings=settings)
+    dives = iter_logbook(source)
+    if processes == 1:
+        yield from map(work, dives)
+        return
+
+    window = 2 * (processes or os.cpu_count() or 1)
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        pending = collections.deque()
+        for logged_dive in dives:
+            pending.append(executor.submit(work, logged_dive))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
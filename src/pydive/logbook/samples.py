@@ -0,0 +1,80 @@
+import dataclasses
+from typing import Iterator
+from xml.etree import ElementTree
+
+from pydive.gas import GasBlend, air
+from pydive.step_log import StepLog
+
+
+@dataclasses.dataclass
+class LoggedDive:
+    identifier: str | None
+    step_log: StepLog
+
+
+class SampleSeries:
+    """Accumulates logged samples and the gas breathed from each one onward."""
+
+    def __init__(self, gases: list[GasBlend] = None):
+        self.times: list[float] = []
+        self.depths: list[float] = []
+        self.gas_index: list[int] = []
+        self.gases: list[GasBlend] = list(gases) if gases else []
+        self.current_gas = 0
+        self.scheduled_switches: list[tuple[float, GasBlend]] = []
+
+    def switch_gas(self, gas: GasBlend):
+        if gas not in self.gases:
+            self.gases.append(gas)
+        self.current_gas = self.gases.index(gas)
+
+    def schedule_switch(self, time: float, gas: GasBlend):
+        """Switch to `gas` from the first sample at or after `time`."""
+        self.scheduled_switches.append((time, gas))
+        self.scheduled_switches.sort(key=lambda switch: switch[0], reverse=True)
+
+    def add_sample(self, time: float, depth: float):
+        while self.scheduled_switches and self.scheduled_switches[-1][0] <= time:
+            self.switch_gas(self.scheduled_switches.pop()[1])
+        self.times.append(time)
+        self.depths.append(depth)
+        self.gas_index.append(self.current_gas)
+
+    def step_log(self):
+        return StepLog.from_samples(
+            self.times, self.depths, self.gas_index, self.gases or [air]
+        )
+
+
+def blend_from_fractions(o2: float, he: float = 0) -> GasBlend:
+    """Create a blend from logged O2 and He fractions, the rest being nitrogen."""
+    o2 = round(o2, 4)
+    he = round(he, 4)
+    return GasBlend(oxygen=o2, helium=he, nitrogen=round(1 - o2 - he, 4))
+
+
+def local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def iterparse(source) -> Iterator[tuple[str, ElementTree.Element, list]]:
+    """Stream `source`, yielding `(event, element, ancestors)` for each element.
+
+    Consumers should pass each record they have finished with to `discard` so that
+    memory use stays bounded by a single record rather than by the whole document.
+    """
+    ancestors = []
+    for event, element in ElementTree.iterparse(source, events=("start", "end")):
+        if event == "start":
+            yield event, element, ancestors
+            ancestors.append(element)
+        else:
+            ancestors.pop()
+            yield event, element, ancestors
+
+
+def discard(element: ElementTree.Element, ancestors: list):
+    """Detach a fully processed element from the tree being streamed."""
+    element.clear()
+    if ancestors:
+        ancestors[-1].remove(element)
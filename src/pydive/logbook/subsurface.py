@@ -0,0 +1,97 @@
+"""Streaming reader for Subsurface XML logbooks.
+
+Subsurface writes quantities as strings with units, e.g. ``time='1:30 min'``,
+``depth='12.3 m'`` and ``o2='32.0%'``. Only the first dive computer of each dive is
+read.
+"""
+
+import logging
+from typing import Iterator
+
+from pydive.gas import GasBlend, air
+from pydive.logbook.samples import (
+    LoggedDive,
+    SampleSeries,
+    blend_from_fractions,
+    discard,
+    iterparse,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_time(value: str) -> float:
+    """Convert a Subsurface duration such as ``'1:02:30 min'`` to seconds."""
+    seconds = 0.0
+    for part in value.split()[0].split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_depth(value: str) -> float:
+    return float(value.split()[0])
+
+
+def parse_percentage(value: str | None) -> float:
+    if not value:
+        return 0
+    return float(value.rstrip("%")) / 100
+
+
+def _cylinder_gas(element) -> GasBlend:
+    o2 = parse_percentage(element.get("o2"))
+    he = parse_percentage(element.get("he"))
+    if o2 == 0:
+        if he == 0:
+            return air
+        o2 = 0.21
+    return blend_from_fractions(o2, he)
+
+
+def iter_subsurface(source) -> Iterator[LoggedDive]:
+    """Yield each dive in a Subsurface logbook, parsing it incrementally."""
+    cylinders: list[GasBlend] = []
+    series = None
+    identifier = None
+    computers = 0
+    for event, element, ancestors in iterparse(source):
+        tag = element.tag
+        if event == "start":
+            if tag == "dive":
+                cylinders = []
+                series = None
+                computers = 0
+                identifier = element.get("number")
+            elif tag == "divecomputer":
+                computers += 1
+                if computers == 1:
+                    series = SampleSeries(cylinders[:1] or [air])
+            continue
+
+        if tag == "cylinder" and ancestors and ancestors[-1].tag == "dive":
+            cylinders.append(_cylinder_gas(element))
+        elif tag == "event" and computers == 1 and element.get("name") == "gaschange":
+            index = element.get("cylinder")
+            if index is not None and int(index) < len(cylinders):
+                gas = cylinders[int(index)]
+            else:
+                # Older logs encode the mix as O2 % + (He % << 16)
+                value = int(element.get("value", 21))
+                gas = blend_from_fractions((value & 0xFFFF) / 100, (value >> 16) / 100)
+            series.schedule_switch(parse_time(element.get("time")), gas)
+            discard(element, ancestors)
+        elif tag == "sample" and computers == 1:
+            if element.get("depth") is not None:
+                series.add_sample(
+                    parse_time(element.get("time")), parse_depth(element.get("depth"))
+                )
+            discard(element, ancestors)
+        elif tag in ("sample", "event"):
+            discard(element, ancestors)
+        elif tag == "dive":
+            if series is not None:
+                logger.debug(
+                    f"read Subsurface dive {identifier} with {len(series.times)} samples"
+                )
+                yield LoggedDive(identifier, series.step_log())
+            discard(element, ancestors)
@@ -0,0 +1,78 @@
+"""Streaming reader for Universal Dive Data Format (UDDF) logbooks.
+
+UDDF stores quantities in SI units: depths in metres, times in seconds and gas
+fractions as ratios.
+"""
+
+import logging
+from typing import Iterator
+
+from pydive.gas import GasBlend
+from pydive.logbook.samples import (
+    LoggedDive,
+    SampleSeries,
+    blend_from_fractions,
+    discard,
+    iterparse,
+    local_name,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _child_float(element, name, default=None):
+    for child in element:
+        if local_name(child.tag) == name and child.text:
+            return float(child.text)
+    return default
+
+
+def _mix(element) -> GasBlend:
+    return blend_from_fractions(
+        _child_float(element, "o2", 0.21), _child_float(element, "he", 0)
+    )
+
+
+def iter_uddf(source) -> Iterator[LoggedDive]:
+    """Yield each dive in a UDDF logbook, parsing it incrementally."""
+    mixes: dict[str, GasBlend] = {}
+    series = None
+    identifier = None
+    time = depth = None
+    for event, element, ancestors in iterparse(source):
+        tag = local_name(element.tag)
+        if event == "start":
+            if tag == "dive":
+                series = SampleSeries()
+                identifier = element.get("id")
+            elif tag == "waypoint":
+                time = depth = None
+            continue
+
+        if tag == "mix":
+            mixes[element.get("id")] = _mix(element)
+            discard(element, ancestors)
+        elif series is None:
+            continue
+        elif tag == "divenumber" and element.text:
+            identifier = element.text.strip()
+        elif tag == "divetime" and element.text:
+            time = float(element.text)
+        elif tag == "depth" and element.text:
+            depth = float(element.text)
+        elif tag == "switchmix":
+            ref = element.get("ref")
+            if ref not in mixes:
+                raise ValueError(f"unknown mix {ref} in dive {identifier}")
+            series.switch_gas(mixes[ref])
+        elif tag == "waypoint":
+            if time is not None and depth is not None:
+                series.add_sample(time, depth)
+            discard(element, ancestors)
+        elif tag == "dive":
+            logger.debug(
+                f"read UDDF dive {identifier} with {len(series.times)} samples"
+            )
+            yield LoggedDive(identifier, series.step_log())
+            series = None
+            discard(element, ancestors)
@@ -1,6 +1,8 @@
 import abc
 from typing import TYPE_CHECKING
 
+from pydive.utils import freeze, thaw
+
 if TYPE_CHECKING:
     import pydive.dive
 
@@ -9,6 +11,9 @@ class Model(abc.ABC):
     name: str
     dive: "pydive.dive.Dive"
 
+    # Attributes left out of checkpoints, as set on a new model instead
+    _checkpoint_exclude = ("dive",)
+
     def __init__(self, dive: "pydive.dive.Dive"):
         self.dive = dive
 
@@ -17,3 +22,38 @@ class Model(abc.ABC):
 
     def undo_last_step(self):
         raise NotImplementedError
+
+    def state(self):
+        """Compact snapshot of the state carried over to a following dive."""
+        return None
+
+    def load_state(self, state):
+        """Start from a snapshot returned by `state`, before any step is applied."""
+
+    def initial_state(self):
+        """Snapshot of the state before the first step, as set by `load_state`."""
+        return None
+
+    def surface_interval(self, minutes):
+        """Advance the starting state over a surface interval breathing air."""
+
+    def checkpoint(self):
+        """Frozen copy of the full state, including histories, for `from_checkpoint`."""
+        attributes = {
+            name: value
+            for name, value in vars(self).items()
+            if name not in self._checkpoint_exclude
+        }
+        return type(self), freeze(attributes)
+
+    @classmethod
+    def from_checkpoint(cls, dive: "pydive.dive.Dive", attributes):
+        """New model of `dive` with the state frozen by `checkpoint`.
+
+        The checkpoint can be restored any number of times; each model gets its own
+        copy of the state.
+        """
+        model = cls.__new__(cls)
+        model.__dict__.update(thaw(attributes))
+        model.dive = dive
+        return model
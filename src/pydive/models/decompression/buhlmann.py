@@ -2,10 +2,10 @@ import logging
 import math
 from typing import TYPE_CHECKING
 
-import plotly.express as px
+import numpy as np
 
 from pydive.gas import Gas, Helium, Nitrogen, air
-from pydive.models.decompression.model import DecompressionModel
+from pydive.models.decompression.model import DecompressionModel, memoize_ceiling
 
 if TYPE_CHECKING:
     import pydive.dive
@@ -41,7 +41,7 @@ class BuhlmannCompartment:
         return f"{self.gas.formula} - a: {self.a}, b: {self.b}, half-life: {self.half_life} mins"
 
     def apply_dive_step(self, step: "pydive.dive.DiveStep"):
-        gas_fraction = step.gas.fraction(self.gas)
+        gas_fraction = step.gas.fractions[self.gas.index]
         alveolar_pressure = gas_fraction * (
             step.start_pressure - self.water_vapour_pressure
         )
@@ -61,6 +61,18 @@ class BuhlmannCompartment:
         self.history.pop(-1)
         self.inert_gas_pressure = self.history[-1]
 
+    def load_state(self, inert_gas_pressure):
+        self.inert_gas_pressure = inert_gas_pressure
+        self.history = [inert_gas_pressure]
+
+    def surface_interval(self, minutes):
+        alveolar_pressure = air.fraction(self.gas) * (1 - self.water_vapour_pressure)
+        self.load_state(
+            alveolar_pressure
+            + (self.inert_gas_pressure - alveolar_pressure)
+            * math.exp(-self.time_constant * minutes)
+        )
+
 
 class BuhlmannCompoundCompartment:
     compartments: list[BuhlmannCompartment]
@@ -130,11 +142,13 @@ class BuhlmannBase(DecompressionModel):
     name = "Buhlmann basic model"
     compartments = list[BuhlmannCompoundCompartment]
 
-    supported_gas: list[Gas]
+    supported_gas: tuple[Gas, ...]
 
     low_gf = 0.3
     high_gf = 0.7
 
+    continuous_ascent_interval = 1  # m
+
     def gf(self, depth):
         if self.first_stop is None:
             gf = self.low_gf
@@ -155,11 +169,43 @@ class BuhlmannBase(DecompressionModel):
         logger.debug(f"applying [{step}] to Buhlmann model")
         for compartment in self.compartments:
             compartment.apply_dive_step(step)
+        self._push_version(step)
 
     def undo_last_step(self):
         logger.debug("undoing last step from Buhlmann model")
         for compartment in self.compartments:
             compartment.undo_last_step()
+        self._pop_version()
+
+    def state(self):
+        return tuple(
+            sub_compartment.inert_gas_pressure
+            for compartment in self.compartments
+            for sub_compartment in compartment.compartments
+        )
+
+    def load_state(self, state):
+        sub_compartments = [
+            sub_compartment
+            for compartment in self.compartments
+            for sub_compartment in compartment.compartments
+        ]
+        for sub_compartment, inert_gas_pressure in zip(sub_compartments, state):
+            sub_compartment.load_state(inert_gas_pressure)
+        self.clear_ceiling_cache()
+
+    def initial_state(self):
+        return tuple(
+            sub_compartment.history[0]
+            for compartment in self.compartments
+            for sub_compartment in compartment.compartments
+        )
+
+    def surface_interval(self, minutes):
+        for compartment in self.compartments:
+            for sub_compartment in compartment.compartments:
+                sub_compartment.surface_interval(minutes)
+        self.clear_ceiling_cache()
 
     @property
     def df(self):
@@ -173,6 +219,8 @@ class BuhlmannBase(DecompressionModel):
         return df
 
     def plot_profile(self):  # pragma: no cover
+        import plotly.express as px
+
         df = self.df
         df["pressure"] = df.depth / 10 + 1
         df = df.drop(columns="depth")
@@ -190,6 +238,10 @@ class BuhlmannBase(DecompressionModel):
         ]
         return ceilings
 
+    def _ceiling_key(self):
+        return self.first_stop, self.low_gf, self.high_gf
+
+    @memoize_ceiling
     def ceiling(self, depth=None):
         if depth is None:
             depth = self.dive.depth
@@ -199,6 +251,124 @@ class BuhlmannBase(DecompressionModel):
         )
         return ceiling
 
+    def calculate_continuous_ascent(self):
+        """Ascend to the surface without stops, as slowly as the ceiling requires.
+
+        This is the continuous ascent used for saturation decompression. The ascent
+        is made in `continuous_ascent_interval` m segments, switching to deco gases
+        at their switch depths. Each segment is taken at the dive's ascent rate if
+        the ceiling allows, otherwise at the fastest rate, to within a minute, after
+        which the ceiling is no deeper than the end of the segment. The gradient
+        factor is anchored at the ceiling at the start of the ascent.
+
+        Returns
+        -------
+        list[pydive.dive.DiveStep]
+            The ascent and gas switch steps.
+
+        Raises
+        ------
+        ValueError
+            If a segment would take longer than `max_stop_length`, or the model is
+            not a Bühlmann model.
+        """
+        self.dive.in_decompression = True
+        self.start_of_deco_time = self.dive.duration
+        ceiling = self.ceiling()
+        if ceiling <= 0:
+            return [self.dive.ascend(0)]
+        if self.first_stop is None:
+            self.first_stop = ceiling
+
+        steps = []
+        while self.dive.depth > 0:
+            depth = max(self.dive.depth - self.continuous_ascent_interval, 0)
+            switch = self._next_switch
+            if switch is not None and switch > depth:
+                depth = switch
+            steps.append(self._ascend_within_ceiling(depth))
+            gas = self.dive.deco_gases.get(self.dive.depth)
+            if gas is not None and gas != self.dive.gas and self.dive.depth > 0:
+                steps.append(self.dive.switch_gas(gas, self.gas_switch_time))
+        return steps
+
+    def _ascent_allowed(self, depth, minutes):
+        self.dive.ascend(depth, rate=(self.dive.depth - depth) / minutes)
+        rtn = self.ceiling(depth) <= depth
+        self.dive.undo_last_step()
+        return rtn
+
+    def _ascend_within_ceiling(self, depth):
+        distance = self.dive.depth - depth
+        # Gallop from the fastest ascent then bisect, keeping lower too fast and
+        # lower + dt slow enough
+        lower = distance / self.dive.default_ascent_rate
+        if self._ascent_allowed(depth, lower):
+            return self.dive.ascend(depth)
+        dt = 1
+        while not self._ascent_allowed(depth, lower + dt):
+            if lower + dt > self.max_stop_length:
+                raise ValueError(
+                    f"Cannot ascend from {self.dive.depth} m to {depth} m within "
+                    f"{self.max_stop_length} mins on {self.dive.gas!r}"
+                )
+            lower = lower + dt
+            dt = dt * 2
+        while dt > 1:
+            dt = dt / 2
+            if not self._ascent_allowed(depth, lower + dt):
+                lower = lower + dt
+        return self.dive.ascend(depth, rate=distance / (lower + dt))
+
+    def sweep_gradient_factors(self, low_gfs, high_gfs):
+        """Decompression schedules for every pair of `low_gfs` and `high_gfs`.
+
+        All pairs start from the current state of the dive and are projected
+        together with `AscentProjection`, so the dive is not modified and a grid
+        costs far less than planning each pair separately.
+
+        Returns
+        -------
+        GradientFactorSweep
+            Runtime, TTS, first stop and stops for each pair, indexed by [low, high].
+
+        Raises
+        ------
+        ValueError
+            If this model's ascents cannot be projected.
+        """
+        from pydive.models.decompression.projection import (
+            AscentProjection,
+            GradientFactorSweep,
+        )
+
+        low_gfs = np.asarray(low_gfs, dtype=float)
+        high_gfs = np.asarray(high_gfs, dtype=float)
+        low, high = np.meshgrid(low_gfs, high_gfs, indexing="ij")
+        projection = AscentProjection(self)
+        result = projection.project(
+            projection.pressures(),
+            self.dive.depth,
+            self.dive.gas,
+            self.dive.deco_gases,
+            low.ravel(),
+            high.ravel(),
+        )
+        shape = low.shape
+        stops = [
+            result.stops[i * shape[1] : (i + 1) * shape[1]] for i in range(shape[0])
+        ]
+        return GradientFactorSweep(
+            low_gf=low_gfs,
+            high_gf=high_gfs,
+            runtime=(self.dive.duration / 60 + result.tts).reshape(shape),
+            tts=result.tts.reshape(shape),
+            first_stop=np.array(
+                [element[0].depth if element else 0 for element in result.stops]
+            ).reshape(shape),
+            stops=stops,
+        )
+
     @property
     def can_surface(self):
         gf = self.high_gf
@@ -218,9 +388,9 @@ class BuhlmannBase(DecompressionModel):
 class BuhlmannZHL16C(BuhlmannBase):
     name = "Buhlmann ZHL-16C"
 
-    supported_gas = [Nitrogen, Helium]
+    supported_gas = (Nitrogen, Helium)
 
-    N2_a = [
+    N2_a = (
         1.1696,
         1.0,
         0.8618,
@@ -237,9 +407,9 @@ class BuhlmannZHL16C(BuhlmannBase):
         0.261,
         0.248,
         0.2327,
-    ]
+    )
 
-    N2_b = [
+    N2_b = (
         0.5578,
         0.6514,
         0.7222,
@@ -256,9 +426,9 @@ class BuhlmannZHL16C(BuhlmannBase):
         0.9544,
         0.9602,
         0.9653,
-    ]
+    )
 
-    N2_half_life = [
+    N2_half_life = (
         5.0,
         8.0,
         12.5,
@@ -275,9 +445,9 @@ class BuhlmannZHL16C(BuhlmannBase):
         390.0,
         498.0,
         635.0,
-    ]
+    )
 
-    He_a = [
+    He_a = (
         1.6189,
         1.383,
         1.1919,
@@ -294,9 +464,9 @@ class BuhlmannZHL16C(BuhlmannBase):
         0.5176,
         0.5172,
         0.5119,
-    ]
+    )
 
-    He_b = [
+    He_b = (
         0.4770,
         0.5747,
         0.6527,
@@ -313,9 +483,9 @@ class BuhlmannZHL16C(BuhlmannBase):
         0.9171,
         0.9217,
         0.9267,
-    ]
+    )
 
-    He_half_life = [
+    He_half_life = (
         1.88,
         3.02,
         4.72,
@@ -332,7 +502,7 @@ class BuhlmannZHL16C(BuhlmannBase):
         147.42,
         188.24,
         240.03,
-    ]
+    )
 
     def __init__(self, dive):
         super().__init__(dive)
@@ -1,4 +1,5 @@
 import dataclasses
+import functools
 import logging
 import math
 from enum import Enum
@@ -18,6 +19,10 @@ class DecompressionStop:
     depth: float
     duration: float
     gas: GasBlend
+    tts: float = None  # mins from the start of decompression to leaving the stop
+    # Stops of a schedule that may still change, e.g. before VPM-B converges
+    provisional: bool = False
+    iteration: int = 0
 
 
 class FirstStopAnchor(Enum):
@@ -26,6 +31,30 @@ class FirstStopAnchor(Enum):
     FIRST_ACTUAL_STOP = 2
 
 
+def memoize_ceiling(ceiling):
+    """Cache a model's `ceiling(depth)` per state version, depth and `_ceiling_key`.
+
+    Stop searches probe the same state and depth repeatedly as steps are applied
+    and undone; each distinct evaluation is computed once.
+    """
+
+    @functools.wraps(ceiling)
+    def wrapper(self, depth=None):
+        if depth is None:
+            depth = self.dive.depth
+        self.stats["ceiling_probes"] += 1
+        key = (self._versions[-1], depth, self._ceiling_key())
+        try:
+            rtn = self._ceilings[key]
+        except KeyError:
+            rtn = self._ceilings[key] = ceiling(self, depth)
+        else:
+            self.stats["ceiling_hits"] += 1
+        return rtn
+
+    return wrapper
+
+
 class DecompressionModel(Model):
     name: str
     dive: "pydive.dive.Dive"
@@ -39,6 +68,49 @@ class DecompressionModel(Model):
     include_ascent_to_stop_in_stop = True
     ascend_before_ceiling_check = True
     switch_only_at_required_stop = False
+    max_stop_length = 14 * 24 * 60  # mins
+
+    stats: dict[str, int]
+
+    _checkpoint_exclude = ("dive", "_children", "_ceilings")
+
+    def __init__(self, dive):
+        super().__init__(dive)
+        self._first_stop = None
+        self.start_of_deco_time = None
+        self.stats = {"ceiling_probes": 0, "ceiling_hits": 0}
+        # Tissue states form a trie: applying the same step to the same state always
+        # gives the same version, so states revisited after an undo share ceilings
+        self._versions = [0]
+        self._next_version = 1
+        self.clear_ceiling_cache()
+
+    def clear_ceiling_cache(self):
+        """Forget memoized ceilings, e.g. after changing state not held in steps."""
+        self._children = {}
+        self._ceilings = {}
+
+    @classmethod
+    def from_checkpoint(cls, dive, attributes):
+        model = super().from_checkpoint(dive, attributes)
+        # Versions from the checkpoint stay valid but their ceilings are recomputed
+        model.clear_ceiling_cache()
+        return model
+
+    def _push_version(self, step):
+        key = (self._versions[-1], step.gas, step.start_depth, step.rate, step.duration)
+        version = self._children.get(key)
+        if version is None:
+            version = self._children[key] = self._next_version
+            self._next_version += 1
+        self._versions.append(version)
+
+    def _pop_version(self):
+        self._versions.pop(-1)
+
+    def _ceiling_key(self):
+        """Configuration, besides state and depth, that the ceiling depends on."""
+        return self.first_stop
 
     def apply_dive_step(self, step):
         raise NotImplementedError
@@ -67,6 +139,7 @@ class DecompressionModel(Model):
 
     def calculate_decompression_profile(self):
         self.dive.in_decompression = True
+        self.start_of_deco_time = self.dive.duration
         if self.can_surface:
             self.dive.ascend(0)
             return
@@ -158,9 +231,16 @@ class DecompressionModel(Model):
         ts = -ascent_time
         dt = 64
         self.dive.stay(ts + dt)
+        # Gallop so that very long stops take logarithmically many probes
         while not self.can_ascend(next_stop):
             self.dive.undo_last_step()
+            if ts + dt > self.max_stop_length:
+                raise ValueError(
+                    f"Cannot ascend from {current_stop} m to {next_stop} m within "
+                    f"{self.max_stop_length} mins on {self.dive.gas!r}"
+                )
             ts = ts + dt
+            dt = dt * 2
             self.dive.stay(ts + dt)
         logger.debug(f"stop length between {ts} and {ts + dt}")
 
@@ -179,28 +259,24 @@ class DecompressionModel(Model):
             self.dive.undo_last_step()
             self.dive.stay(ts + dt)
         logger.debug(f"stop length is {ts + dt}")
-        logger.debug(
-            f"ceiling at {self.dive.depth} is {self.ceiling(self.dive.depth)} and would be {self.ceiling(next_stop)} at {next_stop}"
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"ceiling at {self.dive.depth} is {self.ceiling(self.dive.depth)} and would be {self.ceiling(next_stop)} at {next_stop}"
+            )
         return DecompressionStop(
-            depth=current_stop, duration=ts + dt + ascent_time, gas=self.dive.gas
+            depth=current_stop,
+            duration=ts + dt + ascent_time,
+            gas=self.dive.gas,
+            tts=(self.dive.duration - self.start_of_deco_time) / 60,
         )
 
     @property
     def _next_switch(self):
-        switch_depths = [d for d in self.dive.deco_gases if d < self.dive.depth]
-        if switch_depths:
-            depth = max(switch_depths)
-            return depth
-        return None
+        return self.dive.deco_gases.deepest_above(self.dive.depth)
 
     @property
     def _last_switch(self):
-        switch_depths = [d for d in self.dive.deco_gases if d >= self.dive.depth]
-        if switch_depths:
-            depth = min(switch_depths)
-            return depth
-        return None
+        return self.dive.deco_gases.shallowest_from(self.dive.depth)
 
     def _next_stop(self, current_stop):
         last_stop = self.last_stop
@@ -0,0 +1,549 @@
+"""Vectorised projection of Bühlmann decompression ascents."""
+
+import dataclasses
+import logging
+from typing import Sequence
+
+import numpy as np
+
+from pydive.gas import GasBlend
+from pydive.models.decompression.buhlmann import BuhlmannBase
+from pydive.models.decompression.model import (
+    DecompressionModel,
+    DecompressionStop,
+    FirstStopAnchor,
+)
+from pydive.step_log import StepLog
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class Projection:
+    """Decompression ascents projected for a batch of starting points.
+
+    Each attribute has one entry per element of the batch.
+    """
+
+    tts: np.ndarray  # mins from leaving the starting point to surfacing
+    first_stop: np.ndarray  # m, the depth the gradient factors are anchored at
+    stops: list[list[DecompressionStop]]
+    step_logs: list[StepLog] | None = None
+
+    def __len__(self):
+        return len(self.tts)
+
+
+@dataclasses.dataclass
+class GradientFactorSweep:
+    """Schedules for a grid of gradient factor pairs, indexed by [low, high]."""
+
+    low_gf: np.ndarray
+    high_gf: np.ndarray
+    runtime: np.ndarray  # mins
+    tts: np.ndarray  # mins
+    first_stop: np.ndarray  # m, depth of the first stop or 0 if none
+    stops: list[list[list[DecompressionStop]]]
+
+
+class AscentProjection:
+    """Project the decompression ascent of a Bühlmann model for many states at once.
+
+    Schedules follow the same rules as
+    `DecompressionModel.calculate_decompression_profile` with the configuration of
+    `model`, but are computed with numpy for a whole batch of tissue states, depths,
+    gradient factors and deco gas plans without creating dives or steps. Results
+    agree with planning each dive separately up to floating point rounding.
+
+    Parameters
+    ----------
+    model
+        The model whose compartments and configuration to use, usually that of the
+        dive being planned.
+
+    Raises
+    ------
+    ValueError
+        If the model does not use Bühlmann ceilings or its configuration changes
+        how stops are searched for.
+    """
+
+    def __init__(self, model: BuhlmannBase):
+        model_type = type(model)
+        if (
+            not isinstance(model, BuhlmannBase)
+            or model_type.ceiling is not BuhlmannBase.ceiling
+            or model_type.calculate_decompression_profile
+            is not DecompressionModel.calculate_decompression_profile
+        ):
+            raise ValueError(f"cannot project ascents for {model.name}")
+        if not model.ascend_before_ceiling_check or model.switch_only_at_required_stop:
+            raise ValueError(
+                "projection requires ascend_before_ceiling_check and not "
+                "switch_only_at_required_stop"
+            )
+        self.model = model
+
+        sub_compartments = [
+            compartment.compartments for compartment in model.compartments
+        ]
+        self.inert_gases = tuple(
+            sub_compartment.gas for sub_compartment in sub_compartments[0]
+        )
+        # Compartment parameters indexed by [inert gas, compartment]
+        self.a = np.array([[c.a for c in row] for row in sub_compartments]).T
+        self.b = np.array([[c.b for c in row] for row in sub_compartments]).T
+        half_life = np.array([[c.half_life for c in row] for row in sub_compartments])
+        self.k = np.log(2) / half_life.T
+        self.water_vapour_pressure = sub_compartments[0][0].water_vapour_pressure
+
+        self.low_gf = model.low_gf
+        self.high_gf = model.high_gf
+        self.last_stop = model.last_stop
+        self.gas_switch_time = model.gas_switch_time  # mins
+        self.first_stop_anchor = model.first_stop_anchor
+        self.include_ascent_to_stop_in_stop = model.include_ascent_to_stop_in_stop
+        self.max_stop_length = model.max_stop_length
+        self.ascent_rate = model.dive.default_ascent_rate
+
+        self._gases: list[GasBlend] = []
+        self._fractions = np.empty((0, len(self.inert_gases)))
+
+    def _gas_index(self, gas: GasBlend) -> int:
+        if gas not in self._gases:
+            self._gases.append(gas)
+            self._fractions = np.vstack(
+                [
+                    self._fractions,
+                    [gas.fractions[inert_gas.index] for inert_gas in self.inert_gases],
+                ]
+            )
+        return self._gases.index(gas)
+
+    def pressures(self) -> np.ndarray:
+        """Current inert gas pressures of the model, by inert gas and compartment."""
+        return np.array(
+            [
+                [c.inert_gas_pressure for c in compartment.compartments]
+                for compartment in self.model.compartments
+            ]
+        ).T
+
+    def states_at(self, times) -> tuple[np.ndarray, np.ndarray, list[GasBlend]]:
+        """Tissue state, depth and gas at `times` (mins) along the planned steps.
+
+        States are interpolated from the model's history with the exact solution
+        for the step in progress, so the dive is not replayed. Times past the end of
+        the planned steps are clamped to the end.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, list[GasBlend]]
+            Inert gas pressures indexed by [time, inert gas, compartment], depths in
+            m and gases breathed.
+        """
+        steps = self.model.dive.steps
+        times = np.atleast_1d(np.asarray(times, dtype=float)) * 60
+        if not steps:
+            state = np.broadcast_to(self.pressures(), (len(times),) + self.k.shape)
+            gas = self.model.dive.bottom_gas
+            return state.copy(), np.zeros(len(times)), [gas] * len(times)
+
+        history = np.array(
+            [
+                [
+                    [c.history[index] for c in compartment.compartments]
+                    for compartment in self.model.compartments
+                ]
+                for index in range(len(steps) + 1)
+            ]
+        ).transpose(0, 2, 1)
+        log = StepLog.from_steps(steps)
+        ends = log.runtime
+        starts = ends - log.duration
+        times = np.clip(times, 0, ends[-1])
+        # The step in progress at each time, the last one at the very end
+        index = np.minimum(np.searchsorted(ends, times, side="right"), len(log) - 1)
+        elapsed = times - starts[index]
+        gas_index = np.array(
+            [self._gas_index(log.gases[i]) for i in log.gas_index[index]], dtype=int
+        )
+        state = self._step(
+            history[index],
+            log.start_depth[index],
+            log.rate[index],
+            elapsed,
+            gas_index,
+        )
+        depth = log.start_depth[index] + log.rate[index] * elapsed / 60
+        return state, depth, [self._gases[i] for i in gas_index]
+
+    def stay(self, pressures, depth, gas, minutes) -> np.ndarray:
+        """Tissue states after staying `minutes` at `depth` on `gas`."""
+        return self.travel(pressures, depth, depth, gas, minutes)
+
+    def travel(self, pressures, depth, to, gas, minutes) -> np.ndarray:
+        """Tissue states after moving from `depth` to `to` in `minutes` on `gas`."""
+        pressures = np.asarray(pressures, dtype=float)
+        n = len(pressures)
+        depth, to, minutes = (
+            np.broadcast_to(np.asarray(value, dtype=float), (n,))
+            for value in (depth, to, minutes)
+        )
+        rate = np.divide(to - depth, minutes, out=np.zeros(n), where=minutes != 0)
+        return self._step(
+            pressures, depth, rate, minutes * 60, self._gas_indices(gas, n)
+        )
+
+    def _gas_indices(self, gas, n):
+        if isinstance(gas, GasBlend):
+            return np.full(n, self._gas_index(gas), dtype=int)
+        return np.array([self._gas_index(g) for g in gas], dtype=int)
+
+    def project(
+        self,
+        pressures,
+        depth,
+        gas: GasBlend | Sequence[GasBlend],
+        deco_gases: dict[float, GasBlend] | Sequence[dict[float, GasBlend]] = None,
+        low_gf=None,
+        high_gf=None,
+        steps=False,
+    ) -> Projection:
+        """Project the ascent from each of a batch of starting points.
+
+        Parameters
+        ----------
+        pressures
+            Inert gas pressures indexed by [element, inert gas, compartment], or by
+            [inert gas, compartment] for a single state shared by all elements.
+        depth
+            Starting depth (m) of each element, or one for all.
+        gas
+            Gas breathed at the start of each element, or one for all.
+        deco_gases
+            Deco gases by switch depth, for each element or one plan for all.
+        low_gf, high_gf
+            Gradient factors for each element, or one for all; those of the model
+            if None.
+        steps
+            Whether to also return the ascent of each element as a `StepLog`.
+        """
+        pressures = np.asarray(pressures, dtype=float)
+        if deco_gases is None or isinstance(deco_gases, dict):
+            deco_gases = [deco_gases or {}]
+        low_gf = self.low_gf if low_gf is None else low_gf
+        high_gf = self.high_gf if high_gf is None else high_gf
+        gas_count = None if isinstance(gas, GasBlend) else len(gas)
+        n = np.broadcast_shapes(
+            pressures.shape[:-2],
+            np.shape(depth),
+            np.shape(low_gf),
+            np.shape(high_gf),
+            () if gas_count is None else (gas_count,),
+            () if len(deco_gases) == 1 else (len(deco_gases),),
+            (1,),
+        )[0]
+
+        state = _Batch(
+            p=np.broadcast_to(pressures, (n,) + self.k.shape).copy(),
+            depth=np.broadcast_to(np.asarray(depth, dtype=float), (n,)).copy(),
+            gas=self._gas_indices(gas, n),
+            time=np.zeros(n),
+            first_stop=np.full(n, np.nan),
+            low_gf=np.broadcast_to(np.asarray(low_gf, dtype=float), (n,)).copy(),
+            high_gf=np.broadcast_to(np.asarray(high_gf, dtype=float), (n,)).copy(),
+            element=np.arange(n),
+            **self._switch_table(deco_gases, n),
+        )
+        log = [] if steps else None
+        stops = []
+
+        surfacing = self._ceiling(state.p, state.high_gf, clamp=False) <= 0
+        self._travel(state, np.zeros(n), surfacing, log)
+        deco = np.flatnonzero(~surfacing)
+        batch = state.subset(deco)
+        self._first_stop(batch, log)
+        state.update(batch, deco)
+        first_stop = state.first_stop.copy()
+
+        active = deco[batch.depth > 0]
+        ascent_time = np.zeros(n)  # mins taken to reach each element's current stop
+        while len(active):
+            batch = state.subset(active)
+            self._stop(batch, ascent_time[active], log, stops)
+            start = batch.time.copy()
+            self._ascend(batch, self._next_stop(batch.depth), log)
+            if self.include_ascent_to_stop_in_stop:
+                ascent_time[active] = (batch.time - start) / 60
+            state.update(batch, active)
+            active = active[batch.depth > 0]
+
+        return Projection(
+            tts=state.time / 60,
+            first_stop=first_stop,
+            stops=self._per_element(stops, n),
+            step_logs=None if log is None else self._step_logs(log, n),
+        )
+
+    def _switch_table(self, deco_gases, n):
+        count = max(len(plan) for plan in deco_gases)
+        switch_depth = np.full((len(deco_gases), count), np.nan)
+        switch_gas = np.zeros((len(deco_gases), count), dtype=int)
+        for row, plan in enumerate(deco_gases):
+            for column, depth in enumerate(sorted(plan, reverse=True)):
+                switch_depth[row, column] = depth
+                switch_gas[row, column] = self._gas_index(plan[depth])
+        return {
+            "switch_depth": np.broadcast_to(switch_depth, (n, count)).copy(),
+            "switch_gas": np.broadcast_to(switch_gas, (n, count)).copy(),
+        }
+
+    def _step(self, p, start_depth, rate, seconds, gas_index):
+        # Schreiner equation for every element, as in BuhlmannCompartment
+        fractions = self._fractions[gas_index][:, :, None]
+        alveolar = (
+            fractions
+            * (start_depth / 10 + 1 - self.water_vapour_pressure)[:, None, None]
+        )
+        pressure_rate = fractions * (rate / 10)[:, None, None]
+        minutes = (seconds / 60)[:, None, None]
+        k = self.k
+        return (
+            alveolar
+            + pressure_rate * (minutes - 1 / k)
+            - (alveolar - p - pressure_rate / k) * np.exp(-k * minutes)
+        )
+
+    def _ceiling(self, p, gf, clamp=True):
+        total = p.sum(axis=1)
+        a = (self.a * p).sum(axis=1) / total
+        b = (self.b * p).sum(axis=1) / total
+        gf = gf[:, None]
+        limit = (total - a * gf) / (gf / b + 1 - gf)
+        ceiling = (limit * 10 - 10).max(axis=1)
+        return np.maximum(ceiling, 0) if clamp else ceiling
+
+    def _gf(self, depth, state):
+        first_stop = state.first_stop
+        anchored = ~np.isnan(first_stop) & (depth <= first_stop)
+        fraction = np.divide(
+            first_stop - depth,
+            first_stop,
+            out=np.zeros_like(depth),
+            where=anchored & (first_stop != 0),
+        )
+        return np.where(
+            anchored,
+            fraction * (state.high_gf - state.low_gf) + state.low_gf,
+            state.low_gf,
+        )
+
+    def _next_stop(self, depth):
+        last_stop = self.last_stop
+        return np.where(
+            depth > last_stop,
+            3 * np.ceil((depth - last_stop) / 3) + last_stop - 3,
+            0,
+        )
+
+    def _apply(self, state, rate, seconds, mask, log):
+        if not mask.any():
+            return
+        p = self._step(state.p, state.depth, rate, seconds, state.gas)
+        state.p = np.where(mask[:, None, None], p, state.p)
+        if log is not None:
+            log.append(
+                (
+                    state.element[mask],
+                    state.depth[mask],
+                    rate[mask],
+                    seconds[mask],
+                    state.gas[mask],
+                )
+            )
+        state.depth = np.where(mask, state.depth + rate * seconds / 60, state.depth)
+        state.time = np.where(mask, state.time + seconds, state.time)
+
+    def _travel(self, state, to, mask, log):
+        rate = np.full(len(to), -float(self.ascent_rate))
+        seconds = (state.depth - to) / self.ascent_rate * 60
+        self._apply(state, rate, seconds, mask, log)
+
+    def _switch(self, state, gas, mask, log):
+        state.gas = np.where(mask, gas, state.gas)
+        seconds = np.full(len(gas), self.gas_switch_time * 60.0)
+        self._apply(state, np.zeros(len(gas)), seconds, mask, log)
+
+    def _ascend(self, state, to, log=None):
+        # As DecompressionModel.ascend_check_switch, switching at each deco gas on
+        # the way and at the destination
+        for column in range(state.switch_depth.shape[1]):
+            switch = state.switch_depth[:, column]
+            mask = (switch < state.depth) & (switch > to) & (switch != 0)
+            self._travel(state, switch, mask, log)
+            self._switch(state, state.switch_gas[:, column], mask, log)
+        at_switch = (state.switch_depth == to[:, None]) & (
+            state.switch_depth < state.depth[:, None]
+        )
+        self._travel(state, to, np.ones(len(to), dtype=bool), log)
+        if at_switch.any():
+            gas = state.switch_gas[np.arange(len(to)), at_switch.argmax(axis=1)]
+            self._switch(state, gas, at_switch.any(axis=1), log)
+
+    def _can_ascend(self, state, to):
+        trial = state.subset(slice(None))
+        self._ascend(trial, to)
+        rtn = self._ceiling(trial.p, self._gf(to, state)) <= to
+        return rtn | (to == state.depth)
+
+    def _first_stop(self, state, log):
+        # As DecompressionModel.find_first_stop
+        ceiling = self._ceiling(state.p, self._gf(state.depth, state))
+        current_ceiling = np.ceil(ceiling / 3) * 3
+        if self.first_stop_anchor == FirstStopAnchor.CEILING_AT_START_OF_DECO:
+            state.first_stop = ceiling
+        elif self.first_stop_anchor == FirstStopAnchor.ROUNDED_CEILING_AT_START_OF_DECO:
+            state.first_stop = current_ceiling.copy()
+
+        searching = np.arange(len(ceiling))
+        while len(searching):
+            trial = state.subset(searching)
+            to = current_ceiling[searching]
+            can = self._can_ascend(trial, to)
+            searching, trial, to = searching[can], trial.subset(can), to[can]
+            self._ascend(trial, to)
+            new_ceiling = np.ceil(self._ceiling(trial.p, self._gf(to, trial)) / 3) * 3
+            moved = new_ceiling != to
+            current_ceiling[searching[moved]] = new_ceiling[moved]
+            searching = searching[moved]
+
+        next_stop = self._next_stop(current_ceiling)
+        to = np.where(self._can_ascend(state, next_stop), next_stop, current_ceiling)
+        self._ascend(state, to, log)
+        if self.first_stop_anchor == FirstStopAnchor.FIRST_ACTUAL_STOP:
+            state.first_stop = current_ceiling
+
+    def _stop(self, state, ascent_time, log, stops):
+        # As DecompressionModel.find_stop_length, finding the shortest whole number
+        # of minutes, counting the ascent to the stop, after which the next stop can
+        # be reached
+        next_stop = self._next_stop(state.depth)
+
+        def can_leave(minutes, index):
+            trial = state.subset(index)
+            self._apply(
+                trial,
+                np.zeros(len(index)),
+                (minutes - ascent_time[index]) * 60,
+                np.ones(len(index), dtype=bool),
+                None,
+            )
+            return self._can_ascend(trial, next_stop[index])
+
+        n = len(next_stop)
+        lower = np.zeros(n)
+        upper = np.full(n, 64.0)
+        index = np.arange(n)
+        while len(index):
+            failed = ~can_leave(upper[index], index)
+            index = index[failed]
+            if len(index) and (upper[index] - ascent_time[index]).max() > (
+                self.max_stop_length
+            ):
+                depth = state.depth[index[0]]
+                raise ValueError(
+                    f"Cannot ascend from {depth} m to {next_stop[index[0]]} m within "
+                    f"{self.max_stop_length} mins on "
+                    f"{self._gases[state.gas[index[0]]]!r}"
+                )
+            lower[index] = upper[index]
+            upper[index] = upper[index] * 2
+        index = np.flatnonzero(upper - lower > 1)
+        while len(index):
+            middle = np.floor((lower[index] + upper[index]) / 2)
+            passed = can_leave(middle, index)
+            upper[index[passed]] = middle[passed]
+            lower[index[~passed]] = middle[~passed]
+            index = index[upper[index] - lower[index] > 1]
+
+        self._apply(
+            state,
+            np.zeros(n),
+            (upper - ascent_time) * 60,
+            np.ones(n, dtype=bool),
+            log,
+        )
+        stops.append(
+            (
+                state.element,
+                state.depth.copy(),
+                upper,
+                state.gas.copy(),
+                state.time / 60,
+            )
+        )
+
+    def _per_element(self, stops, n):
+        rtn = [[] for _ in range(n)]
+        for element, depth, duration, gas, tts in stops:
+            for e, d, t, g, total in zip(
+                element.tolist(),
+                depth.tolist(),
+                duration.tolist(),
+                gas.tolist(),
+                tts.tolist(),
+            ):
+                rtn[e].append(
+                    DecompressionStop(
+                        depth=d, duration=t, gas=self._gases[g], tts=total
+                    )
+                )
+        return rtn
+
+    def _step_logs(self, log, n):
+        element, start_depth, rate, duration, gas_index = (
+            [np.concatenate(column) for column in zip(*log)]
+            if log
+            else [np.zeros(0, dtype=int)] * 5
+        )
+        rtn = []
+        for index in range(n):
+            mask = element == index
+            rtn.append(
+                StepLog(
+                    start_depth=start_depth[mask].astype(float),
+                    rate=rate[mask].astype(float),
+                    duration=duration[mask].astype(float),
+                    gas_index=gas_index[mask].astype(int),
+                    gases=tuple(self._gases),
+                )
+            )
+        return rtn
+
+
+@dataclasses.dataclass
+class _Batch:
+    # Per-element simulation state, all arrays indexed by position in the batch
+    p: np.ndarray
+    depth: np.ndarray
+    gas: np.ndarray
+    time: np.ndarray  # s since the start of the ascent
+    first_stop: np.ndarray
+    low_gf: np.ndarray
+    high_gf: np.ndarray
+    element: np.ndarray  # index of each position in the full batch
+    switch_depth: np.ndarray
+    switch_gas: np.ndarray
+
+    def subset(self, index):
+        return _Batch(
+            **{
+                field.name: getattr(self, field.name)[index].copy()
+                for field in dataclasses.fields(self)
+            }
+        )
+
+    def update(self, other, index):
+        for field in dataclasses.fields(self):
+            getattr(self, field.name)[index] = getattr(other, field.name)
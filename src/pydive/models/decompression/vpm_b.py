@@ -1,3 +1,4 @@
+import dataclasses
 import logging
 from math import exp, log, ceil, floor
 from typing import TYPE_CHECKING
@@ -8,7 +9,7 @@ from pydive.models.decompression.buhlmann import (
     BuhlmannCompoundCompartment,
     BuhlmannCompartment,
 )
-from pydive.models.decompression.model import DecompressionModel
+from pydive.models.decompression.model import DecompressionModel, memoize_ceiling
 from pydive.utils import Polynomial
 
 if TYPE_CHECKING:
@@ -41,6 +42,7 @@ class VPMBCompartment(BuhlmannCompartment):
     def __init__(self, gas: Gas, a: float, b: float, half_life: float):
         super().__init__(gas, a, b, half_life)
         self.crushing_pressure_history = [0]
+        self.desaturation_time = None
 
     def apply_dive_step(self, step: "pydive.dive.DiveStep"):
         super().apply_dive_step(step)
@@ -100,7 +102,7 @@ class VPMBCompartment(BuhlmannCompartment):
 
 class VPMBCompoundCompartment(BuhlmannCompoundCompartment):
     compartments: list[VPMBCompartment]
-    crushing_onset_tension_history = [0]
+    crushing_onset_tension_history: list[float]
 
     pressure_other_gases = 102 / 760.0 * 10.1325 / 10
     gradient_onset_of_impermeability = 8.2 * 1.01325  # bar
@@ -109,6 +111,7 @@ class VPMBCompoundCompartment(BuhlmannCompoundCompartment):
         self.compartments = []
         for arg in args:
             self.compartments.append(VPMBCompartment(*arg))
+        self.crushing_onset_tension_history = [0]
 
     @property
     def crushing_onset_tension(self):
@@ -140,6 +143,10 @@ class VPMBCompoundCompartment(BuhlmannCompoundCompartment):
                         pressure - inner_pressure
                     )
 
+    def undo_last_step(self):
+        super().undo_last_step()
+        self.crushing_onset_tension_history.pop(-1)
+
     def allowable_gradient(self, first_stop, depth):
         return (
             sum(
@@ -236,6 +243,7 @@ class VPMB(BuhlmannZHL16C):
 
     regeneration_time_constant = 20160 * 60
     conservatism_level = 2
+    conservatism_levels = (1.0, 1.05, 1.12, 1.22, 1.35)
     units_factor = 10.1325
     water_vapor_pressure = 0.493
 
@@ -248,8 +256,7 @@ class VPMB(BuhlmannZHL16C):
 
     def critical_radius(self, gas: type[Nitrogen | Helium]):
         radii = {Nitrogen: 0.55, Helium: 0.45}
-        conservatism_levels = [1.0, 1.05, 1.12, 1.22, 1.35]
-        return radii[gas] * conservatism_levels[self.conservatism_level]
+        return radii[gas] * self.conservatism_levels[self.conservatism_level]
 
     def do_to_sub_compartment(self, func):
         for compartment in self.compartments:
@@ -258,6 +265,8 @@ class VPMB(BuhlmannZHL16C):
 
     def __init__(self, dive):
         DecompressionModel.__init__(self, dive)
+        self.start_of_deco_zone = 0
+        self.time_start_of_deco_zone = None
         self.compartments = [
             VPMBCompoundCompartment(
                 [Nitrogen, a, b, half_life], [Helium, a1, b1, half_life1]
@@ -272,6 +281,16 @@ class VPMB(BuhlmannZHL16C):
             )
         ]
 
+    def load_state(self, state):
+        # Residual loading would be carried without regenerating bubble nuclei
+        raise ValueError("repetitive dives are not supported for VPM-B")
+
+    def surface_interval(self, minutes):
+        raise ValueError("repetitive dives are not supported for VPM-B")
+
+    def calculate_continuous_ascent(self):
+        raise ValueError("continuous ascent needs a Bühlmann model")
+
     def nuclear_regeneration(self, dive_time):
         """
         Purpose: This subprogram calculates the regeneration of VPM critical
@@ -332,10 +351,12 @@ class VPMB(BuhlmannZHL16C):
             compartment.adjusted_crushing_pressure = adj_crush_pressure
 
         self.do_to_sub_compartment(set_crushing_pressure)
+        self.clear_ceiling_cache()
 
     def _update_desaturation_times(self):
         for compartment in self.compartments:
             compartment._update_desaturation_times(self.deco_phase_volume_time)
+        self.clear_ceiling_cache()
 
     def calculate_start_of_deco_zone(self):
         """
@@ -380,6 +401,7 @@ class VPMB(BuhlmannZHL16C):
         )
         return rtn
 
+    @memoize_ceiling
     def ceiling(self, depth=None):
         if depth is None:
             depth = self.dive.depth
@@ -442,6 +464,10 @@ class VPMB(BuhlmannZHL16C):
         volume limit is set by the Critical Volume Parameter Lambda in the program
         settings (default setting is 7500 fsw-min with adjustability range from
         from 6500 to 8300 fsw-min according to Bruce Wienke).
+
+        Yields: each stop as it is found, marked provisional while the critical
+        volume algorithm may still change the schedule, then the stops of the
+        converged schedule.
         """
         i = 0
         while True:
@@ -506,7 +532,10 @@ class VPMB(BuhlmannZHL16C):
                     break
 
                 stop = self.find_stop_length(60 * (ascent_time - floor(ascent_time)))
+                stop.provisional = self.cva
+                stop.iteration = i
                 stops.append(stop)
+                yield stop
 
                 deco_stop_depth = self._next_stop(self.dive.depth)
 
@@ -534,7 +563,9 @@ class VPMB(BuhlmannZHL16C):
                 break
             self.dive.reset()
             self.dive.in_decompression = True
-        return stops
+        if self.cva:
+            for stop in stops:
+                yield dataclasses.replace(stop, provisional=False)
 
     def decompression_loop(self):
         # First, calculate the regeneration of critical radii that takes place over
@@ -592,7 +623,7 @@ class VPMB(BuhlmannZHL16C):
 
         self.do_to_sub_compartment(set_inert_gas_pressure_start_of_deco_zone)
 
-        return self.critical_volume_loop()
+        yield from self.critical_volume_loop()
 
     def calculate_decompression_profile(self):
         def set_critical_radius(compartment):
@@ -603,5 +634,6 @@ class VPMB(BuhlmannZHL16C):
             )
 
         self.do_to_sub_compartment(set_critical_radius)
+        self.clear_ceiling_cache()
         for stop in self.decompression_loop():
             yield stop
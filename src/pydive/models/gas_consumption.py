@@ -1,37 +1,167 @@
+import dataclasses
 import logging
 
 import numpy as np
 
-from pydive.gas import GasBlend, air
+from pydive.gas import GasBlend, air, gas_name_map, horner
 from pydive.models.base import Model
+from pydive.step_log import StepLog
 
 logger = logging.getLogger(__name__)
 
 
+def step_consumption(step_log: StepLog, sac: float) -> np.ndarray:
+    """Surface volume (l) of gas breathed during each step of `step_log`.
+
+    Each step is charged at its mean depth, corrected for the compressibility of
+    the gas breathed, with a surface air consumption of `sac` l/min.
+    """
+    pressure = (step_log.start_depth + step_log.depth_change / 2) / 10 + 1
+    compressibility = np.ones(len(step_log))
+    for index, gas in enumerate(step_log.gases):
+        mask = step_log.gas_index == index
+        compressibility[mask] = (
+            gas.compressibility(pressure[mask]) / gas.surface_compressibility
+        )
+    return sac * step_log.minutes * compressibility * pressure
+
+
+@dataclasses.dataclass
+class ReserveViolation:
+    cylinder: str
+    rule: str
+    runtime: float  # s
+    pressure: float  # bar
+
+
+@dataclasses.dataclass
+class CylinderPressureLog:
+    """Cylinder contents at the start of the dive and at the end of each step."""
+
+    runtime: np.ndarray  # s
+    pressures: dict[str, np.ndarray]  # bar
+    volumes: dict[str, np.ndarray]  # surface l
+    violations: list[ReserveViolation]
+
+
 class GasConsumptionModel(Model):
     name = "Gas consumption"
 
+    sac = 20  # surface l/min
+
     consumption: dict[GasBlend, float]
 
     models: dict[GasBlend, "SingleGasConsumptionModel"]
+    step_gases: list[GasBlend]
+
+    cylinders: dict[str, "Cylinder"]
+    gas_cylinders: dict[GasBlend, str]
+    reserves: dict[str, str | float]
 
     def __init__(self, dive):
         super().__init__(dive)
         self.consumption = {}
         self.models = {}
+        self.step_gases = []
+        self.cylinders = {}
+        self.gas_cylinders = {}
+        self.reserves = {}
 
     def apply_dive_step(self, step):
         if step.gas not in self.models:
-            self.models[step.gas] = SingleGasConsumptionModel(step.gas)
+            self.models[step.gas] = SingleGasConsumptionModel(step.gas, self.sac)
 
-        for gas in self.models:
-            self.models[gas].apply_dive_step(step)
-            self.consumption[gas] = self.models[gas].consumption
+        self.step_gases.append(step.gas)
+        self.models[step.gas].apply_dive_step(step)
+        self.consumption[step.gas] = self.models[step.gas].consumption
 
     def undo_last_step(self):
-        for gas in self.models:
-            self.models[gas].undo_last_step()
-            self.consumption[gas] = self.models[gas].consumption
+        gas = self.step_gases.pop(-1)
+        self.models[gas].undo_last_step()
+        self.consumption[gas] = self.models[gas].consumption
+
+    def add_cylinder(self, name, cylinder, gases=None, reserve=None):
+        """Supply `gases` (the cylinder's own gas by default) from `cylinder`.
+
+        Parameters
+        ----------
+        name
+            Name to report the cylinder under.
+        cylinder
+            The cylinder at the start of the dive.
+        gases
+            Gases breathed from this cylinder.
+        reserve
+            ``"thirds"`` to flag use of more than two thirds of the starting gas,
+            a pressure in bar to flag dropping below that minimum gas pressure, or
+            None.
+        """
+        self.cylinders[name] = cylinder
+        for gas in gases or [cylinder.gas]:
+            self.gas_cylinders[gas] = name
+        if reserve is not None:
+            self.reserves[name] = reserve
+
+    def pressure_log(self, step_log: StepLog = None) -> CylinderPressureLog:
+        """Track every cylinder over `step_log` (the whole dive by default).
+
+        Consumption, remaining volume, real gas pressure and reserve checks are each
+        computed in one vectorized pass over the steps. Gases not supplied by a
+        cylinder are ignored.
+
+        Reserve violations are only found here rather than as steps are applied, so
+        that planning a dive does no per-step cylinder work. Call this after
+        planning, or with ``StepLog.from_steps`` of some of the steps to check part
+        of a dive. Each violation reports the first point at which its cylinder fell
+        below the reserve.
+        """
+        if step_log is None:
+            step_log = self.dive.step_log
+        litres = step_consumption(step_log, self.sac)
+
+        pressures = {}
+        volumes = {}
+        violations = []
+        for name, cylinder in self.cylinders.items():
+            supplied = [
+                index
+                for index, gas in enumerate(step_log.gases)
+                if self.gas_cylinders.get(gas) == name
+            ]
+            used = np.where(np.isin(step_log.gas_index, supplied), litres, 0)
+            volume = cylinder.surface_volume - np.concatenate([[0], np.cumsum(used)])
+            volumes[name] = volume
+            pressures[name] = cylinder.pressures_for(
+                np.maximum(volume, 0), guess=cylinder.pressure
+            )
+
+            reserve = self.reserves.get(name)
+            if reserve is None:
+                continue
+            if reserve == "thirds":
+                rule = "rule of thirds"
+                reserve_volume = volume[0] / 3
+            else:
+                rule = "minimum gas"
+                reserve_volume = cylinder.surface_volume_at(reserve)
+            below = volume < reserve_volume
+            if below.any():
+                index = int(np.argmax(below))
+                violation = ReserveViolation(
+                    cylinder=name,
+                    rule=rule,
+                    runtime=float(np.concatenate([[0], step_log.runtime])[index]),
+                    pressure=float(pressures[name][index]),
+                )
+                logger.info(f"reserve violated: {violation}")
+                violations.append(violation)
+
+        return CylinderPressureLog(
+            runtime=np.concatenate([[0], step_log.runtime]),
+            pressures=pressures,
+            volumes=volumes,
+            violations=violations,
+        )
 
     def __str__(self):
         rtn = []
@@ -48,9 +178,11 @@ class SingleGasConsumptionModel:
 
     sac = 20  # surface l/min
 
-    def __init__(self, gas):
+    def __init__(self, gas, sac=None):
         self.gas = gas
         self.history = []
+        if sac is not None:
+            self.sac = sac
 
     def apply_dive_step(self, step):
         if step.gas != self.gas:
@@ -59,10 +191,10 @@ class SingleGasConsumptionModel:
 
         gas = self.gas
 
-        depth = (step.start_depth + step.depth_change) / 2
+        depth = step.start_depth + step.depth_change / 2
         pressure = depth / 10 + 1
         Z = gas.compressibility(pressure)
-        Z1 = gas.compressibility(1)
+        Z1 = gas.surface_compressibility
 
         consumption = self.sac * step.minutes * Z / Z1 * pressure
 
@@ -80,13 +212,20 @@ class Cylinder:
     volume: float
     pressure: float
 
+    newton_iterations = 20
+    newton_tolerance = 1e-12
+
     @property
     def surface_volume(self):
+        return self.surface_volume_at(self.pressure)
+
+    def surface_volume_at(self, pressure):
+        """Surface volume of gas held at `pressure`, a scalar or NumPy array."""
         return (
-            self.pressure
+            pressure
             * self.volume
-            * self.gas.compressibility(1)
-            / self.gas.compressibility(self.pressure)
+            * self.gas.surface_compressibility
+            / self.gas.compressibility(pressure)
         )
 
     def __init__(self, gas, volume, pressure=1):
@@ -95,15 +234,77 @@ class Cylinder:
         self.pressure = pressure
 
     def add_gas(self, surface_volume):
-        surface_volume = self.surface_volume + surface_volume
+        self.pressure = self.pressure_for(self.surface_volume + surface_volume)
+
+    def pressure_for(self, surface_volume, guess=None):
+        """Pressure at which the cylinder holds `surface_volume` of its gas.
+
+        The real gas equation is solved by Newton iteration starting from `guess`,
+        the current pressure by default, falling back to finding the roots of the
+        polynomial if that does not converge.
+        """
+        if surface_volume == 0:
+            return 0
+        if guess is None:
+            guess = self.pressure
+        capacity = self.volume * self.gas.surface_compressibility
+        pressure = guess if guess > 0 else surface_volume / capacity
+        for _ in range(self.newton_iterations):
+            step = self._newton_step(pressure, surface_volume, capacity)
+            pressure -= step
+            if abs(step) <= self.newton_tolerance * max(pressure, 1):
+                if pressure > 0:
+                    return pressure
+                break
+        logger.debug(f"Newton iteration failed for {surface_volume} l in {self!r}")
+        return self._polynomial_pressure(surface_volume)
+
+    def pressures_for(self, surface_volumes, guess=None):
+        """Vectorized `pressure_for` over an array of surface volumes.
+
+        Each element starts from `guess` if given, otherwise from the ideal gas
+        pressure.
+        """
+        surface_volumes = np.asarray(surface_volumes, dtype=float)
+        capacity = self.volume * self.gas.surface_compressibility
+        if guess is None:
+            pressures = surface_volumes / capacity
+        else:
+            pressures = np.broadcast_to(guess, surface_volumes.shape).astype(float)
+        converged = np.zeros(surface_volumes.shape, dtype=bool)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for _ in range(self.newton_iterations):
+                step = self._newton_step(pressures, surface_volumes, capacity)
+                pressures = pressures - step
+                converged = np.abs(step) <= self.newton_tolerance * np.maximum(
+                    pressures, 1
+                )
+                if converged.all():
+                    break
+        pressures = np.where(surface_volumes == 0, 0.0, pressures)
+        failed = (surface_volumes != 0) & (~converged | ~(pressures > 0))
+        for index in zip(*np.nonzero(failed)):
+            pressures[index] = self._polynomial_pressure(surface_volumes[index])
+        return pressures
+
+    def _newton_step(self, pressure, surface_volume, capacity):
+        # Root of capacity * p - surface_volume * Z(p)
+        residual = capacity * pressure - surface_volume * self.gas.compressibility(
+            pressure
+        )
+        gradient = capacity - surface_volume * self.gas.compressibility_gradient(
+            pressure
+        )
+        return residual / gradient
 
+    def _polynomial_pressure(self, surface_volume):
         virial_coefficients = self.gas.virial_coefficients
 
         coefficients = [
             1,
             virial_coefficients[0]
-            - self.volume * self.gas.compressibility(1) / surface_volume,
-        ] + virial_coefficients[1:]
+            - self.volume * self.gas.surface_compressibility / surface_volume,
+        ] + list(virial_coefficients[1:])
 
         poly = np.polynomial.Polynomial(coefficients)
 
@@ -111,7 +312,7 @@ class Cylinder:
         real_roots = roots[np.isreal(roots)]
         if len(real_roots) != 1:
             raise Exception
-        self.pressure = real_roots[0].real
+        return real_roots[0].real
 
     def add_other_gas(self, blend, surface_volume):
         gas_volumes = {
@@ -145,42 +346,285 @@ class Cylinder:
         return f"{self.volume} l cylinder of {self.gas.__repr__()} @ {self.pressure:.0f} bar"
 
     def compute_blend(self, gases: list[GasBlend], start=None):
-        for blend in gases:
-            for gas in blend.blend:
-                if gas not in self.gas.blend:
-                    gases.remove(blend)
-                    logger.debug(
-                        f"removed {blend.__repr__()} from available gases as contains unused gas {gas}"
-                    )
-                    break
+        """Fill sequence that blends this cylinder from `start` using `gases`.
+
+        Gases containing a component this cylinder's gas lacks are skipped. Yields
+        each gas added with its surface volume and the cylinder after adding it.
+        `start` defaults to an empty cylinder of air and is not modified.
 
+        Raises
+        ------
+        ValueError
+            If the cylinders differ in volume or the blend is impossible.
+        """
         if start is None:
             start = Cylinder(air, self.volume)
         elif self.volume != start.volume:
             raise ValueError("Start cylinder should have the same volume")
 
-        for gas in start.gas.blend:
-            if gas not in self.gas.blend:
-                raise ValueError(f"Unwanted gas {gas.name} in initial blend")
+        schedule = compute_blends(
+            gases, self.volume, self.gas, self.pressure, start.gas, start.pressure
+        )
+        if schedule.errors[0] is not None:
+            raise ValueError(schedule.errors[0])
+        for gas, volume, cylinder in schedule.fills(0):
+            yield gas, volume, cylinder
 
-        volumes_needed = [
-            self.volume_of(gas) - start.volume_of(gas) for gas in self.gas.blend
-        ]
 
-        coefficients = np.array(
-            [[blend.fraction(gas) for blend in gases] for gas in self.gas.blend],
-            dtype=np.dtype(float),
-        )
+@dataclasses.dataclass
+class FillSchedule:
+    """Fills that blend a batch of cylinders, as from `compute_blends`.
 
-        res = np.linalg.solve(
-            coefficients, np.array(volumes_needed, dtype=np.dtype(float))
-        )
+    Arrays have one row per cylinder and one column per fill gas, in fill order.
+    Rows that cannot be blended hold NaN and the reason in `errors`.
+    """
+
+    fill_gases: tuple[GasBlend, ...]
+    cylinder_volumes: np.ndarray  # l
+    volumes: np.ndarray  # surface l of each fill gas added
+    pressures: np.ndarray  # bar after each fill
+    fractions: np.ndarray  # blend after each fill, indexed by `Gas.index` last
+    errors: list[str | None]
+
+    def __len__(self):
+        return len(self.errors)
+
+    @property
+    def feasible(self) -> np.ndarray:
+        return np.array([error is None for error in self.errors], dtype=bool)
 
-        for val, gas in zip(res, gases):
-            if val == 0:
+    def fills(self, index) -> list[tuple[GasBlend, float, Cylinder]]:
+        """Gas, surface volume and resulting cylinder of each fill of a cylinder.
+
+        Gases not needed are left out. Blends are rounded to 0.1 %.
+
+        Raises
+        ------
+        ValueError
+            If the cylinder cannot be blended.
+        """
+        if self.errors[index] is not None:
+            raise ValueError(self.errors[index])
+        rtn = []
+        for column, gas in enumerate(self.fill_gases):
+            volume = float(self.volumes[index, column])
+            if volume == 0:
                 logger.debug(f"No {gas.__repr__()} needed")
                 continue
-            if val < 0:
-                raise ValueError("Impossible to blend this gas")
-            start.add_other_gas(gas, val)
-            yield gas, val, start
+            blend = GasBlend(
+                **{
+                    name: round(float(self.fractions[index, column, G.index]), 3)
+                    for name, G in gas_name_map().items()
+                }
+            )
+            cylinder = Cylinder(
+                blend,
+                float(self.cylinder_volumes[index]),
+                float(self.pressures[index, column]),
+            )
+            rtn.append((gas, volume, cylinder))
+        return rtn
+
+
+def _as_fractions(gases, n) -> np.ndarray:
+    if isinstance(gases, GasBlend):
+        gases = [gases]
+    fractions = np.array([gas.fractions for gas in gases], dtype=float)
+    return np.broadcast_to(fractions, (n, fractions.shape[1]))
+
+
+def _compressibility(coefficients, pressure, gradient=False):
+    # `coefficients` has the virial coefficients of each blend along its last axis
+    coefficients = np.moveaxis(coefficients, -1, 0)
+    if gradient:
+        rtn = 0
+        for i in reversed(range(len(coefficients))):
+            rtn = rtn * pressure + (i + 1) * coefficients[i]
+        return rtn
+    return 1 + horner(coefficients, pressure)
+
+
+def _surface_volumes(coefficients, volume, pressure):
+    return (
+        pressure
+        * volume
+        * _compressibility(coefficients, 1)
+        / _compressibility(coefficients, pressure)
+    )
+
+
+def _fill_pressures(coefficients, volume, surface_volume):
+    # Newton iteration of Cylinder.pressure_for for blends varying per element
+    capacity = volume * _compressibility(coefficients, 1)
+    pressure = surface_volume / capacity
+    converged = np.zeros(pressure.shape, dtype=bool)
+    for _ in range(Cylinder.newton_iterations):
+        residual = capacity * pressure - surface_volume * _compressibility(
+            coefficients, pressure
+        )
+        step = residual / (
+            capacity - surface_volume * _compressibility(coefficients, pressure, True)
+        )
+        pressure = pressure - step
+        converged = np.abs(step) <= Cylinder.newton_tolerance * np.maximum(pressure, 1)
+        if converged.all():
+            break
+    return pressure, converged & (pressure > 0)
+
+
+def compute_blends(
+    fill_gases: list[GasBlend],
+    volume,
+    target_gas,
+    target_pressure,
+    start_gas=air,
+    start_pressure=1,
+) -> FillSchedule:
+    """Blend a batch of cylinders by adding `fill_gases` in turn.
+
+    For each cylinder the surface volumes of the fill gases are found so that every
+    component of the target blend reaches its target volume, allowing for real gas
+    behaviour. Fill gases containing a component the target lacks are not used for
+    that cylinder, so the usable fill gases must match the target's components one
+    to one. The systems of all cylinders are solved together.
+
+    Parameters
+    ----------
+    fill_gases
+        Gases available to add, in fill order.
+    volume
+        Water volume of each cylinder in l.
+    target_gas, start_gas
+        Blend wanted and blend already in each cylinder, a `GasBlend` or a sequence
+        of one per cylinder. An empty cylinder holds air at 1 bar.
+    target_pressure, start_pressure
+        Pressure in bar wanted and already in each cylinder.
+
+    Returns
+    -------
+    FillSchedule
+        The fills of each cylinder, with errors reported per cylinder rather than
+        raised.
+    """
+    fill_gases = tuple(fill_gases)
+    volume, target_pressure, start_pressure = np.broadcast_arrays(
+        *(
+            np.atleast_1d(np.asarray(value, dtype=float))
+            for value in (volume, target_pressure, start_pressure)
+        )
+    )
+    lengths = {len(volume)} | {
+        len(gases)
+        for gases in (target_gas, start_gas)
+        if not isinstance(gases, GasBlend)
+    }
+    n = max(lengths)
+    if lengths - {1, n}:
+        raise ValueError(f"Expected one value or {n} per cylinder")
+    volume, target_pressure, start_pressure = (
+        np.broadcast_to(value, n) for value in (volume, target_pressure, start_pressure)
+    )
+    target = _as_fractions(target_gas, n)
+    start = _as_fractions(start_gas, n)
+    fills = np.array([gas.fractions for gas in fill_gases], dtype=float).reshape(
+        len(fill_gases), target.shape[1]
+    )
+    components = sorted(gas_name_map().values(), key=lambda gas: gas.index)
+    virial = np.array([gas.virial_coefficients for gas in components], dtype=float)
+
+    initial = _surface_volumes(start @ virial, volume, start_pressure)[:, None] * start
+    needed = (
+        _surface_volumes(target @ virial, volume, target_pressure)[:, None] * target
+        - initial
+    )
+
+    wanted = target > 0
+    usable = ~((fills[None, :, :] > 0) & ~wanted[:, None, :]).any(axis=2)
+    unwanted = ((start > 0) & ~wanted).any(axis=1)
+    mismatched = wanted.sum(axis=1) != usable.sum(axis=1)
+
+    # Square systems of components against fill gases, padded to a common size by
+    # pairing each unwanted component with an unusable gas
+    size = max(len(components), len(fill_gases))
+    coefficients = np.zeros((n, size, size))
+    coefficients[:, : len(components), : len(fill_gases)] = (
+        fills.T[None, :, :] * wanted[:, :, None] * usable[:, None, :]
+    )
+    spare_rows = np.ones((n, size), dtype=bool)
+    spare_rows[:, : len(components)] = ~wanted
+    spare_columns = np.ones((n, size), dtype=bool)
+    spare_columns[:, : len(fill_gases)] = ~usable
+    rows = np.argsort(~spare_rows, axis=1, kind="stable")
+    columns = np.argsort(~spare_columns, axis=1, kind="stable")
+    pad = (np.arange(size)[None, :] < spare_rows.sum(axis=1)[:, None]) & ~mismatched[
+        :, None
+    ]
+    cylinder, rank = np.nonzero(pad)
+    coefficients[cylinder, rows[cylinder, rank], columns[cylinder, rank]] = 1
+
+    invalid = unwanted | mismatched
+    with np.errstate(divide="ignore", invalid="ignore"):
+        singular = ~invalid & ~(np.linalg.cond(coefficients) < 1 / np.finfo(float).eps)
+    invalid |= singular
+    coefficients[invalid] = np.eye(size)
+    constants = np.zeros((n, size))
+    constants[:, : len(components)] = np.where(wanted, needed, 0)
+    volumes = np.linalg.solve(coefficients, constants[:, :, None])[
+        :, : len(fill_gases), 0
+    ]
+    volumes = np.where(usable, volumes, 0)
+
+    tolerance = 1e-9 * np.abs(needed).sum(axis=1)
+    volumes = np.where(np.abs(volumes) <= tolerance[:, None], 0, volumes)
+    impossible = ~invalid & (volumes < 0).any(axis=1)
+    invalid |= impossible
+
+    contents = initial[:, None, :] + np.cumsum(
+        volumes[:, :, None] * fills[None, :, :], axis=1
+    )
+    totals = contents.sum(axis=2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fractions = contents / totals[:, :, None]
+        pressures, converged = _fill_pressures(
+            fractions @ virial, volume[:, None], totals
+        )
+    empty = totals <= 0
+    pressures[empty] = 0
+    for index in zip(*np.nonzero(~converged & ~empty & ~invalid[:, None])):
+        blend = GasBlend.from_fractions(tuple(fractions[index]))
+        pressures[index] = Cylinder(blend, volume[index[0]])._polynomial_pressure(
+            totals[index]
+        )
+
+    errors = []
+    for index in range(n):
+        if unwanted[index]:
+            gas = next(
+                gas
+                for gas in components
+                if start[index, gas.index] > 0 and not wanted[index, gas.index]
+            )
+            errors.append(f"Unwanted gas {gas.name} in initial blend")
+        elif mismatched[index]:
+            errors.append(
+                f"Blending needs {wanted[index].sum()} fill gases containing only "
+                f"the target's gases but {usable[index].sum()} are available"
+            )
+        elif singular[index] or impossible[index]:
+            errors.append("Impossible to blend this gas")
+        else:
+            errors.append(None)
+    if any(errors):
+        logger.debug(f"{sum(map(bool, errors))} of {n} cylinders cannot be blended")
+
+    volumes[invalid] = np.nan
+    pressures[invalid] = np.nan
+    fractions[invalid] = np.nan
+    return FillSchedule(
+        fill_gases=fill_gases,
+        cylinder_volumes=np.array(volume),
+        volumes=volumes,
+        pressures=pressures,
+        fractions=fractions,
+        errors=errors,
+    )
@@ -1,17 +1,23 @@
-import importlib
+import bisect
+import csv
+import dataclasses
+import functools
+import importlib.resources
 import math
 
-import pandas as pd
+import numpy as np
 from _warnings import warn
 
 from pydive.gas import Oxygen
 from pydive.models.base import Model
+from pydive.step_log import StepLog
 
 
 class PulmonaryOxygenToxicity(Model):
     name = "Pulmonary oxygen toxicity model"
 
     otus = 0
+    initial_otus = 0
     history: list[float]
 
     def __init__(self, dive):
@@ -19,10 +25,11 @@ class PulmonaryOxygenToxicity(Model):
         self.history = []
 
     def apply_dive_step(self, step):
-        pO2i = step.gas.partial_pressure(Oxygen, step.start_depth)
-        pO2f = step.gas.partial_pressure(Oxygen, step.start_depth + step.depth_change)
+        fO2 = step.gas.fractions[Oxygen.index]
+        pO2i = (step.start_depth / 10 + 1) * fO2
+        pO2f = ((step.start_depth + step.depth_change) / 10 + 1) * fO2
 
-        if pO2i < 0.5 and pO2f < 0.5:
+        if pO2i <= 0.5 and pO2f <= 0.5:
             self.history.append(self.otus)
             return
 
@@ -35,7 +42,7 @@ class PulmonaryOxygenToxicity(Model):
         else:
             duration = step.minutes
 
-        if step.rate == 0:
+        if step.rate == 0 or pO2f == pO2i:
             gain = duration * (0.5 / (pO2i - 0.5)) ** (-5 / 6)
         else:
             # print(f"{step!r} i {pO2i} f {pO2f}")
@@ -51,66 +58,119 @@ class PulmonaryOxygenToxicity(Model):
 
     def undo_last_step(self):
         self.history.pop(-1)
-        self.otus = self.history[-1]
+        self.otus = self.history[-1] if self.history else self.initial_otus
+
+    def load_state(self, state):
+        # `state` is None unless set explicitly: series total OTUs per day instead
+        if state is not None:
+            self.otus = self.initial_otus = state
+            self.history = []
+
+    def initial_state(self):
+        return self.initial_otus
 
     def __repr__(self):
         return f"{self.otus:.0f} OTUs"
 
 
+@dataclasses.dataclass(frozen=True)
+class CNSTimeTable:
+    """NOAA CNS exposure limits as piecewise linear segments.
+
+    Within ``pO2_low[i] < pO2 <= pO2_high[i]`` the time limit in minutes is
+    ``slope[i] * pO2 + intercept[i]``.
+    """
+
+    pO2_low: tuple[float, ...]
+    pO2_high: tuple[float, ...]
+    slope: tuple[float, ...]
+    intercept: tuple[float, ...]
+
+    def segment(self, pO2):
+        """Index of the segment containing `pO2`, or None if outside the table."""
+        index = bisect.bisect_left(self.pO2_high, pO2)
+        if index < len(self.pO2_high) and self.pO2_low[index] < pO2:
+            return index
+        return None
+
+    def segments(self, low_pO2, high_pO2):
+        """Indices of the segments overlapping the range `low_pO2` to `high_pO2`."""
+        return range(
+            bisect.bisect_right(self.pO2_high, low_pO2),
+            bisect.bisect_left(self.pO2_low, high_pO2),
+        )
+
+
+@functools.cache
+def cns_time_table() -> CNSTimeTable:
+    """Load the CNS time limit table from ``cns.csv`` on first use."""
+    path = importlib.resources.files("pydive") / "models" / "cns.csv"
+    with path.open() as file:
+        rows = list(csv.DictReader(file))
+    return CNSTimeTable(
+        *(
+            tuple(float(row[column]) for row in rows)
+            for column in ("pO2_low", "pO2_high", "slope", "intercept")
+        )
+    )
+
+
 class CNSOxygenToxicity(Model):
     name = "Central nervous system oxygen toxicity model"
 
     fraction = 0
+    initial_fraction = 0
     history: list[float]
 
+    half_time = 90  # mins at the surface
+
     def __init__(self, dive):
         super().__init__(dive)
         self.history = []
 
-    cns_time_table = pd.read_csv(
-        importlib.resources.files("pydive") / "models" / "cns.csv"
-    )
-    cns_time_rows = list(cns_time_table.itertuples())
-
     def apply_dive_step(self, step):
-        pO2i = step.gas.partial_pressure(Oxygen, step.start_depth)
-        pO2f = step.gas.partial_pressure(Oxygen, step.start_depth + step.depth_change)
+        fO2 = step.gas.fractions[Oxygen.index]
+        pO2i = (step.start_depth / 10 + 1) * fO2
+        pO2f = ((step.start_depth + step.depth_change) / 10 + 1) * fO2
 
         min_pO2 = min(pO2i, pO2f)
         max_pO2 = max(pO2i, pO2f)
 
-        low_pO2 = max(self.cns_time_table.pO2_low.iloc[0], min_pO2)
+        table = cns_time_table()
+        low_pO2 = max(table.pO2_low[0], min_pO2)
 
-        if max_pO2 <= self.cns_time_table.pO2_low.iloc[0]:
+        if max_pO2 <= table.pO2_low[0]:
             self.history.append(self.fraction)
             return
-        if max_pO2 > self.cns_time_table.pO2_high.iloc[-1]:
+        if max_pO2 > table.pO2_high[-1]:
             warn(f"pO2 ({max_pO2}) exceeds table limits")
 
         if low_pO2 == max_pO2:
-            for row in self.cns_time_rows:
-                if row.pO2_low < low_pO2 <= row.pO2_high:
-                    tlim = row.slope * low_pO2 + row.intercept
-
-                    inc = step.minutes / tlim
-                    self.fraction += inc
-                    self.history.append(self.fraction)
+            i = table.segment(low_pO2)
+            if i is None:
+                raise ValueError(
+                    f"pO2 of {low_pO2:.2f} bar is outside the CNS exposure table"
+                )
+            tlim = table.slope[i] * low_pO2 + table.intercept[i]
+
+            inc = step.minutes / tlim
+            self.fraction += inc
+            self.history.append(self.fraction)
 
-                    return
-            raise Exception
+            return
 
         time = step.minutes * (max_pO2 - low_pO2) / (max_pO2 - min_pO2)
 
         inc = 0
-        for row in self.cns_time_rows:
-            seg_low_pO2 = min(max(low_pO2, row.pO2_low), row.pO2_high)
-            seg_high_pO2 = min(max(max_pO2, row.pO2_low), row.pO2_high)
+        for i in table.segments(low_pO2, max_pO2):
+            seg_low_pO2 = min(max(low_pO2, table.pO2_low[i]), table.pO2_high[i])
+            seg_high_pO2 = min(max(max_pO2, table.pO2_low[i]), table.pO2_high[i])
             seg_time = time * (seg_high_pO2 - seg_low_pO2) / (max_pO2 - low_pO2)
 
             if seg_time == 0:
                 continue
-            tlim = row.slope * seg_low_pO2 + row.intercept
-            mk = row.slope * (seg_high_pO2 - seg_low_pO2) / seg_time
+            tlim = table.slope[i] * seg_low_pO2 + table.intercept[i]
+            mk = table.slope[i] * (seg_high_pO2 - seg_low_pO2) / seg_time
             inc += 1 / mk * (math.log(abs(tlim + mk * seg_time)) - math.log(abs(tlim)))
 
         self.fraction += inc
@@ -119,7 +179,108 @@ class CNSOxygenToxicity(Model):
 
     def undo_last_step(self):
         self.history.pop(-1)
-        self.fraction = self.history[-1]
+        self.fraction = self.history[-1] if self.history else self.initial_fraction
+
+    def state(self):
+        return self.fraction
+
+    def load_state(self, state):
+        self.fraction = self.initial_fraction = state
+        self.history = []
+
+    def initial_state(self):
+        return self.initial_fraction
+
+    def surface_interval(self, minutes):
+        self.load_state(self.fraction * 0.5 ** (minutes / self.half_time))
 
     def __repr__(self):
         return f"{self.fraction:.0%}"
+
+
+def otu_series(pO2_start, pO2_end, minutes) -> np.ndarray:
+    """Cumulative OTUs after each of a series of linear pO2 segments.
+
+    Vectorized equivalent of `PulmonaryOxygenToxicity`: the parts of each segment
+    below 0.5 bar are clipped off and constant and ramped segments are integrated
+    in closed form.
+    """
+    pO2i = np.asarray(pO2_start, dtype=float)
+    pO2f = np.asarray(pO2_end, dtype=float)
+    minutes = np.asarray(minutes, dtype=float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exposed = (pO2i > 0.5) | (pO2f > 0.5)
+        duration = np.where(
+            pO2i < 0.5,
+            (pO2f - 0.5) / (pO2f - pO2i) * minutes,
+            np.where(pO2f < 0.5, (pO2i - 0.5) / (pO2i - pO2f) * minutes, minutes),
+        )
+        pO2i = np.maximum(pO2i, 0.5)
+        pO2f = np.maximum(pO2f, 0.5)
+
+        constant = duration * (0.5 / (pO2i - 0.5)) ** (-5 / 6)
+        ramp = (
+            (3 / 11)
+            * duration
+            / (pO2f - pO2i)
+            * (((pO2f - 0.5) / 0.5) ** (11 / 6) - ((pO2i - 0.5) / 0.5) ** (11 / 6))
+        )
+        gain = np.where(pO2i == pO2f, constant, ramp)
+    return np.cumsum(np.where(exposed, gain, 0))
+
+
+def cns_series(pO2_start, pO2_end, minutes) -> np.ndarray:
+    """Cumulative CNS fraction after each of a series of linear pO2 segments.
+
+    Vectorized equivalent of `CNSOxygenToxicity`, integrating each segment across
+    the CNS time table segments it crosses. Exposure above the table is not
+    counted.
+    """
+    pO2i = np.asarray(pO2_start, dtype=float)
+    pO2f = np.asarray(pO2_end, dtype=float)
+    minutes = np.asarray(minutes, dtype=float)
+
+    table = cns_time_table()
+    table_low = np.array(table.pO2_low)
+    table_high = np.array(table.pO2_high)
+    slope = np.array(table.slope)
+    intercept = np.array(table.intercept)
+
+    min_pO2 = np.minimum(pO2i, pO2f)
+    max_pO2 = np.maximum(pO2i, pO2f)
+    low_pO2 = np.maximum(table_low[0], min_pO2)
+    if (max_pO2 > table_high[-1]).any():
+        warn(f"pO2 ({max_pO2.max()}) exceeds table limits")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Constant pO2
+        index = np.minimum(np.searchsorted(table_high, low_pO2), len(table_high) - 1)
+        tlim = slope[index] * low_pO2 + intercept[index]
+        in_table = (table_low[index] < low_pO2) & (low_pO2 <= table_high[index])
+        constant = np.where(in_table, minutes / tlim, 0)
+
+        # Ramps, integrated over each table segment
+        time = minutes * (max_pO2 - low_pO2) / (max_pO2 - min_pO2)
+        seg_low = np.clip(low_pO2[:, None], table_low, table_high)
+        seg_high = np.clip(max_pO2[:, None], table_low, table_high)
+        seg_time = time[:, None] * (seg_high - seg_low) / (max_pO2 - low_pO2)[:, None]
+        tlim = slope * seg_low + intercept
+        mk = slope * (seg_high - seg_low) / seg_time
+        ramp = np.where(
+            seg_time > 0,
+            1 / mk * (np.log(np.abs(tlim + mk * seg_time)) - np.log(np.abs(tlim))),
+            0,
+        ).sum(axis=1)
+
+    inc = np.where(low_pO2 == max_pO2, constant, ramp)
+    return np.cumsum(np.where(max_pO2 > table_low[0], inc, 0))
+
+
+def oxygen_exposure(step_log: StepLog) -> tuple[np.ndarray, np.ndarray]:
+    """Cumulative OTUs and CNS fraction at the end of each step of `step_log`."""
+    pO2_start, pO2_end = step_log.partial_pressure(Oxygen)
+    return (
+        otu_series(pO2_start, pO2_end, step_log.minutes),
+        cns_series(pO2_start, pO2_end, step_log.minutes),
+    )
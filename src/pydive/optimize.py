@@ -0,0 +1,124 @@
+"""Search for the deco gases and switch depths that best suit a dive."""
+
+import dataclasses
+import itertools
+import logging
+import math
+
+from pydive.dive import Dive
+from pydive.gas import GasBlend, Helium, Nitrogen, Oxygen
+from pydive.models.decompression.projection import AscentProjection
+from pydive.models.gas_consumption import step_consumption
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class DecoGasOption:
+    deco_gases: dict[float, GasBlend]
+    tts: float  # mins
+    gas: float | None = None  # surface l breathed during the ascent
+
+
+def candidate_blends(oxygen, helium=(0,)) -> list[GasBlend]:
+    """Blends for every combination of `oxygen` and `helium` fractions.
+
+    The rest of each blend is nitrogen; impossible combinations are skipped.
+    """
+    rtn = []
+    for fO2, fHe in itertools.product(oxygen, helium):
+        fN2 = round(1 - fO2 - fHe, 6)
+        if fN2 < 0 or fO2 <= 0:
+            continue
+        fractions = {Oxygen.name: fO2, Helium.name: fHe, Nitrogen.name: fN2}
+        rtn.append(GasBlend(**{name: f for name, f in fractions.items() if f > 0}))
+    return rtn
+
+
+def switch_depths(gas: GasBlend, max_pO2=1.6, max_pNarc=None) -> list[float]:
+    """Stop depths, deepest first, at which `gas` is within the pO2 and narcotic
+    limits."""
+    limit = gas.max_operating_depth_at(max_pO2)
+    if max_pNarc is not None:
+        limit = min(limit, gas.max_narcotic_depth_at(max_pNarc))
+    return list(range(3 * math.floor(limit / 3), 0, -3))
+
+
+def optimize_deco_gases(
+    dive: Dive,
+    blends: list[GasBlend],
+    max_gases=2,
+    objective="tts",
+    max_pO2=1.6,
+    max_pNarc=None,
+    switch_options=3,
+    best=5,
+    batch=512,
+) -> list[DecoGasOption]:
+    """Choose deco gases from `blends`, and where to switch to them, for `dive`.
+
+    Every selection of up to `max_gases` of the blends is tried, switching to each
+    at one of its `switch_options` deepest stop depths allowed by `max_pO2` and
+    `max_pNarc` that is shallower than the dive. The ascents for all selections
+    are projected in batches from the dive's current state with
+    `AscentProjection`, so thousands of plans take a few seconds.
+
+    Parameters
+    ----------
+    dive
+        The dive up to the start of the ascent. It is not modified.
+    objective
+        ``"tts"`` to minimise the time to surface or ``"gas"`` to minimise the
+        surface volume of gas breathed during the ascent.
+    best
+        Number of options to return.
+
+    Returns
+    -------
+    list[DecoGasOption]
+        The best options, best first.
+
+    Raises
+    ------
+    ValueError
+        If the objective is unknown or the dive's ascents cannot be projected.
+    """
+    if objective not in ("tts", "gas"):
+        raise ValueError(f"unknown objective {objective}, expected tts or gas")
+    options = {
+        gas: [
+            depth
+            for depth in switch_depths(gas, max_pO2, max_pNarc)
+            if depth < dive.depth
+        ][:switch_options]
+        for gas in blends
+    }
+    plans = [
+        dict(zip(depths, gases))
+        for count in range(max_gases + 1)
+        for gases in itertools.combinations(blends, count)
+        for depths in itertools.product(*(options[gas] for gas in gases))
+        if len(set(depths)) == count
+    ]
+    logger.info(f"evaluating {len(plans)} deco gas plans")
+
+    projection = AscentProjection(dive.decompression_model)
+    pressures = projection.pressures()
+    sac = dive.models["consumption"].sac
+    rtn = []
+    for start in range(0, len(plans), batch):
+        chunk = plans[start : start + batch]
+        result = projection.project(
+            pressures, dive.depth, dive.gas, chunk, steps=objective == "gas"
+        )
+        for index, plan in enumerate(chunk):
+            volume = None
+            if result.step_logs is not None:
+                volume = float(step_consumption(result.step_logs[index], sac).sum())
+            rtn.append(DecoGasOption(plan, float(result.tts[index]), volume))
+
+    if objective == "tts":
+        rtn.sort(key=lambda option: option.tts)
+    else:
+        rtn.sort(key=lambda option: (option.gas, option.tts))
+    return rtn[:best]
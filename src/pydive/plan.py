@@ -0,0 +1,379 @@
+import collections
+import dataclasses
+import json
+import logging
+import math
+
+from pydive.cache import PlanCache, open_cache, plan_key
+from pydive.dive import Dive
+from pydive.gas import GasBlend, Nitrogen, air
+from pydive.models.decompression.buhlmann import BuhlmannBase, BuhlmannZHL16C
+from pydive.models.decompression.vpm_b import VPMB
+
+logger = logging.getLogger(__name__)
+
+models = {
+    "buhlmann-zhl-16c": BuhlmannZHL16C,
+    "vpm-b": VPMB,
+}
+
+
+def gas_from_dict(value) -> GasBlend:
+    """Parse ``"air"`` or a mapping of gas names to fractions, the rest nitrogen."""
+    if value == "air":
+        return air
+    if not isinstance(value, dict):
+        raise ValueError(f"expected a gas, got {value!r}")
+    fractions = {name: fraction for name, fraction in value.items() if name != "depth"}
+    if Nitrogen.name not in fractions:
+        fractions[Nitrogen.name] = round(1 - sum(fractions.values()), 6)
+    return GasBlend(**fractions)
+
+
+def gas_to_dict(gas: GasBlend) -> dict[str, float]:
+    return {component.name: fraction for component, fraction in gas.blend.items()}
+
+
+def switch_depth(gas: GasBlend) -> float:
+    """Default switch depth for a deco gas, its MOD rounded down to a 3 m stop."""
+    return math.floor(gas.max_operating_depth / 3) * 3
+
+
+@dataclasses.dataclass(frozen=True)
+class Waypoint:
+    depth: float  # m
+    duration: float  # mins, including travel from the previous waypoint
+    gas: GasBlend | None = None
+
+
+@dataclasses.dataclass
+class DivePlan:
+    """A dive to plan, in the form read from and written to JSON.
+
+    Waypoints follow the GUI dive table: each one reaches `depth` and stays there
+    until `duration` minutes have passed since the previous waypoint, optionally
+    switching gas first.
+    """
+
+    gas: GasBlend
+    waypoints: list[Waypoint]
+    deco_gases: dict[float, GasBlend] = dataclasses.field(default_factory=dict)
+    model: str = "buhlmann-zhl-16c"
+    low_gf: float | None = None
+    high_gf: float | None = None
+    last_stop: float | None = None
+    conservatism: int | None = None
+    identifier: str | int | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DivePlan":
+        """Create a plan from parsed JSON.
+
+        Parameters
+        ----------
+        data
+            A mapping with ``gas``, ``waypoints`` (each with ``depth``, ``duration``
+            and optionally ``gas``) and optionally ``deco_gases`` (each a gas with an
+            optional switch ``depth``), ``model``, ``low_gf``, ``high_gf``,
+            ``last_stop``, ``conservatism`` and ``id``.
+
+        Raises
+        ------
+        ValueError
+            If a required field is missing or a value is invalid or out of range.
+        """
+        try:
+            gas = gas_from_dict(data["gas"])
+            waypoints = [
+                Waypoint(
+                    depth=float(waypoint["depth"]),
+                    duration=float(waypoint["duration"]),
+                    gas=gas_from_dict(waypoint["gas"]) if "gas" in waypoint else None,
+                )
+                for waypoint in data["waypoints"]
+            ]
+        except KeyError as e:
+            raise ValueError(f"missing field {e}") from e
+        deco_gases = {}
+        for value in data.get("deco_gases", []):
+            deco_gas = gas_from_dict(value)
+            depth = value.get("depth") if isinstance(value, dict) else None
+            deco_gases[switch_depth(deco_gas) if depth is None else depth] = deco_gas
+        model = data.get("model", cls.model)
+        if model not in models:
+            raise ValueError(f"unknown model {model}, expected one of {list(models)}")
+        _check_settings(data)
+        return cls(
+            gas=gas,
+            waypoints=waypoints,
+            deco_gases=deco_gases,
+            model=model,
+            low_gf=data.get("low_gf"),
+            high_gf=data.get("high_gf"),
+            last_stop=data.get("last_stop"),
+            conservatism=data.get("conservatism"),
+            identifier=data.get("id"),
+        )
+
+    @classmethod
+    def from_json(cls, line: str) -> "DivePlan":
+        return cls.from_dict(json.loads(line))
+
+    def to_dict(self) -> dict:
+        rtn = {
+            "gas": gas_to_dict(self.gas),
+            "waypoints": [
+                {"depth": waypoint.depth, "duration": waypoint.duration}
+                | ({"gas": gas_to_dict(waypoint.gas)} if waypoint.gas else {})
+                for waypoint in self.waypoints
+            ],
+            "deco_gases": [
+                gas_to_dict(gas) | {"depth": depth}
+                for depth, gas in sorted(self.deco_gases.items(), reverse=True)
+            ],
+            "model": self.model,
+        }
+        for name in ["low_gf", "high_gf", "last_stop", "conservatism"]:
+            if getattr(self, name) is not None:
+                rtn[name] = getattr(self, name)
+        if self.identifier is not None:
+            rtn["id"] = self.identifier
+        return rtn
+
+    def build_dive(self) -> Dive:
+        """Create the dive up to the start of decompression.
+
+        Raises
+        ------
+        ValueError
+            If a waypoint is too short to reach its depth, or a setting does not
+            apply to the chosen model.
+        """
+        dive = Dive(self.gas, model=models[self.model])
+        deco = dive.decompression_model
+        for name, value in [("low_gf", self.low_gf), ("high_gf", self.high_gf)]:
+            if value is not None:
+                if not isinstance(deco, BuhlmannBase) or isinstance(deco, VPMB):
+                    raise ValueError(f"{name} does not apply to {deco.name}")
+                setattr(deco, name, value)
+        if self.conservatism is not None:
+            if not isinstance(deco, VPMB):
+                raise ValueError(f"conservatism does not apply to {deco.name}")
+            deco.conservatism_level = self.conservatism
+        if self.last_stop is not None:
+            deco.last_stop = self.last_stop
+
+        for waypoint in self.waypoints:
+            follow_waypoint(dive, waypoint)
+        dive.deco_gases = dict(self.deco_gases)
+        return dive
+
+    def execute(self, cache: PlanCache = None) -> dict:
+        """Plan the dive and return a JSON serialisable summary.
+
+        Parameters
+        ----------
+        cache
+            Cache to look the plan up in and store the summary to.
+
+        Returns
+        -------
+        dict
+            The plan ``id`` and its ``stops`` (depth in m, duration in mins and
+            gas), ``runtime`` and ``tts`` in mins, ``cns`` fraction, ``otus`` and
+            surface ``gas`` volumes in l.
+        """
+        dive = self.build_dive()
+        if cache is not None:
+            key = plan_key(dive)
+            result = cache.get(key)
+            if result is not None:
+                return {"id": self.identifier} | result
+
+        bottom_time = dive.duration
+        dive.decompress()
+        result = summary(dive, bottom_time)
+        if cache is not None:
+            cache.put(key, result)
+        return {"id": self.identifier} | result
+
+
+def _check_settings(data: dict):
+    for name in ["low_gf", "high_gf", "last_stop", "conservatism"]:
+        value = data.get(name)
+        if value is not None and (
+            isinstance(value, bool) or not isinstance(value, (int, float))
+        ):
+            raise ValueError(f"{name} should be a number, got {value!r}")
+    for name in ["low_gf", "high_gf"]:
+        if data.get(name) is not None and not 0 < data[name] <= 1:
+            raise ValueError(f"{name} should be above 0 and at most 1")
+    if data.get("low_gf") is not None and data.get("high_gf") is not None:
+        if data["low_gf"] > data["high_gf"]:
+            raise ValueError("low_gf should not exceed high_gf")
+    if data.get("last_stop") is not None and not data["last_stop"] > 0:
+        raise ValueError("last_stop should be above 0 m")
+    conservatism = data.get("conservatism")
+    levels = len(VPMB.conservatism_levels)
+    if conservatism is not None and conservatism not in range(levels):
+        raise ValueError(f"conservatism should be an integer from 0 to {levels - 1}")
+
+
+def follow_waypoint(dive: Dive, waypoint: Waypoint):
+    """Apply the steps that take `dive` to `waypoint`.
+
+    Raises
+    ------
+    ValueError
+        If the waypoint is too short to reach its depth.
+    """
+    if waypoint.gas is not None and waypoint.gas != dive.gas:
+        dive.switch_gas(waypoint.gas)
+    if waypoint.depth > dive.depth:
+        time = dive.descend(waypoint.depth).minutes
+    elif waypoint.depth < dive.depth:
+        time = dive.ascend(waypoint.depth).minutes
+    else:
+        time = 0
+    if waypoint.duration < time:
+        raise ValueError(
+            f"{waypoint.duration} mins is too short to reach {waypoint.depth} m"
+        )
+    dive.stay(waypoint.duration - time)
+
+
+class IncrementalBuilder:
+    """Build dives from waypoints, reusing the dive state of unchanged prefixes.
+
+    A checkpoint of the dive is kept after each waypoint, keyed by the bottom gas,
+    model and waypoints so far. Rebuilding after an edit restores the checkpoint of
+    the longest unchanged prefix and only simulates the waypoints from the first
+    edited one onwards. Checkpoints share the steps of their prefix and hold model
+    state as tuples, so an edit near the end of a long dive costs about as much as
+    one on a short dive. Snapshots are evicted least recently used first once there
+    are more than `max_snapshots`.
+    """
+
+    max_snapshots = 64
+
+    def __init__(self, model=None, max_snapshots=None):
+        self.model = model
+        if max_snapshots is not None:
+            self.max_snapshots = max_snapshots
+        self.stats = {"builds": 0, "waypoints": 0, "reused": 0}
+        self._snapshots: collections.OrderedDict[tuple, tuple] = (
+            collections.OrderedDict()
+        )
+
+    def build(
+        self,
+        gas: GasBlend,
+        waypoints: list[Waypoint],
+        deco_gases: dict[float, GasBlend] = None,
+    ) -> Dive:
+        """Create the dive on `gas` following `waypoints`, ready to decompress.
+
+        The returned dive is a fresh copy that can be modified freely.
+
+        Raises
+        ------
+        ValueError
+            If a waypoint is too short to reach its depth.
+        """
+        self.stats["builds"] += 1
+        waypoints = tuple(waypoints)
+        base = (gas, self.model)
+
+        reused = 0
+        for length in range(len(waypoints), 0, -1):
+            key = base + waypoints[:length]
+            if key in self._snapshots:
+                self._snapshots.move_to_end(key)
+                dive = Dive.from_checkpoint(self._snapshots[key])
+                reused = length
+                break
+        else:
+            dive = Dive(gas, model=self.model)
+        self.stats["reused"] += reused
+        if reused:
+            logger.debug(f"reusing {reused} of {len(waypoints)} waypoints")
+
+        for length in range(reused + 1, len(waypoints) + 1):
+            follow_waypoint(dive, waypoints[length - 1])
+            self.stats["waypoints"] += 1
+            self._store(base + waypoints[:length], dive.checkpoint())
+
+        dive.deco_gases = dict(deco_gases or {})
+        return dive
+
+    def _store(self, key, checkpoint):
+        self._snapshots[key] = checkpoint
+        while len(self._snapshots) > self.max_snapshots:
+            self._snapshots.popitem(last=False)
+
+    def clear(self):
+        self._snapshots.clear()
+
+
+def summary(dive: Dive, bottom_time: float) -> dict:
+    """JSON serialisable summary of a decompressed `dive`, as from `DivePlan.execute`.
+
+    `bottom_time` is the duration in seconds before decompression started.
+    """
+    consumption = dive.models["consumption"].consumption
+    return {
+        "stops": stops(dive),
+        "runtime": dive.duration / 60,
+        "tts": (dive.duration - bottom_time) / 60,
+        "cns": dive.models["cns"].fraction,
+        "otus": dive.models["pulmonary"].otus,
+        "gas": {gas.label: volume for gas, volume in consumption.items()},
+    }
+
+
+def stops(dive: Dive) -> list[dict]:
+    """Time spent stationary at each depth during decompression, in mins.
+
+    A gas switch at a stop counts towards that stop, which reports the gas breathed
+    when leaving it.
+    """
+    rtn = []
+    for step in dive.decompression_steps:
+        if step.rate != 0 or step.duration == 0:
+            continue
+        if rtn and rtn[-1]["depth"] == step.start_depth:
+            rtn[-1]["duration"] += step.minutes
+            rtn[-1]["gas"] = step.gas.label
+        else:
+            rtn.append(
+                {
+                    "depth": step.start_depth,
+                    "duration": step.minutes,
+                    "gas": step.gas.label,
+                }
+            )
+    return rtn
+
+
+def execute_json(line: str, index: int = None, cache_path=None) -> dict:
+    """Plan the JSON encoded plan `line`, reporting errors in the result.
+
+    A plan without an ``id`` is identified by `index`. Results are cached in the
+    `PlanCache` at `cache_path` if given. Invalid plans, and plans that fail for
+    any other reason, produce a result with an ``error`` message instead of
+    raising, so one bad line does not stop a batch.
+    """
+    identifier = index
+    try:
+        data = json.loads(line)
+        if isinstance(data, dict) and data.get("id") is not None:
+            identifier = data["id"]
+        plan = DivePlan.from_dict(data)
+        plan.identifier = identifier
+        return plan.execute(None if cache_path is None else open_cache(cache_path))
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.warning(f"failed to plan line {index}: {e}")
+        return {"id": identifier, "error": str(e)}
+    except Exception as e:
+        logger.exception(f"unexpected error planning line {index}")
+        return {"id": identifier, "error": f"{type(e).__name__}: {e}"}
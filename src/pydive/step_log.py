@@ -0,0 +1,162 @@
+import dataclasses
+from typing import TYPE_CHECKING, Iterable, Sequence
+
+import numpy as np
+
+from pydive.gas import GasBlend, air
+
+if TYPE_CHECKING:
+    import pydive.dive
+
+
+@dataclasses.dataclass(frozen=True)
+class StepLog:
+    """Columnar representation of a sequence of dive steps.
+
+    Each index describes one step in the same terms as `pydive.dive.DiveStep`: the
+    depth it starts at (m), its rate (m/min), its duration (s) and the gas breathed,
+    stored as an index into `gases`.
+    """
+
+    start_depth: np.ndarray
+    rate: np.ndarray
+    duration: np.ndarray
+    gas_index: np.ndarray
+    gases: tuple[GasBlend, ...]
+
+    def __len__(self):
+        return len(self.duration)
+
+    @property
+    def depth_change(self):
+        return self.rate * self.duration / 60
+
+    @property
+    def end_depth(self):
+        return self.start_depth + self.depth_change
+
+    @property
+    def minutes(self):
+        return self.duration / 60
+
+    @property
+    def runtime(self):
+        """Elapsed time (s) at the end of each step."""
+        return np.cumsum(self.duration)
+
+    @property
+    def max_depth(self):
+        if len(self) == 0:
+            return 0
+        return float(max(self.start_depth.max(), self.end_depth.max()))
+
+    def fraction(self, gas):
+        """Fraction of `gas` breathed during each step."""
+        fractions = np.array([blend.fraction(gas) for blend in self.gases], dtype=float)
+        return fractions[self.gas_index]
+
+    def partial_pressure(self, gas):
+        """Partial pressure of `gas` at the start and at the end of each step."""
+        fraction = self.fraction(gas)
+        return (
+            (self.start_depth / 10 + 1) * fraction,
+            (self.end_depth / 10 + 1) * fraction,
+        )
+
+    @classmethod
+    def from_steps(cls, steps: Iterable["pydive.dive.DiveStep"]):
+        steps = list(steps)
+        gases = []
+        gas_index = []
+        for step in steps:
+            if step.gas not in gases:
+                gases.append(step.gas)
+            gas_index.append(gases.index(step.gas))
+        return cls(
+            start_depth=np.array([step.start_depth for step in steps], dtype=float),
+            rate=np.array([step.rate for step in steps], dtype=float),
+            duration=np.array([step.duration for step in steps], dtype=float),
+            gas_index=np.array(gas_index, dtype=int),
+            gases=tuple(gases),
+        )
+
+    @classmethod
+    def from_samples(
+        cls,
+        times: Sequence[float],
+        depths: Sequence[float],
+        gas_index: Sequence[int] = None,
+        gases: Sequence[GasBlend] = (air,),
+    ):
+        """Build a step log from a sampled depth profile.
+
+        Parameters
+        ----------
+        times
+            Sample times in seconds from the start of the dive.
+        depths
+            Sample depths in metres.
+        gas_index
+            Index into `gases` of the gas breathed from each sample onward; defaults
+            to the first gas throughout.
+        gases
+            Gases referred to by `gas_index`.
+
+        Returns
+        -------
+        StepLog
+            One step per pair of consecutive samples. Samples are assumed to start
+            at the surface; if the first sample is later than time zero a surface
+            sample is prepended. Repeated sample times are dropped.
+
+        Raises
+        ------
+        ValueError
+            If the lengths differ or a sample at time zero is below the surface.
+        """
+        times = np.asarray(times, dtype=float)
+        depths = np.asarray(depths, dtype=float)
+        if gas_index is None:
+            gas_index = np.zeros(len(times), dtype=int)
+        else:
+            gas_index = np.asarray(gas_index, dtype=int)
+        if not len(times) == len(depths) == len(gas_index):
+            raise ValueError("times, depths and gas_index should have the same length")
+
+        if len(times) and times[0] > 0:
+            times = np.concatenate([[0.0], times])
+            depths = np.concatenate([[0.0], depths])
+            gas_index = np.concatenate([gas_index[:1], gas_index])
+        elif len(times) and depths[0] != 0:
+            raise ValueError(
+                f"samples should start at the surface, not {depths[0]} m at time 0"
+            )
+
+        keep = np.concatenate([[True], np.diff(times) > 0]) if len(times) else []
+        times, depths, gas_index = times[keep], depths[keep], gas_index[keep]
+
+        duration = np.diff(times)
+        return cls(
+            start_depth=depths[:-1],
+            rate=np.diff(depths) / duration * 60,
+            duration=duration,
+            gas_index=gas_index[:-1],
+            gases=tuple(gases),
+        )
+
+    def apply_to(self, dive: "pydive.dive.Dive"):
+        """Apply each step of the log to `dive` in order."""
+        from pydive.dive import DiveStep
+
+        for rate, duration, index in zip(
+            self.rate.tolist(), self.duration.tolist(), self.gas_index.tolist()
+        ):
+            dive.apply_step(DiveStep(dive, self.gases[index], rate, duration))
+        return dive
+
+    def to_dive(self, model=None):
+        """Replay the log through a new `pydive.dive.Dive` using `model`."""
+        from pydive.dive import Dive
+
+        gas = self.gases[self.gas_index[0]] if len(self) else self.gases[0]
+        return self.apply_to(Dive(gas, model=model))
@@ -1,10 +1,61 @@
+import copy
+import enum
 import logging
 import math
 
+import numpy as np
 from numpy.polynomial import Polynomial as NPPolynomial
 
+from pydive.gas import GasBlend
+
 logger = logging.getLogger(__name__)
 
+_SCALAR_TYPES = frozenset((int, float, str, bool, type(None), GasBlend))
+
+
+def _is_atomic(value):
+    return isinstance(value, (int, float, str, type, enum.Enum, GasBlend, type(None)))
+
+
+def freeze(value):
+    """Immutable copy of `value` that `thaw` turns back into an equal mutable copy.
+
+    Lists and tuples of scalars, such as model histories, are stored as a single
+    tuple so that freezing and thawing them is a C level copy rather than a Python
+    loop. Lists, tuples, dicts and plain objects are copied recursively; gas blends,
+    classes, enums and scalars are immutable and kept as they are. Anything else is
+    deep copied. Objects referenced more than once are copied once per reference.
+    """
+    if _is_atomic(value):
+        return value
+    if type(value) in (list, tuple):
+        if _SCALAR_TYPES.issuperset(map(type, value)):
+            return (type(value), tuple(value))
+        return (type(value), None, tuple(map(freeze, value)))
+    if type(value) is dict:
+        return (dict, tuple((key, freeze(item)) for key, item in value.items()))
+    if hasattr(value, "__dict__") and not isinstance(value, (dict, list, tuple, set)):
+        return (object, type(value), freeze(vars(value))[1])
+    return (copy.deepcopy, copy.deepcopy(value))
+
+
+def thaw(frozen):
+    """Mutable copy of a value frozen by `freeze`, which can be thawed again."""
+    if not isinstance(frozen, tuple):
+        return frozen
+    kind = frozen[0]
+    if kind is list or kind is tuple:
+        if len(frozen) == 2:
+            return kind(frozen[1])
+        return kind(map(thaw, frozen[2]))
+    if kind is dict:
+        return {key: thaw(item) for key, item in frozen[1]}
+    if kind is object:
+        value = frozen[1].__new__(frozen[1])
+        value.__dict__.update((key, thaw(item)) for key, item in frozen[2])
+        return value
+    return copy.deepcopy(frozen[1])
+
 
 class Polynomial:
     def __init__(self, coefficients):
@@ -35,3 +86,45 @@ class Polynomial:
             return abs(root.real) >= abs(root.imag) * 10**6
 
         return [root.real for root in all_roots if is_real(root)]
+
+
+def largest_triangle_three_buckets(x, y, threshold: int) -> np.ndarray:
+    """Indices of at most `threshold` points that keep the shape of a series.
+
+    Implements Steinarsson's largest triangle three buckets downsampling: the first
+    and last points are kept and every bucket in between contributes the point
+    forming the largest triangle with the previously chosen point and the average
+    of the next bucket.
+
+    Parameters
+    ----------
+    x, y
+        Coordinates of the series, with `x` increasing.
+    threshold
+        Maximum number of points to keep, all of them if less than 3.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    indices = np.empty(threshold, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+    # Edges of the threshold - 2 buckets between the first and last points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    edges = np.append(edges, n)
+    chosen = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        average_x = x[next_start:next_end].mean()
+        average_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[chosen] - average_x) * (y[start:end] - y[chosen])
+            - (x[chosen] - x[start:end]) * (average_y - y[chosen])
+        )
+        chosen = start + int(np.argmax(areas))
+        indices[bucket + 1] = chosen
+    return indices
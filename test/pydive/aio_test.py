@@ -0,0 +1,74 @@
+import asyncio
+import concurrent.futures
+import threading
+
+import pytest
+
+from pydive.aio import AsyncPlanner
+from pydive.plan import DivePlan
+
+plan = {
+    "gas": "air",
+    "waypoints": [{"depth": 30, "duration": 25}],
+    "deco_gases": [{"oxygen": 0.5}],
+}
+
+
+def test_coalesce():
+    async def main():
+        planner = AsyncPlanner()
+        results = await planner.plan_many(
+            [plan | {"id": i} for i in range(5)] + [plan | {"low_gf": 0.5}]
+        )
+        return planner, results
+
+    planner, results = asyncio.run(main())
+    assert planner.stats == {"requests": 6, "computations": 2, "coalesced": 4}
+    assert planner.in_flight == 0
+    assert [result["id"] for result in results] == [0, 1, 2, 3, 4, None]
+    assert results[0] == DivePlan.from_dict(plan | {"id": 0}).execute()
+    assert results[1]["stops"] is not results[0]["stops"]
+
+
+def test_timeout():
+    release = threading.Event()
+
+    async def main():
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            executor.submit(release.wait)
+            planner = AsyncPlanner(executor, timeout=0.05)
+            try:
+                with pytest.raises(TimeoutError):
+                    await planner.plan(plan)
+                assert planner.in_flight == 0
+
+                waiting = asyncio.ensure_future(planner.plan(plan, timeout=10))
+                await asyncio.sleep(0.01)
+                waiting.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await waiting
+                assert planner.in_flight == 0
+            finally:
+                release.set()
+            return await planner.plan(plan)
+
+    assert asyncio.run(main())["stops"]
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        asyncio.run(AsyncPlanner().plan({"gas": "air"}))
+
+
+def test_builds_off_loop(monkeypatch):
+    threads = []
+    build_dive = DivePlan.build_dive
+
+    def record(self):
+        threads.append(threading.current_thread())
+        return build_dive(self)
+
+    monkeypatch.setattr(DivePlan, "build_dive", record)
+    asyncio.run(AsyncPlanner().plan_many([plan, plan]))
+    assert len(threads) == 1
+    assert threads[0] is not threading.main_thread()
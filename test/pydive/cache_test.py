@@ -0,0 +1,91 @@
+import pytest
+
+from pydive.cache import PlanCache, plan_key
+from pydive.dive import DiveStep
+from pydive.dive_series import DiveSeries
+from pydive.gas import air
+from pydive.plan import DivePlan
+
+plan = {
+    "gas": {"oxygen": 0.21, "helium": 0.35},
+    "waypoints": [{"depth": 45, "duration": 10}],
+    "deco_gases": [{"oxygen": 0.5}],
+    "low_gf": 0.4,
+}
+
+
+class TestPlanKey:
+    def test_equal_plans(self):
+        first = DivePlan.from_dict(plan).build_dive()
+        second = DivePlan.from_dict(plan | {"id": "other"}).build_dive()
+        assert plan_key(first) == plan_key(second)
+
+    @pytest.mark.parametrize(
+        "change",
+        [
+            {"low_gf": 0.3},
+            {"last_stop": 3},
+            {"deco_gases": [{"oxygen": 0.5, "depth": 18}]},
+            {"waypoints": [{"depth": 45, "duration": 11}]},
+            {"model": "vpm-b", "low_gf": None},
+        ],
+    )
+    def test_different_plans(self, change):
+        first = DivePlan.from_dict(plan).build_dive()
+        second = DivePlan.from_dict(plan | change).build_dive()
+        assert plan_key(first) != plan_key(second)
+
+    def test_initial_state(self):
+        fresh = DivePlan.from_dict(plan).build_dive()
+        assert plan_key(fresh) == plan_key(DivePlan.from_dict(plan).build_dive())
+
+        series = DiveSeries()
+        previous = series.new_dive(air)
+        previous.descend(30)
+        previous.stay(30)
+        previous.decompress()
+        repetitive = series.new_dive(fresh.bottom_gas, surface_interval=60)
+        for step in fresh.steps:
+            repetitive.apply_step(
+                DiveStep(repetitive, step.gas, step.rate, step.duration)
+            )
+        repetitive.deco_gases = dict(fresh.deco_gases)
+        assert plan_key(repetitive) != plan_key(fresh)
+
+    def test_sac(self):
+        first = DivePlan.from_dict(plan).build_dive()
+        second = DivePlan.from_dict(plan).build_dive()
+        second.models["consumption"].sac = 15
+        assert plan_key(first) != plan_key(second)
+
+
+class TestPlanCache:
+    def test_execute(self, tmp_path):
+        with PlanCache(tmp_path / "cache.sqlite") as cache:
+            result = DivePlan.from_dict(plan | {"id": 1}).execute(cache)
+            assert cache.misses == 1
+            cached = DivePlan.from_dict(plan | {"id": 2}).execute(cache)
+            assert cache.hits == 1
+        assert cached == result | {"id": 2}
+
+        with PlanCache(tmp_path / "cache.sqlite") as cache:
+            assert DivePlan.from_dict(plan).execute(cache)["stops"] == result["stops"]
+            assert cache.hits == 1
+
+    def test_eviction(self, tmp_path):
+        with PlanCache(tmp_path / "cache.sqlite", max_bytes=100) as cache:
+            for key in "abcde":
+                cache.put(key, {"value": key * 20})
+            cache.get("c")
+            cache.put("f", {"value": "f" * 20})
+            assert cache.size <= 100
+            assert cache.get("c") is not None
+            assert cache.get("f") is not None
+            assert cache.get("a") is None
+
+    def test_version(self, tmp_path):
+        with PlanCache(tmp_path / "cache.sqlite") as cache:
+            cache.version = "old"
+            cache.put("a", {})
+        with PlanCache(tmp_path / "cache.sqlite") as cache:
+            assert len(cache) == 0
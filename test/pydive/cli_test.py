@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+from pydive.cli import main, plan_lines
+from pydive.gas import GasBlend
+from pydive.plan import DivePlan
+
+plan = {
+    "id": "reference 2",
+    "gas": "air",
+    "waypoints": [{"depth": 30, "duration": 3}, {"depth": 30, "duration": 21}],
+    "deco_gases": [{"oxygen": 0.5, "depth": 21}],
+}
+
+
+class TestDivePlan:
+    def test_round_trip(self):
+        dive_plan = DivePlan.from_dict(plan | {"model": "vpm-b", "conservatism": 3})
+        assert dive_plan.deco_gases == {21: GasBlend(oxygen=0.5, nitrogen=0.5)}
+        assert DivePlan.from_dict(dive_plan.to_dict()) == dive_plan
+
+    def test_default_switch_depth(self):
+        dive_plan = DivePlan.from_dict(plan | {"deco_gases": [{"oxygen": 0.5}]})
+        assert list(dive_plan.deco_gases) == [21]
+
+    def test_execute(self):
+        result = DivePlan.from_dict(plan).execute()
+
+        dive = DivePlan.from_dict(plan).build_dive()
+        bottom_time = dive.duration
+        dive.decompress()
+        assert result["runtime"] == dive.duration / 60
+        assert result["tts"] == (dive.duration - bottom_time) / 60
+        assert result["stops"][0]["depth"] > result["stops"][-1]["depth"]
+        assert result["stops"][-1]["gas"] == "EAN50"
+        assert sum(stop["duration"] for stop in result["stops"]) < result["tts"]
+        assert set(result["gas"]) == {"air", "EAN50"}
+        json.dumps(result)
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            DivePlan.from_dict(plan | {"low_gf": 0.3, "model": "vpm-b"}).build_dive()
+        with pytest.raises(ValueError):
+            DivePlan.from_dict({"gas": "air"})
+
+    @pytest.mark.parametrize(
+        "settings",
+        [
+            {"model": "vpm-b", "conservatism": 100},
+            {"model": "vpm-b", "conservatism": 1.5},
+            {"low_gf": 0},
+            {"high_gf": 85},
+            {"low_gf": 0.8, "high_gf": 0.5},
+            {"last_stop": -3},
+            {"low_gf": "0.3"},
+        ],
+    )
+    def test_out_of_range(self, settings):
+        with pytest.raises(ValueError):
+            DivePlan.from_dict(plan | settings)
+
+
+class TestCli:
+    lines = [json.dumps(plan), "", "not json", json.dumps(plan | {"id": None})]
+
+    @pytest.mark.parametrize("processes", [1, 2])
+    def test_plan_lines(self, processes):
+        results = sorted(
+            plan_lines(self.lines, processes), key=lambda result: str(result["id"])
+        )
+        assert [result["id"] for result in results] == [2, 3, "reference 2"]
+        assert "error" in results[0]
+        assert results[1]["stops"] == results[2]["stops"]
+
+    def test_plan_lines_out_of_table(self):
+        hyperoxic = {
+            "gas": {"oxygen": 0.32},
+            "waypoints": [{"depth": 50, "duration": 20}],
+        }
+        lines = [json.dumps(plan), json.dumps(hyperoxic), json.dumps(plan)]
+        results = list(plan_lines(lines, processes=1))
+        assert [result["id"] for result in results] == ["reference 2", 1, "reference 2"]
+        assert "CNS" in results[1]["error"]
+        assert results[0]["stops"] == results[2]["stops"]
+
+    def test_plan_lines_invalid_settings(self):
+        line = {
+            "gas": {"oxygen": 0.21, "nitrogen": 0.79},
+            "waypoints": [{"depth": 30, "duration": 20}],
+            "model": "vpm-b",
+            "conservatism": 100,
+        }
+        lines = [json.dumps(plan), json.dumps(line), json.dumps(plan)]
+        results = list(plan_lines(lines, processes=1))
+        assert [result["id"] for result in results] == ["reference 2", 1, "reference 2"]
+        assert "conservatism" in results[1]["error"]
+
+    def test_plan_lines_unexpected_error(self, monkeypatch):
+        def fail(self, cache=None):
+            raise IndexError("list index out of range")
+
+        monkeypatch.setattr(DivePlan, "execute", fail)
+        (result,) = plan_lines([json.dumps(plan)], processes=1)
+        assert result == {
+            "id": "reference 2",
+            "error": "IndexError: list index out of range",
+        }
+
+    def test_main(self, tmp_path):
+        path = tmp_path / "plans.jsonl"
+        path.write_text("\n".join(self.lines))
+        output = tmp_path / "results.jsonl"
+        assert main([str(path), "-o", str(output), "-j", "1"]) == 1
+        assert len(output.read_text().splitlines()) == 3
@@ -0,0 +1,71 @@
+import pytest
+
+from pydive.contingency import Variant
+from pydive.dive import Dive
+from pydive.gas import GasBlend
+
+trimix = GasBlend(oxygen=0.18, helium=0.45, nitrogen=0.37)
+ean50 = GasBlend(oxygen=0.5, nitrogen=0.5)
+oxygen = GasBlend(oxygen=1)
+
+
+def multilevel(extra_depth=0, extra_time=0, deco_gases=None):
+    dive = Dive(trimix)
+    dive.descend(60 + extra_depth)
+    dive.stay(25 + extra_time)
+    dive.ascend(40)
+    dive.stay(10)
+    dive.deco_gases = {21: ean50, 6: oxygen} if deco_gases is None else deco_gases
+    return dive
+
+
+def runtime(dive):
+    dive.decompress()
+    return dive.duration / 60
+
+
+class TestContingencies:
+    def test_standard_variants(self):
+        dive = multilevel()
+        table = dive.contingencies(processes=1)
+        assert list(table.index) == [
+            "planned",
+            "+3 m / +3 min",
+            "+5 m / +5 min",
+            "delayed ascent +5 min",
+            "lost EAN50",
+            "lost Oxygen",
+        ]
+        assert dive.decompression_steps == []
+
+        assert table.runtime["planned"] == pytest.approx(runtime(multilevel()))
+        assert table.runtime["+3 m / +3 min"] == pytest.approx(
+            runtime(multilevel(3, 3))
+        )
+        assert table.max_depth["+5 m / +5 min"] == 65
+        assert table.runtime["delayed ascent +5 min"] == pytest.approx(
+            runtime(multilevel(extra_time=5))
+        )
+        assert table.runtime["lost EAN50"] == pytest.approx(
+            runtime(multilevel(deco_gases={6: oxygen}))
+        )
+        assert table.EAN50.isna()["lost EAN50"]
+        assert (table.tts >= table.tts["planned"]).all()
+
+    def test_parallel(self):
+        dive = multilevel()
+        dive.decompress()
+        variants = [Variant("planned"), Variant("+3 m / +3 min", 3, 3)]
+        parallel = dive.contingencies(variants, processes=2)
+        assert parallel.equals(dive.contingencies(variants, processes=1))
+        assert parallel.runtime["planned"] == pytest.approx(dive.duration / 60)
+
+    def test_bounce(self):
+        dive = Dive(trimix)
+        dive.descend(45)
+        table = dive.contingencies([Variant("+3 m / +3 min", 3, 3)], processes=1)
+
+        reference = Dive(trimix)
+        reference.descend(48)
+        reference.stay(3)
+        assert table.runtime.iloc[0] == pytest.approx(runtime(reference))
@@ -0,0 +1,32 @@
+from pydive.dive import Dive
+from pydive.gas import air
+from pydive.reference_profiles import reference_dive
+
+
+def test_revisited_state():
+    dive = Dive(air)
+    deco = dive.decompression_model
+    dive.descend(40)
+    dive.stay(20)
+    ceiling = deco.ceiling()
+
+    dive.stay(5)
+    assert deco.ceiling() > ceiling
+    dive.undo_last_step()
+    assert deco.ceiling() == ceiling
+    dive.stay(5)
+    deco.ceiling()
+    assert deco.stats == {"ceiling_probes": 4, "ceiling_hits": 2}
+
+    deco.low_gf = 0.5
+    assert deco.ceiling() < ceiling
+    assert deco.stats["ceiling_hits"] == 2
+
+
+def test_uncached_ceiling():
+    dive = reference_dive(4, "buhlmann-zhl-16c")
+    deco = dive.decompression_model
+    dive.decompress()
+    assert deco.stats["ceiling_hits"] > 0
+    for depth in [3, 6, 0]:
+        assert deco.ceiling(depth) == max(deco.ceilings(depth))
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from pydive.dive import Dive
+from pydive.gas import GasBlend, air
+from pydive.models.decompression.projection import AscentProjection
+from pydive.models.decompression.vpm_b import VPMB
+
+trimix = GasBlend(oxygen=0.18, helium=0.45, nitrogen=0.37)
+deco_gases = {21: GasBlend(oxygen=0.5, nitrogen=0.5), 6: GasBlend(oxygen=1)}
+
+
+def bottom(gas=trimix, depth=60, duration=25, gases=deco_gases, model=None):
+    dive = Dive(gas, model=model)
+    dive.descend(depth)
+    dive.stay(duration)
+    dive.deco_gases = dict(gases)
+    return dive
+
+
+def schedule(stops):
+    return [(stop.depth, stop.duration, stop.gas) for stop in stops]
+
+
+@pytest.mark.parametrize(
+    "gas, depth, duration, gases",
+    [(air, 40, 30, {}), (air, 10, 30, {}), (trimix, 60, 25, deco_gases)],
+)
+def test_matches_decompress(gas, depth, duration, gases):
+    dive = bottom(gas, depth, duration, gases)
+    projection = AscentProjection(dive.decompression_model)
+    result = projection.project(
+        projection.pressures(), dive.depth, dive.gas, dive.deco_gases, steps=True
+    )
+
+    bottom_time = dive.duration
+    stops = dive.decompress()
+    assert result.tts[0] == pytest.approx((dive.duration - bottom_time) / 60)
+    assert schedule(result.stops[0]) == schedule(stops)
+    assert result.step_logs[0].duration == pytest.approx(
+        [step.duration for step in dive.decompression_steps]
+    )
+
+
+def test_gradient_factor_batch():
+    pairs = [(0.3, 0.7), (0.5, 0.85), (0.8, 0.8)]
+    dive = bottom()
+    projection = AscentProjection(dive.decompression_model)
+    low, high = np.array(pairs).T
+    result = projection.project(
+        projection.pressures(), dive.depth, dive.gas, dive.deco_gases, low, high
+    )
+    for (low_gf, high_gf), tts, stops in zip(pairs, result.tts, result.stops):
+        dive = bottom()
+        dive.decompression_model.low_gf = low_gf
+        dive.decompression_model.high_gf = high_gf
+        bottom_time = dive.duration
+        assert schedule(stops) == schedule(dive.decompress())
+        assert tts == pytest.approx((dive.duration - bottom_time) / 60)
+
+
+@pytest.mark.parametrize("extra_time", [0, 5])
+def test_tts_curve(extra_time):
+    dive = bottom(duration=20)
+    times, tts = dive.tts_curve(interval=4, extra_time=extra_time)
+    assert times[-1] == 26
+
+    for time, expected in zip(times, tts):
+        reference = Dive(trimix)
+        reference.descend(min(time * 10, 60))
+        if time > 6:
+            reference.stay(time - 6)
+        reference.stay(extra_time)
+        reference.deco_gases = dict(deco_gases)
+        start = reference.duration
+        reference.decompress()
+        assert expected == pytest.approx((reference.duration - start) / 60)
+
+
+def test_vpm_is_not_supported():
+    with pytest.raises(ValueError):
+        bottom(model=VPMB).tts_curve()
+
+
+def test_gradient_factor_sweep():
+    lows, highs = [0.3, 0.5], [0.7, 0.8, 0.9]
+    dive = bottom()
+    sweep = dive.decompression_model.sweep_gradient_factors(lows, highs)
+    assert sweep.runtime.shape == (2, 3)
+    assert dive.decompression_steps == []
+
+    for i, low_gf in enumerate(lows):
+        for j, high_gf in enumerate(highs):
+            reference = bottom()
+            reference.decompression_model.low_gf = low_gf
+            reference.decompression_model.high_gf = high_gf
+            stops = reference.decompress()
+            assert sweep.runtime[i, j] == pytest.approx(reference.duration / 60)
+            assert sweep.first_stop[i, j] == stops[0].depth
+            assert schedule(sweep.stops[i][j]) == schedule(stops)
+    assert (np.diff(sweep.tts, axis=1) <= 0).all()
@@ -0,0 +1,58 @@
+import pytest
+
+from pydive.dive import Dive, DiveStep
+from pydive.gas import GasBlend
+from pydive.models.decompression.vpm_b import VPMB
+
+deco_gases = {21: GasBlend(oxygen=0.5, nitrogen=0.5), 6: GasBlend(oxygen=1)}
+
+
+def saturation_dive():
+    dive = Dive(GasBlend(oxygen=0.1, helium=0.6, nitrogen=0.3))
+    dive.descend(60)
+    dive.stay(3 * 24 * 60)
+    dive.deco_gases = dict(deco_gases)
+    return dive
+
+
+def test_long_stops():
+    dive = saturation_dive()
+    stops = dive.decompress()
+    assert max(stop.duration for stop in stops) > 4 * 64
+    assert dive.decompression_model.stats["ceiling_probes"] < 15 * len(stops)
+
+
+def test_impossible_stop():
+    dive = Dive(GasBlend(oxygen=0.04, helium=0.96))
+    dive.descend(60)
+    dive.stay(3 * 24 * 60)
+    with pytest.raises(ValueError):
+        dive.decompress()
+
+
+def test_continuous_ascent():
+    dive = saturation_dive()
+    steps = dive.decompress_continuously()
+    assert dive.depth == 0
+    assert all(step.rate < 0 or step.duration == 60 for step in steps)
+    assert [step.gas for step in steps if step.rate == 0] == list(deco_gases.values())
+
+    staged = saturation_dive()
+    staged.decompress()
+    assert dive.duration < staged.duration
+
+    replay = saturation_dive()
+    deco = replay.decompression_model
+    deco.first_stop = dive.decompression_model.first_stop
+    for step in steps:
+        replay.apply_step(DiveStep(replay, step.gas, step.rate, step.duration))
+        assert deco.ceiling() <= replay.depth + 1e-9
+
+
+def test_continuous_ascent_vpmb():
+    dive = Dive(GasBlend(oxygen=0.21, nitrogen=0.79), model=VPMB)
+    dive.descend(30)
+    dive.stay(25)
+    with pytest.raises(ValueError, match="Bühlmann"):
+        dive.decompress_continuously()
+    assert dive.depth == 30
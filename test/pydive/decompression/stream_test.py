@@ -0,0 +1,36 @@
+from pydive.reference_profiles import reference_dive
+
+
+def test_buhlmann():
+    stops = list(reference_dive(4, "buhlmann-zhl-16c").iter_decompression())
+    dive = reference_dive(4, "buhlmann-zhl-16c")
+    bottom_time = dive.duration
+    assert stops == dive.decompress()
+    assert not any(stop.provisional for stop in stops)
+    tts = [stop.tts for stop in stops]
+    assert tts == sorted(tts)
+    assert tts[-1] < (dive.duration - bottom_time) / 60
+
+
+def test_vpm():
+    dive = reference_dive(4, "vpm-b")
+    stops = list(dive.iter_decompression())
+    provisional = [stop for stop in stops if stop.provisional]
+    final = [stop for stop in stops if not stop.provisional]
+    assert len({stop.iteration for stop in provisional}) > 1
+    assert final == reference_dive(4, "vpm-b").decompress()
+    assert [(s.depth, s.duration) for s in final] == [
+        (s.depth, s.duration)
+        for s in provisional
+        if s.iteration == provisional[-1].iteration
+    ]
+
+
+def test_close_early():
+    dive = reference_dive(2, "buhlmann-zhl-16c")
+    stream = dive.iter_decompression()
+    next(stream)
+    stream.close()
+    assert set(dive.models) == {"decompression", "pulmonary", "cns", "consumption"}
+    steps = len(dive.steps) + len(dive.decompression_steps)
+    assert len(dive.models["cns"].history) == steps
@@ -0,0 +1,68 @@
+import pytest
+
+from pydive.dive import Dive
+from pydive.dive_series import DiveSeries
+from pydive.gas import GasBlend, air
+from pydive.models.decompression.vpm_b import VPMB
+
+ean32 = GasBlend(oxygen=0.32, nitrogen=0.68)
+
+
+def plan(dive):
+    dive.descend(30)
+    dive.stay(25)
+    dive.decompress()
+    return dive
+
+
+def tissues(dive):
+    return dive.decompression_model.state()
+
+
+class TestDiveSeries:
+    def test_residual_tissue(self):
+        series = DiveSeries()
+        first = plan(series.new_dive(air))
+        second = series.new_dive(air, surface_interval=60)
+
+        fresh = tissues(Dive(air))
+        assert all(p >= f for p, f in zip(tissues(second), fresh))
+        assert tissues(second)[0] < tissues(first)[0]
+
+        assert len(plan(second).decompression_steps) >= len(
+            plan(Dive(air)).decompression_steps
+        )
+
+    def test_long_interval(self):
+        series = DiveSeries()
+        plan(series.new_dive(air))
+        second = series.new_dive(air, surface_interval=7 * 24 * 60)
+        assert tissues(second) == pytest.approx(tissues(Dive(air)), abs=1e-5)
+
+    def test_cns_decay(self):
+        series = DiveSeries()
+        first = plan(series.new_dive(ean32))
+        second = series.new_dive(ean32, surface_interval=90)
+        assert second.models["cns"].fraction == pytest.approx(
+            first.models["cns"].fraction / 2
+        )
+        plan(second)
+        assert series.cns > first.models["cns"].fraction / 2
+
+    def test_daily_otus(self):
+        series = DiveSeries()
+        for surface_interval in [0, 120, 22 * 60, 120]:
+            plan(series.new_dive(ean32, surface_interval=surface_interval))
+        assert [series.day(i) for i in range(len(series))] == [0, 0, 1, 1]
+        otus = [dive.models["pulmonary"].otus for dive in series]
+        assert series.daily_otus == pytest.approx(
+            {0: otus[0] + otus[1], 1: otus[2] + otus[3]}
+        )
+        assert series.total_otus == pytest.approx(sum(otus))
+
+    def test_vpmb_unsupported(self):
+        series = DiveSeries(model=VPMB)
+        plan(series.new_dive(air))
+        with pytest.raises(ValueError, match="VPM-B"):
+            series.new_dive(air, surface_interval=60)
+        assert len(series) == 1
@@ -2,6 +2,7 @@ import pytest
 
 import pydive.dive as dive
 import pydive.gas as gas
+from pydive.models.decompression.vpm_b import VPMB
 
 class TestDive:
     def test_simple(self):
@@ -16,4 +17,41 @@ class TestDive:
         assert simple_dive.depth == 10
 
         simple_dive.ascend(0)
-        assert simple_dive.depth == 0
\ No newline at end of file
+        assert simple_dive.depth == 0
+
+    @pytest.mark.parametrize("model", [None, VPMB])
+    def test_checkpoint(self, model):
+        original = dive.Dive(gas.air, model=model)
+        original.descend(40)
+        original.stay(20)
+        checkpoint = original.checkpoint()
+        original.ascend(30)
+
+        restored = dive.Dive.from_checkpoint(checkpoint)
+        assert restored.duration == 24 * 60
+        assert restored.steps == original.steps[:2]
+        assert restored.decompression_model.dive is restored
+        restored.ascend(30)
+        original.decompress()
+        restored.decompress()
+        assert restored.markdown == original.markdown
+        assert dive.Dive.from_checkpoint(checkpoint).duration == 24 * 60
+
+
+class TestDecoGases:
+    def test_switch_lookup(self):
+        simple_dive = dive.Dive(gas.air)
+        simple_dive.deco_gases = {21: gas.air, 6: gas.air}
+        deco_gases = simple_dive.deco_gases
+        assert deco_gases.deepest_above(30) == 21
+        assert deco_gases.deepest_above(21) == 6
+        assert deco_gases.deepest_above(6) is None
+        assert deco_gases.shallowest_from(21) == 21
+        assert deco_gases.shallowest_from(22) is None
+
+        deco_gases[12] = gas.air
+        assert deco_gases.deepest_above(21) == 12
+        del deco_gases[12]
+        deco_gases.pop(6)
+        assert deco_gases.depths == [21]
+        assert simple_dive.clone().deco_gases.deepest_above(30) == 21
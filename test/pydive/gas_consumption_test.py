@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from pydive.gas import GasBlend, air
+from pydive.models.gas_consumption import Cylinder, compute_blends
+from pydive.reference_profiles import reference_dive
+
+
+class TestCylinder:
+    def test_pressure_for(self):
+        cylinder = Cylinder(air, 12, 232)
+        volume = cylinder.surface_volume - 1000
+        assert cylinder.pressure_for(volume) == pytest.approx(
+            cylinder._polynomial_pressure(volume), rel=1e-12
+        )
+        assert cylinder.surface_volume_at(cylinder.pressure_for(volume)) == (
+            pytest.approx(volume)
+        )
+
+    def test_consume_gas(self):
+        cylinder = Cylinder(GasBlend(oxygen=0.18, helium=0.45, nitrogen=0.37), 24, 200)
+        volume = cylinder.surface_volume
+        cylinder.consume_gas(volume / 2)
+        assert cylinder.surface_volume == pytest.approx(volume / 2)
+        assert 0 < cylinder.pressure < 100
+
+    def test_pressures_for(self):
+        cylinder = Cylinder(GasBlend(helium=1), 12, 232)
+        volumes = np.linspace(0, cylinder.surface_volume, 11)
+        pressures = cylinder.pressures_for(volumes)
+        assert pressures[0] == 0
+        assert pressures[-1] == pytest.approx(232)
+        assert np.allclose(
+            pressures[1:], [cylinder.pressure_for(v, guess=0) for v in volumes[1:]]
+        )
+
+    def test_compute_blend(self):
+        trimix = GasBlend(oxygen=0.18, helium=0.45, nitrogen=0.37)
+        gases = [GasBlend(helium=1), GasBlend(oxygen=1), air]
+        target = Cylinder(trimix, 12, 232)
+        fills = list(target.compute_blend(gases))
+        assert gases == [GasBlend(helium=1), GasBlend(oxygen=1), air]
+        assert [gas for gas, _, _ in fills] == gases
+        pressures = [cylinder.pressure for _, _, cylinder in fills]
+        assert pressures == sorted(pressures)
+        assert pressures[-1] == pytest.approx(232)
+        assert fills[-1][2].gas == trimix
+
+        ean32 = GasBlend(oxygen=0.32, nitrogen=0.68)
+        start = Cylinder(ean32, 12, 50)
+        fills = list(Cylinder(ean32, 12, 200).compute_blend(gases, start=start))
+        assert [gas for gas, _, _ in fills] == [GasBlend(oxygen=1), air]
+        assert start.pressure == 50
+        with pytest.raises(ValueError, match="Unwanted gas helium"):
+            list(Cylinder(ean32, 12, 200).compute_blend(gases, start=target))
+        with pytest.raises(ValueError, match="Impossible"):
+            list(Cylinder(ean32, 12, 20).compute_blend(gases, start=start))
+
+    def test_compute_blends(self):
+        ean32 = GasBlend(oxygen=0.32, nitrogen=0.68)
+        targets = [
+            GasBlend(oxygen=0.21, helium=0.35, nitrogen=0.44),
+            ean32,
+            ean32,
+            GasBlend(oxygen=0.18, helium=0.45, nitrogen=0.37),
+        ]
+        gases = [GasBlend(helium=1), GasBlend(oxygen=1), air]
+        schedule = compute_blends(
+            gases,
+            [12, 12, 24, 12],
+            targets,
+            [232, 200, 232, 300],
+            start_gas=[air, ean32, air, air],
+            start_pressure=[0, 50, 250, 30],
+        )
+        assert schedule.errors[2] == "Impossible to blend this gas"
+        assert list(schedule.feasible) == [True, True, False, True]
+        assert np.isnan(schedule.volumes[2]).all()
+        for index, pressure in [(0, 232), (1, 200), (3, 300)]:
+            assert schedule.pressures[index, -1] == pytest.approx(pressure)
+            assert schedule.fractions[index, -1] == pytest.approx(
+                targets[index].fractions
+            )
+        start = Cylinder(air, 12, 30)
+        fills = list(Cylinder(targets[3], 12, 300).compute_blend(gases, start=start))
+        assert [gas for gas, _, _ in schedule.fills(3)] == [gas for gas, _, _ in fills]
+        assert [volume for _, volume, _ in schedule.fills(3)] == pytest.approx(
+            [volume for _, volume, _ in fills]
+        )
+        with pytest.raises(ValueError):
+            schedule.fills(2)
+
+
+class TestGasConsumptionModel:
+    def test_pressure_log(self):
+        dive = reference_dive(2, "buhlmann-zhl-16c")
+        dive.decompress()
+        ean50 = GasBlend(oxygen=0.5, nitrogen=0.5)
+        model = dive.models["consumption"]
+        model.add_cylinder("back gas", Cylinder(air, 24, 232), reserve="thirds")
+        model.add_cylinder("deco", Cylinder(ean50, 7, 200), reserve=150)
+
+        log = model.pressure_log()
+        assert log.runtime[-1] == dive.duration
+        assert log.volumes["back gas"][0] - log.volumes["back gas"][-1] == (
+            pytest.approx(model.consumption[air])
+        )
+        assert log.volumes["deco"][0] - log.volumes["deco"][-1] == (
+            pytest.approx(model.consumption[ean50])
+        )
+        assert log.pressures["deco"][-1] == pytest.approx(
+            Cylinder(ean50, 7).pressure_for(log.volumes["deco"][-1], guess=0)
+        )
+        assert [violation.rule for violation in log.violations] == ["minimum gas"]
+        assert log.violations[0].pressure < 150
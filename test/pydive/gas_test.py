@@ -1,3 +1,7 @@
+import gc
+import pickle
+
+import numpy as np
 import pytest
 
 import pydive.gas as gas
@@ -26,6 +30,39 @@ class TestGasBlend:
         with pytest.raises(ValueError):
             incomplete_blend = gas.GasBlend(oxygen=80)
 
+    def test_interned(self):
+        ean32 = gas.GasBlend(oxygen=0.32, nitrogen=0.68)
+        assert gas.GasBlend(nitrogen=0.68, oxygen=0.32) is ean32
+        assert ean32 == pickle.loads(pickle.dumps(ean32))
+        assert hash(ean32) == hash(gas.GasBlend.from_fractions(ean32.fractions))
+        assert ean32.fractions == (0.32, 0.68, 0)
+        assert repr(ean32) == "EAN32"
+
+    def test_interned_released(self):
+        fractions = (0.123456, 0.876544, 0.0)
+        blend = gas.GasBlend.from_fractions(fractions)
+        assert gas.GasBlend._interned[fractions] is blend
+        del blend
+        gc.collect()
+        assert fractions not in gas.GasBlend._interned
+
+    def test_compressibility(self):
+        trimix = gas.GasBlend(oxygen=0.18, helium=0.45, nitrogen=0.37)
+        pressures = np.array([1, 50, 200, 300])
+        expected = 1 + sum(
+            trimix.fraction(g) * sum(
+                c * pressures ** (i + 1) for i, c in enumerate(g.virial_coefficients)
+            )
+            for g in trimix.blend
+        )
+        assert np.allclose(trimix.compressibility(pressures), expected)
+        assert trimix.compressibility(200) == trimix.compressibility(pressures)[2]
+        assert trimix.surface_compressibility == trimix.compressibility(1)
+
+    def test_immutable(self):
+        with pytest.raises(AttributeError):
+            gas.air.fractions = (1, 0, 0)
+
 class TestGas:
     def test_get_gas_type(self):
         assert gas.Oxygen == gas.Gas.get_gas_type("oxygen")
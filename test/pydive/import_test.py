@@ -0,0 +1,18 @@
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "module", ["pydive.dive", "pydive.models.decompression.vpm_b", "pydive.dive_series"]
+)
+def test_no_heavy_imports(module):
+    script = (
+        f"import sys, {module}; "
+        "print(','.join(m for m in ('pandas', 'plotly') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, check=True, text=True
+    )
+    assert result.stdout.strip() == ""
@@ -0,0 +1,79 @@
+import pytest
+
+from pydive.dive import Dive
+from pydive.gas import GasBlend, air
+from pydive.plan import DivePlan, IncrementalBuilder, Waypoint
+
+ean32 = GasBlend(oxygen=0.32, nitrogen=0.68)
+ean50 = GasBlend(oxygen=0.5, nitrogen=0.5)
+
+waypoints = [Waypoint(30, 20), Waypoint(40, 15), Waypoint(20, 10, ean32)]
+
+
+def summary(dive):
+    dive.decompress()
+    return [
+        dive.duration,
+        *dive.decompression_model.state(),
+        dive.models["cns"].fraction,
+        *(step.duration for step in dive.decompression_steps),
+    ]
+
+
+class TestIncrementalBuilder:
+    def test_matches_full_build(self):
+        builder = IncrementalBuilder()
+        builder.build(air, waypoints)
+        edited = waypoints[:-1] + [Waypoint(21, 12, ean32)]
+        dive = builder.build(air, edited, {21: ean50})
+        assert builder.stats["reused"] == 2
+        assert builder.stats["waypoints"] == 4
+
+        full = DivePlan(air, edited, deco_gases={21: ean50}).build_dive()
+        assert summary(dive) == pytest.approx(summary(full))
+
+    def test_returns_independent_dives(self):
+        builder = IncrementalBuilder()
+        first = builder.build(air, waypoints)
+        first.decompress()
+        second = builder.build(air, waypoints)
+        assert builder.stats["reused"] == 3
+        assert second.decompression_steps == []
+        assert second.duration < first.duration
+
+    def test_bottom_gas_is_part_of_key(self):
+        builder = IncrementalBuilder()
+        builder.build(air, waypoints)
+        dive = builder.build(ean32, waypoints)
+        assert builder.stats["reused"] == 0
+        assert dive.bottom_gas == ean32
+
+    @pytest.mark.parametrize("length", [5, 50])
+    def test_last_edit_simulates_last_waypoint(self, length, monkeypatch):
+        applied = []
+        apply_step = Dive.apply_step
+        monkeypatch.setattr(
+            Dive,
+            "apply_step",
+            lambda dive, step: applied.append(step) or apply_step(dive, step),
+        )
+        prefix = [Waypoint(20 + index % 5, 2) for index in range(length - 1)]
+        builder = IncrementalBuilder()
+        first = builder.build(air, prefix + [Waypoint(20, 5)])
+        applied.clear()
+        dive = builder.build(air, prefix + [Waypoint(20, 6)])
+        assert applied == dive.steps[-len(applied) :]
+        assert len(applied) <= 2
+        # The unchanged prefix is shared, not copied
+        assert all(a is b for a, b in zip(dive.steps, first.steps[: -len(applied)]))
+
+    def test_eviction(self):
+        builder = IncrementalBuilder(max_snapshots=2)
+        builder.build(air, waypoints)
+        assert len(builder._snapshots) == 2
+        builder.build(air, waypoints[:1])
+        assert builder.stats["reused"] == 0
+
+    def test_too_short(self):
+        with pytest.raises(ValueError):
+            IncrementalBuilder().build(air, [Waypoint(30, 1)])
@@ -0,0 +1,64 @@
+import pytest
+
+from pydive.dive import Dive
+from pydive.gas import GasBlend
+from pydive.inverse import Limits, max_bottom_time, max_depth
+
+trimix = GasBlend(oxygen=0.18, helium=0.45, nitrogen=0.37)
+ean50 = GasBlend(oxygen=0.5, nitrogen=0.5)
+deco_gases = {21: ean50, 6: GasBlend(oxygen=1)}
+
+
+def plan(depth, minutes):
+    dive = Dive(trimix)
+    dive.deco_gases = dict(deco_gases)
+    dive.descend(depth)
+    dive.stay(minutes)
+    bottom_time = dive.duration
+    dive.decompress()
+    return dive, (dive.duration - bottom_time) / 60
+
+
+def within(limits, depth, minutes):
+    dive, tts = plan(depth, minutes)
+    volumes = dive.models["consumption"].consumption
+    return (
+        (limits.tts is None or tts <= limits.tts)
+        and (limits.cns is None or dive.models["cns"].fraction <= limits.cns)
+        and (limits.otus is None or dive.models["pulmonary"].otus <= limits.otus)
+        and all(volumes.get(gas, 0) <= volume for gas, volume in limits.gas.items())
+    )
+
+
+@pytest.mark.parametrize(
+    "limits",
+    [
+        Limits(tts=60, cns=0.8),
+        Limits(otus=150),
+        Limits(gas={trimix: 3000, ean50: 1000}),
+    ],
+)
+def test_max_bottom_time(limits):
+    dive = Dive(trimix)
+    dive.deco_gases = dict(deco_gases)
+    dive.descend(60)
+    minutes = max_bottom_time(dive, limits)
+    assert dive.duration == 6 * 60
+    assert within(limits, 60, minutes)
+    assert not within(limits, 60, minutes + 1)
+
+
+def test_max_depth():
+    dive = Dive(trimix)
+    dive.deco_gases = dict(deco_gases)
+    depth = max_depth(dive, 25, Limits(tts=45))
+    assert plan(depth, 25 - depth / 10)[1] <= 45
+    assert plan(depth + 1, 25 - (depth + 1) / 10)[1] > 45
+
+
+def test_limits_exceeded():
+    dive = Dive(trimix)
+    dive.descend(60)
+    dive.stay(30)
+    with pytest.raises(ValueError):
+        max_bottom_time(dive, Limits(tts=10))
@@ -0,0 +1,91 @@
+import io
+
+import pytest
+
+from pydive.gas import GasBlend
+from pydive.logbook.replay import analyse_logbook, iter_logbook, replay
+from pydive.step_log import StepLog
+
+UDDF = b"""<?xml version="1.0"?>
+<uddf xmlns="http://www.streit.cc/uddf/3.2/" version="3.2.0">
+  <gasdefinitions>
+    <mix id="air"><o2>0.21</o2><n2>0.79</n2></mix>
+    <mix id="ean50"><o2>0.5</o2><n2>0.5</n2></mix>
+  </gasdefinitions>
+  <profiledata><repetitiongroup id="rg">
+    <dive id="d1">
+      <informationbeforedive><divenumber>7</divenumber></informationbeforedive>
+      <samples>
+        <waypoint><divetime>0</divetime><depth>0</depth><switchmix ref="air"/></waypoint>
+        <waypoint><divetime>180</divetime><depth>30</depth></waypoint>
+        <waypoint><divetime>1500</divetime><depth>30</depth></waypoint>
+        <waypoint>
+          <divetime>1620</divetime><depth>21</depth><switchmix ref="ean50"/>
+        </waypoint>
+        <waypoint><divetime>2400</divetime><depth>6</depth></waypoint>
+        <waypoint><divetime>2500</divetime><depth>0</depth></waypoint>
+      </samples>
+    </dive>
+  </repetitiongroup></profiledata>
+</uddf>"""
+
+SUBSURFACE = b"""<divelog program='subsurface' version='3'><dives><trip>
+  <dive number='3'>
+    <cylinder size='11.1 l' o2='32.0%' /><cylinder o2='50.0%' />
+    <divecomputer model='a'>
+      <event time='30:00 min' type='25' name='gaschange' cylinder='1' />
+      <sample time='0:10 min' depth='3.0 m' />
+      <sample time='3:00 min' depth='25.0 m' />
+      <sample time='25:00 min' depth='25.0 m' />
+      <sample time='30:00 min' depth='12.0 m' />
+      <sample time='38:00 min' depth='5.0 m' />
+      <sample time='40:00 min' depth='0.0 m' />
+    </divecomputer>
+    <divecomputer model='b'><sample time='0:10 min' depth='99.0 m' /></divecomputer>
+  </dive>
+</trip></dives></divelog>"""
+
+
+class TestLogbook:
+    def test_uddf(self):
+        (dive,) = iter_logbook(io.BytesIO(UDDF))
+        assert dive.identifier == "7"
+        assert dive.step_log.gases == (
+            GasBlend(oxygen=0.21, nitrogen=0.79),
+            GasBlend(oxygen=0.5, nitrogen=0.5),
+        )
+        assert dive.step_log.gas_index.tolist() == [0, 0, 0, 1, 1]
+        assert dive.step_log.runtime[-1] == 2500
+
+    def test_subsurface(self):
+        (dive,) = iter_logbook(io.BytesIO(SUBSURFACE))
+        assert dive.identifier == "3"
+        assert len(dive.step_log) == 6
+        assert dive.step_log.start_depth[0] == 0
+        assert dive.step_log.gas_index.tolist() == [0, 0, 0, 0, 1, 1]
+        assert round(dive.step_log.max_depth) == 25
+
+    def test_replay(self):
+        (logged_dive,) = iter_logbook(io.BytesIO(UDDF))
+        dive, summary = replay(logged_dive)
+        assert dive.duration == summary.duration == 2500
+        assert summary.cns == dive.models["cns"].fraction > 0
+        assert 0 < summary.max_gf < 1
+        # The final ascent from 6 m takes 100 s, leaving the ceiling just below
+        # the surface
+        assert summary.ceiling_violations == 1
+
+    def test_samples_start_at_surface(self):
+        step_log = StepLog.from_samples([10, 60], [3, 10])
+        assert step_log.start_depth.tolist() == [0, 3]
+        with pytest.raises(ValueError, match="surface"):
+            StepLog.from_samples([0, 60], [3, 10])
+
+    def test_analyse_logbook(self):
+        serial = list(analyse_logbook(io.BytesIO(UDDF), processes=1))
+        pooled = list(analyse_logbook(io.BytesIO(UDDF), processes=2))
+        assert serial == pooled
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            iter_logbook(io.BytesIO(b"<logbook />"))
@@ -0,0 +1,59 @@
+import pytest
+
+from pydive.dive import Dive
+from pydive.gas import GasBlend
+from pydive.optimize import candidate_blends, optimize_deco_gases, switch_depths
+
+trimix = GasBlend(oxygen=0.18, helium=0.45, nitrogen=0.37)
+ean50 = GasBlend(oxygen=0.5, nitrogen=0.5)
+oxygen = GasBlend(oxygen=1)
+
+
+def bottom(deco_gases=None):
+    dive = Dive(trimix)
+    dive.descend(60)
+    dive.stay(25)
+    dive.deco_gases = deco_gases or {}
+    return dive
+
+
+def tts(deco_gases):
+    dive = bottom(deco_gases)
+    bottom_time = dive.duration
+    dive.decompress()
+    return (dive.duration - bottom_time) / 60
+
+
+def test_switch_depths():
+    assert switch_depths(ean50) == [21, 18, 15, 12, 9, 6, 3]
+    assert switch_depths(ean50, max_pO2=1.4)[0] == 18
+    assert switch_depths(GasBlend(oxygen=0.21, nitrogen=0.79), max_pNarc=4)[0] == 30
+
+
+def test_candidate_blends():
+    blends = candidate_blends([0.5, 1], [0, 0.2])
+    assert blends == [ean50, GasBlend(oxygen=0.5, helium=0.2, nitrogen=0.3), oxygen]
+
+
+@pytest.mark.parametrize("objective", ["tts", "gas"])
+def test_optimize(objective):
+    dive = bottom()
+    blends = candidate_blends([0.32, 0.5, 0.8, 1])
+    options = optimize_deco_gases(dive, blends, objective=objective)
+    assert dive.decompression_steps == []
+    assert len(options) == 5
+
+    best = options[0]
+    assert best.tts == pytest.approx(tts(best.deco_gases))
+    assert best.tts <= tts({21: ean50, 6: oxygen})
+    for depth, gas in best.deco_gases.items():
+        assert depth <= gas.max_operating_depth_at(1.6)
+    key = "tts" if objective == "tts" else "gas"
+    assert [getattr(option, key) for option in options] == sorted(
+        getattr(option, key) for option in options
+    )
+
+
+def test_unknown_objective():
+    with pytest.raises(ValueError):
+        optimize_deco_gases(bottom(), [ean50], objective="cost")
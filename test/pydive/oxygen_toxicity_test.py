@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from pydive.dive import Dive
+from pydive.gas import GasBlend
+from pydive.models.oxygen_toxicity import (
+    cns_time_table,
+    otu_series,
+    oxygen_exposure,
+)
+from pydive.reference_profiles import models, reference_dive
+
+
+class TestCNSTimeTable:
+    def test_segment(self):
+        table = cns_time_table()
+        assert table.segment(0.5) is None
+        assert table.segment(0.55) == 0
+        assert table.segment(0.6) == 0
+        assert table.segment(1.4) == 5
+        assert table.segment(1.7) is None
+        assert table.slope[5] * 1.4 + table.intercept[5] == pytest.approx(150)
+
+    def test_segments(self):
+        table = cns_time_table()
+        assert list(table.segments(0.5, 0.6)) == [0]
+        assert list(table.segments(0.65, 1.2)) == [1, 2, 3, 4, 5]
+        assert list(table.segments(1.55, 1.8)) == [6]
+
+
+@pytest.mark.parametrize("model", models)
+@pytest.mark.parametrize("number", [2, 4])
+def test_oxygen_exposure(number, model):
+    dive = reference_dive(number, model)
+    dive.decompress()
+    dive = dive.reinterpolate_dive(interval=30)
+    otus, cns = oxygen_exposure(dive.step_log)
+    assert np.allclose(otus, dive.models["pulmonary"].history)
+    assert np.allclose(cns, dive.models["cns"].history)
+
+
+def test_otu_threshold():
+    otus = otu_series([0.21, 0.4, 1.0, 1.0], [0.21, 1.0, 1.0, 0.4], [10, 6, 10, 6])
+    assert otus[0] == 0
+    assert otus[1] == pytest.approx(otus[3] - otus[2])
+    assert otus[2] - otus[1] == pytest.approx(10)
+
+
+class TestPulmonaryOxygenToxicity:
+    def test_threshold(self):
+        dive = Dive(GasBlend(oxygen=0.5, nitrogen=0.5))
+        dive.stay(10)
+        assert dive.models["pulmonary"].otus == 0
+
+    def test_zero_length_ramp(self):
+        dive = Dive(GasBlend(oxygen=0.32, nitrogen=0.68))
+        dive.descend(30)
+        otus = dive.models["pulmonary"].otus
+        dive.descend(30)
+        assert dive.models["pulmonary"].otus == otus
+
+    def test_undo_to_loaded_state(self):
+        dive = Dive(GasBlend(oxygen=0.32, nitrogen=0.68))
+        model = dive.models["pulmonary"]
+        model.load_state(None)
+        assert model.otus == 0
+        model.load_state(12)
+        dive.descend(30)
+        dive.stay(20)
+        assert model.otus > 12
+        dive.undo_steps(2)
+        assert model.otus == 12
@@ -0,0 +1,24 @@
+import concurrent.futures
+import itertools
+
+from pydive.reference_profiles import models, reference_dive
+
+
+def plan(number, model):
+    dive = reference_dive(number, model)
+    stops = dive.decompress()
+    return (
+        [(stop.depth, stop.duration) for stop in stops if stop is not None],
+        dive.duration,
+        dive.models["cns"].fraction,
+    )
+
+
+def test_concurrent_plans():
+    cases = list(itertools.product(range(1, 6), models))
+    expected = [plan(*case) for case in cases]
+
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(lambda case: plan(*case), cases * 8))
+
+    assert results == expected * 8
@@ -0,0 +1,56 @@
+import numpy as np
+
+from pydive.gas import air
+from pydive.utils import freeze, largest_triangle_three_buckets, thaw
+
+
+class TestLargestTriangleThreeBuckets:
+    def test_keeps_short_series(self):
+        assert list(largest_triangle_three_buckets([0, 1, 2], [0, 1, 0], 10)) == [
+            0,
+            1,
+            2,
+        ]
+
+    def test_decimates(self):
+        x = np.arange(1000)
+        y = np.sin(x / 50)
+        indices = largest_triangle_three_buckets(x, y, 100)
+        assert len(indices) == 100
+        assert indices[0] == 0 and indices[-1] == 999
+        assert np.all(np.diff(indices) > 0)
+
+    def test_keeps_peaks(self):
+        x = np.arange(500)
+        y = np.zeros(500)
+        y[123] = 10
+        y[321] = -10
+        indices = largest_triangle_three_buckets(x, y, 20)
+        assert 123 in indices
+        assert 321 in indices
+
+
+class Point:
+    def __init__(self, x, history):
+        self.x = x
+        self.history = history
+
+
+class TestFreeze:
+    def test_round_trip(self):
+        value = {"points": [Point(1, [0.0, 1.5])], "gases": [air], "n": (1, "a")}
+        frozen = freeze(value)
+        value["points"][0].history.append(3.0)
+        thawed = thaw(frozen)
+        assert thawed["points"][0].history == [0.0, 1.5]
+        assert thawed["gases"][0] is air
+        assert thawed["n"] == (1, "a")
+        thawed["points"][0].history.append(4.0)
+        assert thaw(frozen)["points"][0].history == [0.0, 1.5]
+
+    def test_other_values_are_copied(self):
+        value = {1, 2}
+        frozen = freeze(value)
+        value.add(3)
+        assert thaw(frozen) == {1, 2}
+        assert thaw(frozen) is not thaw(frozen)